@@ -17,26 +17,11 @@ from dotenv import load_dotenv
 from loguru import logger
 import time
 import sys
+from typing import Dict, List, Optional, Set
 
-# --- AWS SecretsManager integration for credentials ---
-def fetch_and_set_aws_secret(secret_name: str, region_name: str = None):
-    try:
-        import boto3
-        import json as _json
-        session = boto3.session.Session()
-        if region_name is None:
-            region_name = session.region_name or 'us-west-2'
-        client = session.client(
-            service_name='secretsmanager',
-            region_name=region_name
-        )
-        get_secret_value_response = client.get_secret_value(SecretId=secret_name)
-        secret = get_secret_value_response['SecretString']
-        secret_dict = _json.loads(secret)
-        for k, v in secret_dict.items():
-            os.environ[k] = v
-    except Exception as e:
-        print(f"[WARN] Could not fetch secret from AWS: {e}")
+# --- AWS SecretsManager integration for credentials (cached; see scraper.secret_store) ---
+from scraper.config import fetch_and_set_aws_secret
+from scraper.page_scripts import EXPAND_PATTERNS, EXPAND_QUIET_MS, EXPAND_SECTIONS_JS, EXPAND_TIMEOUT_MS
 
 # Try to load from .env, else fetch from AWS
 if not (os.getenv('CLARK_COUNTY_USERNAME') and os.getenv('CLARK_COUNTY_PASSWORD')):
@@ -46,7 +31,10 @@ load_dotenv()
 
 # Import the working base scraper
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from enhanced_detail_scraper_final import EnhancedDetailScraper
+from enhanced_detail_scraper_final import EnhancedDetailScraper, init_logging
+
+# Stop trying an expand pattern on a layout after it matched nothing on this many pages in a row
+EXPAND_SKIP_AFTER = 3
 
 class Enhanced100PercentScraper:
     """Enhanced scraper targeting 100% completeness"""
@@ -57,6 +45,9 @@ class Enhanced100PercentScraper:
         self.driver = None
         self.wait = None
         self.expanded_sections = set()
+        # Per page layout (structure hash): consecutive misses per pattern, and patterns given up on
+        self.pattern_misses: Dict[str, Dict[str, int]] = {}
+        self.dead_patterns: Dict[str, Set[str]] = {}
         
     def setup_driver(self):
         """Setup driver using base scraper"""
@@ -73,52 +64,46 @@ class Enhanced100PercentScraper:
         """Search using base scraper"""
         return self._base_scraper.search_for_permit(permit_number)
         
-    def expand_all_sections(self):
-        """Expand all collapsible sections to reveal hidden data"""
+    def expand_all_sections(self, layout: Optional[str] = None) -> int:
+        """
+        Expand all collapsible sections to reveal hidden data, in one injected script
+
+        Patterns that matched nothing on ``layout`` for EXPAND_SKIP_AFTER pages
+        in a row are no longer tried on that layout.
+        """
         logger.info("Expanding all sections for complete data access...")
-        expanded_count = 0
+        skipped = self.dead_patterns.get(layout, set()) if layout else set()
+        patterns = [p for p in EXPAND_PATTERNS if p not in skipped]
+        if not patterns:
+            logger.debug(f"No expand patterns match layout {layout}")
+            return 0
         
-        # Click patterns for expandable content
-        expand_patterns = [
-            "More Details",
-            "Show More", 
-            "View Details",
-            "Additional Information",
-            "Show All",
-            "Fee Details",
-            "View More"
-        ]
+        try:
+            result = self.driver.execute_async_script(
+                EXPAND_SECTIONS_JS, patterns, EXPAND_QUIET_MS, EXPAND_TIMEOUT_MS
+            )
+        except Exception as e:
+            logger.debug(f"Section expansion script failed: {e}")
+            return 0
         
-        for pattern in expand_patterns:
-            try:
-                # Find elements with expand text
-                elements = self.driver.find_elements(
-                    By.XPATH,
-                    f"//a[contains(text(), '{pattern}')] | //button[contains(text(), '{pattern}')] | //span[contains(text(), '{pattern}') and @onclick]"
-                )
-                
-                for elem in elements:
-                    try:
-                        if elem.is_displayed() and elem.is_enabled():
-                            # Scroll to element
-                            self.driver.execute_script("arguments[0].scrollIntoView(true);", elem)
-                            time.sleep(0.3)
-                            
-                            # Click
-                            try:
-                                elem.click()
-                            except:
-                                self.driver.execute_script("arguments[0].click();", elem)
-                            
-                            expanded_count += 1
-                            logger.debug(f"Clicked: {pattern}")
-                            time.sleep(0.5)
-                    except:
-                        pass
-            except:
-                pass
-                
-        logger.info(f"Expanded {expanded_count} sections")
+        opened = result.get('opened', {})
+        self.expanded_sections.update(p for p, clicks in opened.items() if clicks)
+        if layout:
+            misses = self.pattern_misses.setdefault(layout, {})
+            for pattern in patterns:
+                if opened.get(pattern):
+                    misses[pattern] = 0
+                    continue
+                misses[pattern] = misses.get(pattern, 0) + 1
+                if misses[pattern] >= EXPAND_SKIP_AFTER:
+                    self.dead_patterns.setdefault(layout, set()).add(pattern)
+                    logger.info(f"Skipping expand pattern '{pattern}' on layout {layout}: never matches")
+        
+        expanded_count = sum(opened.values())
+        logger.info(
+            f"Expanded {expanded_count} sections in {result.get('elapsed_ms', 0)}ms"
+            + ("" if result.get('settled', True) else " (page still changing at timeout)")
+        )
         return expanded_count
         
     def extract_enhanced_details(self, permit_number: str) -> Dict:
@@ -126,9 +111,8 @@ class Enhanced100PercentScraper:
         # First get base details using working scraper
         base_details = self._base_scraper.extract_permit_details()
         
-        # Expand all sections
-        self.expand_all_sections()
-        time.sleep(1)
+        # Expand all sections; returns once the expanded content has settled
+        self.expand_all_sections(base_details.page_structure_hash)
         
         # Extract additional fields
         enhanced_details = {
@@ -147,7 +131,9 @@ class Enhanced100PercentScraper:
         self._extract_dates(enhanced_details)
         self._extract_financial_data(enhanced_details)
         self._extract_property_data(enhanced_details)
-        self._extract_from_tables(enhanced_details)
+        # One round trip for all two-cell table rows of the expanded page
+        page = self._base_scraper.capture_page()
+        self._extract_from_tables(enhanced_details, page.table_pairs)
         
         # Calculate new completeness
         enhanced_details['completeness_score'] = self._calculate_completeness(enhanced_details)
@@ -273,36 +259,41 @@ class Enhanced100PercentScraper:
         except Exception as e:
             logger.debug(f"Error extracting property data: {e}")
             
-    def _extract_from_tables(self, details: Dict):
-        """Extract data from all tables"""
+    def _read_table_pairs(self) -> List[List[str]]:
+        """Two-cell table rows element by element (fallback when the page script fails)"""
+        pairs = []
+        for table in self.driver.find_elements(By.TAG_NAME, "table"):
+            for row in table.find_elements(By.TAG_NAME, "tr"):
+                cells = row.find_elements(By.TAG_NAME, "td")
+                if len(cells) == 2:
+                    pairs.append([cells[0].text.strip(), cells[1].text.strip()])
+        return pairs
+    
+    def _extract_from_tables(self, details: Dict, pairs: Optional[List[List[str]]] = None):
+        """Extract data from all two-cell table rows (as captured by the page script)"""
         try:
-            tables = self.driver.find_elements(By.TAG_NAME, "table")
+            if not pairs:
+                pairs = self._read_table_pairs()
             
-            for table in tables:
-                rows = table.find_elements(By.TAG_NAME, "tr")
+            for label, value in pairs:
+                label = label.strip().lower()
+                value = value.strip()
                 
-                for row in rows:
-                    cells = row.find_elements(By.TAG_NAME, "td")
-                    
-                    if len(cells) == 2:
-                        label = cells[0].text.strip().lower()
-                        value = cells[1].text.strip()
+                if value and value != 'N/A':
+                    # Map common labels
+                    if 'description' in label and 'description' not in details:
+                        details['description'] = value
+                    elif 'subdivision' in label and 'subdivision' not in details:
+                        details['subdivision'] = value
+                    elif 'lot' in label and 'lot' not in details:
+                        details['lot'] = value
+                    elif 'block' in label and 'block' not in details:
+                        details['block'] = value
+                    elif 'construction type' in label and 'construction_type' not in details:
+                        details['construction_type'] = value
+                    elif 'dwelling unit' in label and 'dwelling_units' not in details:
+                        details['dwelling_units'] = value
                         
-                        if value and value != 'N/A':
-                            # Map common labels
-                            if 'description' in label and 'description' not in details:
-                                details['description'] = value
-                            elif 'subdivision' in label and 'subdivision' not in details:
-                                details['subdivision'] = value
-                            elif 'lot' in label and 'lot' not in details:
-                                details['lot'] = value
-                            elif 'block' in label and 'block' not in details:
-                                details['block'] = value
-                            elif 'construction type' in label and 'construction_type' not in details:
-                                details['construction_type'] = value
-                            elif 'dwelling unit' in label and 'dwelling_units' not in details:
-                                details['dwelling_units'] = value
-                                
         except Exception as e:
             logger.debug(f"Error extracting from tables: {e}")
             
@@ -425,11 +416,16 @@ class Enhanced100PercentScraper:
 if __name__ == "__main__":
     test_permits = ['BD25-23553', 'BD25-23477', 'BD25-23463']
     
+    from scraper.metrics_server import health, start_metrics_server
+    init_logging()
+    start_metrics_server()
+    
     scraper = Enhanced100PercentScraper()
     scraper.setup_driver()
     
     try:
         scraper.login_to_clark_county()
+        health.set_ready(True)
         
         results = []
         for permit_number in test_permits:
@@ -1,46 +1,133 @@
 import os
 import boto3
 import json
-import random
-import string
+import time
 from botocore.exceptions import ClientError
 
+# Characters RDS does not accept in a master password
+EXCLUDED_CHARACTERS = "/@\"' \\"
+
+# Stop polling the instance this long before the Lambda would time out
+DEADLINE_MARGIN_MS = 15000
+
 
 def lambda_handler(event, context):
-    secret_arn = os.environ["DB_SECRET_ARN"]
+    """
+    Secrets Manager rotation for the RDS master password
+
+    Secrets Manager calls this once per step with the same ClientRequestToken:
+    createSecret stores the new password as AWSPENDING before anything else
+    changes, setSecret applies it to the instance, testSecret waits until RDS
+    has finished applying it, and finishSecret moves AWSCURRENT to it. Every
+    step is safe to repeat, so a failed or timed-out step is retried without
+    losing the pending password.
+    """
+    secret_arn = event["SecretId"]
+    token = event["ClientRequestToken"]
+    step = event["Step"]
     db_instance_id = os.environ["DB_INSTANCE_ID"]
     region = os.environ.get("AWS_REGION", "us-west-2")
 
     secrets_client = boto3.client("secretsmanager", region_name=region)
     rds_client = boto3.client("rds", region_name=region)
 
-    # Fetch current secret
-    secret = secrets_client.get_secret_value(SecretId=secret_arn)
-    secret_dict = json.loads(secret["SecretString"])
+    metadata = secrets_client.describe_secret(SecretId=secret_arn)
+    if not metadata.get("RotationEnabled"):
+        raise ValueError(f"Rotation is not enabled for secret {secret_arn}")
+    stages = metadata["VersionIdsToStages"].get(token)
+    if stages is None:
+        raise ValueError(f"Secret version {token} has no stage for rotation of {secret_arn}")
+    if "AWSCURRENT" in stages:
+        print(f"Secret version {token} is already AWSCURRENT")
+        return {"status": "success"}
+    if "AWSPENDING" not in stages:
+        raise ValueError(f"Secret version {token} is not AWSPENDING for rotation of {secret_arn}")
 
-    # Generate new password
-    new_password = ''.join(
-        random.choices(
-            string.ascii_letters + string.digits + string.punctuation, k=16
-        )
+    if step == "createSecret":
+        create_secret(secrets_client, secret_arn, token)
+    elif step == "setSecret":
+        set_secret(secrets_client, rds_client, secret_arn, token, db_instance_id)
+    elif step == "testSecret":
+        test_secret(rds_client, db_instance_id, context)
+    elif step == "finishSecret":
+        finish_secret(secrets_client, secret_arn, token, metadata)
+    else:
+        raise ValueError(f"Unknown rotation step {step}")
+    return {"status": "success"}
+
+
+def create_secret(secrets_client, secret_arn, token):
+    """Store a new password as AWSPENDING, unless this token already has one"""
+    try:
+        secrets_client.get_secret_value(SecretId=secret_arn, VersionId=token, VersionStage="AWSPENDING")
+        print(f"createSecret: pending version {token} already exists")
+        return
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ResourceNotFoundException":
+            raise
+
+    current = secrets_client.get_secret_value(SecretId=secret_arn, VersionStage="AWSCURRENT")
+    secret_dict = json.loads(current["SecretString"])
+    secret_dict["password"] = secrets_client.get_random_password(
+        PasswordLength=32, ExcludeCharacters=EXCLUDED_CHARACTERS
+    )["RandomPassword"]
+    secrets_client.put_secret_value(
+        SecretId=secret_arn,
+        ClientRequestToken=token,
+        SecretString=json.dumps(secret_dict),
+        VersionStages=["AWSPENDING"],
     )
+    print(f"createSecret: stored pending version {token}")
+
 
-    # Update RDS instance password
+def set_secret(secrets_client, rds_client, secret_arn, token, db_instance_id):
+    """Apply the pending password to the instance; RDS applies it asynchronously"""
+    pending = secrets_client.get_secret_value(SecretId=secret_arn, VersionId=token, VersionStage="AWSPENDING")
     try:
         rds_client.modify_db_instance(
             DBInstanceIdentifier=db_instance_id,
-            MasterUserPassword=new_password,
+            MasterUserPassword=json.loads(pending["SecretString"])["password"],
             ApplyImmediately=True
         )
     except ClientError as e:
         print(f"Failed to update RDS password: {e}")
         raise
+    print(f"setSecret: requested password change on {db_instance_id}")
 
-    # Update secret in Secrets Manager
-    secret_dict["password"] = new_password
-    secrets_client.put_secret_value(
-        SecretId=secret_arn,
-        SecretString=json.dumps(secret_dict)
+
+def password_applied(rds_client, db_instance_id):
+    """True once the instance is available with no master password change still pending"""
+    instance = rds_client.describe_db_instances(DBInstanceIdentifier=db_instance_id)["DBInstances"][0]
+    return (
+        instance["DBInstanceStatus"] == "available"
+        and "MasterUserPassword" not in instance.get("PendingModifiedValues", {})
     )
 
-    return {"status": "success"} 
\ No newline at end of file
+
+def test_secret(rds_client, db_instance_id, context):
+    """
+    Wait for RDS to finish applying the password
+
+    Right after modify_db_instance the instance can still report "available",
+    so the pending-modification list is checked too. Raises before the Lambda
+    timeout if the change is still in progress; Secrets Manager retries the
+    rotation and the pending version is reused.
+    """
+    while not password_applied(rds_client, db_instance_id):
+        if context.get_remaining_time_in_millis() < DEADLINE_MARGIN_MS:
+            raise RuntimeError(f"Password change on {db_instance_id} is still being applied")
+        time.sleep(5)
+    print(f"testSecret: password change on {db_instance_id} is applied")
+
+
+def finish_secret(secrets_client, secret_arn, token, metadata):
+    """Move AWSCURRENT to the pending version; clients refetching on auth failure now get it"""
+    current_version = next(
+        (version for version, stages in metadata["VersionIdsToStages"].items() if "AWSCURRENT" in stages),
+        None,
+    )
+    moves = {"MoveToVersionId": token}
+    if current_version is not None:
+        moves["RemoveFromVersionId"] = current_version
+    secrets_client.update_secret_version_stage(SecretId=secret_arn, VersionStage="AWSCURRENT", **moves)
+    print(f"finishSecret: version {token} is now AWSCURRENT")
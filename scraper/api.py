@@ -0,0 +1,400 @@
+"""
+Read API over the unified ``permits`` table, served on the metrics port
+
+Routes (registered on ``scraper.metrics_server``):
+  - ``/permit?number=BD25-00001``: one permit, 404 if unknown
+  - ``/permits``: filtered list, keyset-paginated. Filters: ``status``,
+    ``parcel_number``, ``contractor``, ``opened_from``/``opened_to``
+    (``date_opened``, ``to`` exclusive) and ``updated_since``. Pages hold
+    ``limit`` rows (default 100, max 1000) plus an opaque ``next`` cursor to
+    pass back as ``after``. ``format=ndjson`` streams every matching row.
+  - ``/search?q=solar+panels``: full-text matches ranked by relevance
+    (``limit`` default 20, max 100)
+  - ``/cluster?number=BD25-00001``: every permit in the same development
+    (linked by related-permit links or a shared parcel)
+  - ``/nearby?lat=36.17&lon=-115.14&miles=1``: geocoded permits within a
+    radius, nearest first (``miles`` max 25, ``limit`` default/max 500)
+
+Pagination never uses OFFSET: each page seeks past the last (sort key, id)
+through ``idx_permit_date_status``, ``idx_permit_updated`` or the filtered
+column's index, so page latency does not grow with table size. Rows are
+read as plain tuples and serialized through a precompiled row plan
+(``scraper.database.serialize``), without ORM objects. JSON pages are kept
+in an in-process TTL cache that the DatabaseManager write path invalidates.
+
+Usage:
+    python -m scraper.api          # standalone read service on METRICS_PORT
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from loguru import logger
+from sqlalchemy import and_, or_, select
+
+from scraper.coercion import parse_date
+from scraper.database.manager import DatabaseManager
+from scraper.database.serialize import dumps, row_plan, rows_to_ndjson
+from scraper.database.unified_schema import Permit
+from scraper.instrumentation import API_LATENCY, CACHE_REQUESTS
+from scraper.metrics_server import Response, health, register_route, start_metrics_server
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_RADIUS_MILES = 25.0
+MAX_NEARBY_LIMIT = 500
+MAX_PAGE_SIZE = 1000
+# Rows fetched per keyset query while streaming NDJSON
+STREAM_PAGE_SIZE = 1000
+CACHE_TTL_SECONDS = float(os.getenv("API_CACHE_TTL_SECONDS", "30"))
+CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "2048"))
+# Request threads expected to query at once when DB_CONCURRENCY is not set
+DEFAULT_DB_CONCURRENCY = 4
+
+PERMIT_PLAN = row_plan(Permit.__table__)
+
+# Query parameter -> equality-filtered column
+EQUALITY_FILTERS = {
+    "status": Permit.status,
+    "parcel_number": Permit.parcel_number,
+    "contractor": Permit.contractor_name,
+}
+
+
+class BadRequest(ValueError):
+    """Invalid query parameters; served as 400"""
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ``ttl`` seconds"""
+
+    def __init__(self, ttl: float = CACHE_TTL_SECONDS, max_entries: int = CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def generation(self) -> int:
+        """Bumped by every ``invalidate``; pass it to ``set`` to detect a write during a build"""
+        with self._lock:
+            return self._generation
+
+    def set(self, key: tuple, value: bytes, generation: Optional[int] = None) -> None:
+        """Cache ``value``, unless ``generation`` is given and an invalidation has happened since"""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, permit_numbers: Set[str]) -> None:
+        """
+        Drop entries a write to ``permit_numbers`` may have changed
+
+        Single-permit entries of other permits survive; any list page could
+        contain a written permit, so all of them are dropped.
+        """
+        with self._lock:
+            self._generation += 1
+            stale = [
+                key for key in self._entries
+                if key[0] != "permit" or key[1] in permit_numbers
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def _first(query: Dict[str, list], name: str) -> Optional[str]:
+    values = query.get(name)
+    return values[0] if values else None
+
+
+def _date_param(query: Dict[str, list], name: str) -> Optional[datetime]:
+    value = _first(query, name)
+    if value is None:
+        return None
+    parsed = parse_date(value)
+    if parsed is None:
+        raise BadRequest(f"{name}: unrecognized date {value!r}")
+    return parsed
+
+
+def encode_cursor(sort_value: Any, permit_id: int) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([sort_value, permit_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    try:
+        sort_value, permit_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, int(permit_id)
+    except (ValueError, TypeError):
+        raise BadRequest(f"after: invalid cursor {cursor!r}")
+
+
+class PermitQueryService:
+    """Keyset-paginated permit queries with a TTL cache of serialized pages"""
+
+    def __init__(self, db_manager: DatabaseManager, cache: Optional[TTLCache] = None):
+        self.db_manager = db_manager
+        self.cache = cache if cache is not None else TTLCache()
+        db_manager.add_write_listener(self.cache.invalidate)
+
+    def _cached(self, key: tuple, build) -> bytes:
+        body = self.cache.get(key)
+        CACHE_REQUESTS.inc(cache="api", result="miss" if body is None else "hit")
+        if body is None:
+            # A body read before a concurrent write commits must not outlive that write's invalidation
+            generation = self.cache.generation()
+            body = build()
+            self.cache.set(key, body, generation)
+        return body
+
+    def get_permit(self, permit_number: str) -> Optional[bytes]:
+        """Serialized permit by number (cached), falling back to the cold archive; None if unknown"""
+        def build() -> bytes:
+            session = self.db_manager.SessionLocal()
+            try:
+                row = session.execute(
+                    select(*PERMIT_PLAN.columns).where(Permit.permit_number == permit_number)
+                ).first()
+                if row is None:
+                    archived = self.db_manager.archived_permit(permit_number)
+                    if archived is None:
+                        return b""
+                    row = [archived[column.name] for column in PERMIT_PLAN.columns]
+                return dumps(PERMIT_PLAN.to_dict(row))
+            finally:
+                session.close()
+
+        return self._cached(("permit", permit_number), build) or None
+
+    def _statement(self, query: Dict[str, list]):
+        """Build the filtered, ordered SELECT and return it with its sort column"""
+        stmt = select(*PERMIT_PLAN.columns)
+        for name, column in EQUALITY_FILTERS.items():
+            value = _first(query, name)
+            if value is not None:
+                stmt = stmt.where(column == value)
+        opened_from = _date_param(query, "opened_from")
+        opened_to = _date_param(query, "opened_to")
+        updated_since = _date_param(query, "updated_since")
+        if opened_from or opened_to:
+            sort_column = Permit.date_opened
+            if opened_from:
+                stmt = stmt.where(Permit.date_opened >= opened_from)
+            if opened_to:
+                stmt = stmt.where(Permit.date_opened < opened_to)
+        elif updated_since:
+            sort_column = Permit.updated_at
+            stmt = stmt.where(Permit.updated_at >= updated_since)
+        else:
+            sort_column = Permit.id
+        return stmt, sort_column
+
+    def _page(self, session, stmt, sort_column, after: Optional[Tuple[Any, int]],
+              limit: int) -> Tuple[List[Any], Optional[Tuple[Any, int]]]:
+        if after is not None:
+            sort_value, last_id = after
+            if sort_column is Permit.id:
+                stmt = stmt.where(Permit.id > last_id)
+            else:
+                try:
+                    sort_value = datetime.fromisoformat(sort_value)
+                except (TypeError, ValueError):
+                    raise BadRequest("after: cursor does not match this query")
+                stmt = stmt.where(or_(
+                    sort_column > sort_value,
+                    and_(sort_column == sort_value, Permit.id > last_id),
+                ))
+        if sort_column is Permit.id:
+            stmt = stmt.order_by(Permit.id)
+        else:
+            stmt = stmt.order_by(sort_column, Permit.id)
+        # One extra row tells whether another page exists
+        permits = list(session.execute(stmt.limit(limit + 1)))
+        has_more = len(permits) > limit
+        permits = permits[:limit]
+        if not has_more:
+            return permits, None
+        last = permits[-1]
+        return permits, (getattr(last, sort_column.key), last.id)
+
+    def list_permits(self, query: Dict[str, list]) -> bytes:
+        """One JSON page ``{"items": [...], "next": cursor-or-null}`` (cached)"""
+        try:
+            limit = min(int(_first(query, "limit") or DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+        except ValueError:
+            raise BadRequest("limit must be an integer")
+        if limit < 1:
+            raise BadRequest("limit must be positive")
+        cursor = _first(query, "after")
+        after = decode_cursor(cursor) if cursor else None
+        stmt, sort_column = self._statement(query)
+
+        def build() -> bytes:
+            session = self.db_manager.SessionLocal()
+            try:
+                permits, next_key = self._page(session, stmt, sort_column, after, limit)
+                return dumps({
+                    "items": PERMIT_PLAN.dicts(permits),
+                    "next": encode_cursor(*next_key) if next_key else None,
+                })
+            finally:
+                session.close()
+
+        key = ("list",) + tuple(sorted((k, tuple(v)) for k, v in query.items() if k != "format"))
+        return self._cached(key, build)
+
+    def search(self, text: str, limit: int = DEFAULT_SEARCH_LIMIT) -> bytes:
+        """Ranked full-text matches as ``{"items": [...]}`` (cached)"""
+        def build() -> bytes:
+            return dumps({"items": self.db_manager.search_permits(text, limit)})
+
+        return self._cached(("search", text, limit), build)
+
+    def cluster(self, permit_number: str) -> bytes:
+        """The permit's project cluster as ``{"items": [...]}`` (cached)"""
+        def build() -> bytes:
+            return dumps({"items": self.db_manager.project_cluster(permit_number)})
+
+        return self._cached(("cluster", permit_number), build)
+
+    def nearby(self, latitude: float, longitude: float, miles: float,
+               limit: int = MAX_NEARBY_LIMIT) -> bytes:
+        """Permits within ``miles`` of a point as ``{"items": [...]}`` (cached)"""
+        def build() -> bytes:
+            return dumps({"items": self.db_manager.permits_within(latitude, longitude, miles, limit)})
+
+        return self._cached(("nearby", latitude, longitude, miles, limit), build)
+
+    def stream_permits(self, query: Dict[str, list]) -> Iterator[bytes]:
+        """Every matching permit as NDJSON, fetched in keyset pages (not cached)"""
+        stmt, sort_column = self._statement(query)
+        cursor = _first(query, "after")
+        after = decode_cursor(cursor) if cursor else None
+
+        def generate() -> Iterator[bytes]:
+            session = self.db_manager.SessionLocal()
+            position = after
+            try:
+                # Timed around the whole stream: the body is produced while the response is written
+                with API_LATENCY.span("permits_ndjson"):
+                    while True:
+                        permits, position = self._page(session, stmt, sort_column, position, STREAM_PAGE_SIZE)
+                        if permits:
+                            yield rows_to_ndjson(permits, PERMIT_PLAN)
+                        if position is None:
+                            return
+            finally:
+                session.close()
+
+        return generate()
+
+    # Route handlers
+
+    def permit_route(self, query: Dict[str, list]) -> Response:
+        number = _first(query, "number")
+        if not number:
+            return 400, "text/plain", b"number is required\n"
+        with API_LATENCY.span("permit"):
+            body = self.get_permit(number)
+        if body is None:
+            return 404, "application/json", dumps({"error": f"permit {number} not found"})
+        return 200, "application/json", body
+
+    def permits_route(self, query: Dict[str, list]) -> Response:
+        try:
+            if _first(query, "format") == "ndjson":
+                return 200, "application/x-ndjson", self.stream_permits(query)
+            with API_LATENCY.span("permits"):
+                return 200, "application/json", self.list_permits(query)
+        except BadRequest as e:
+            return 400, "text/plain", f"{e}\n".encode()
+
+    def search_route(self, query: Dict[str, list]) -> Response:
+        text = (_first(query, "q") or "").strip()
+        if not text:
+            return 400, "text/plain", b"q is required\n"
+        try:
+            limit = min(int(_first(query, "limit") or DEFAULT_SEARCH_LIMIT), MAX_SEARCH_LIMIT)
+        except ValueError:
+            return 400, "text/plain", b"limit must be an integer\n"
+        with API_LATENCY.span("search"):
+            return 200, "application/json", self.search(text, max(limit, 1))
+
+    def cluster_route(self, query: Dict[str, list]) -> Response:
+        number = _first(query, "number")
+        if not number:
+            return 400, "text/plain", b"number is required\n"
+        with API_LATENCY.span("cluster"):
+            return 200, "application/json", self.cluster(number)
+
+    def nearby_route(self, query: Dict[str, list]) -> Response:
+        try:
+            latitude = float(_first(query, "lat") or "")
+            longitude = float(_first(query, "lon") or "")
+            miles = float(_first(query, "miles") or "1")
+            limit = int(_first(query, "limit") or MAX_NEARBY_LIMIT)
+        except ValueError:
+            return 400, "text/plain", b"lat and lon are required; miles and limit must be numbers\n"
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or not 0 < miles <= MAX_RADIUS_MILES:
+            return 400, "text/plain", f"coordinates out of range or miles not in (0, {MAX_RADIUS_MILES}]\n".encode()
+        with API_LATENCY.span("nearby"):
+            return 200, "application/json", self.nearby(
+                latitude, longitude, miles, max(1, min(limit, MAX_NEARBY_LIMIT))
+            )
+
+
+def register_api_routes(service: PermitQueryService) -> None:
+    """Serve ``service`` on the metrics server's port"""
+    register_route("/permit", service.permit_route)
+    register_route("/permits", service.permits_route)
+    register_route("/search", service.search_route)
+    register_route("/cluster", service.cluster_route)
+    register_route("/nearby", service.nearby_route)
+
+
+def main() -> None:
+    # Request threads share one pool; DB_CONCURRENCY caps how many query at once
+    service = PermitQueryService(DatabaseManager(concurrency=int(os.getenv("DB_CONCURRENCY", DEFAULT_DB_CONCURRENCY))))
+    register_api_routes(service)
+    server = start_metrics_server()
+    health.set_ready(True)
+    if server is None:
+        logger.error("METRICS_PORT is 0; read API not started")
+        return
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
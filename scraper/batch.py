@@ -0,0 +1,411 @@
+"""
+Sharded multi-process batch runner for permit detail scrapes
+
+Permit numbers come from a file, stdin or the database. They are split into
+one shard per worker process. Each worker owns its own browser session and
+streams results over a queue to a single writer process. The writer batches
+the successful rows into ``DatabaseManager.upsert_permits`` and prints a
+live throughput/ETA line. The exit code reports whether failures stayed
+within the configured thresholds, so a CronJob run fails visibly.
+
+Usage:
+    python -m scraper.batch --input permits.txt --workers 4
+    cat permits.txt | python -m scraper.batch --input - --workers 2
+    python -m scraper.batch --from-db --status Issued --limit 5000
+"""
+
+import argparse
+import math
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from datetime import datetime
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, TextIO, Tuple
+
+from loguru import logger
+
+from scraper.browser import BrowserUnavailable
+from scraper.instrumentation import StageTimer
+
+PERMIT_URL_TEMPLATE = os.getenv(
+    "PERMIT_URL_TEMPLATE",
+    "https://aca-prod.accela.com/CLARKCO/Cap/CapDetail.aspx?Module=Building&PermitNumber={number}",
+)
+
+EXIT_OK = 0
+EXIT_FAILURE_THRESHOLD = 1
+EXIT_ERROR = 2
+
+DEFAULT_WRITE_BATCH = 100
+# Seconds between progress lines when stderr is not a terminal (e.g. pod logs)
+LOG_PROGRESS_INTERVAL = 30.0
+
+# Queue messages: (kind, permit_number, row, errors)
+RESULT = "result"
+STOP = "stop"
+
+
+def permit_url(permit_number: str) -> str:
+    return PERMIT_URL_TEMPLATE.format(number=permit_number)
+
+
+def read_numbers(lines: Iterable[str]) -> List[str]:
+    """Permit numbers from text lines; blanks, ``#`` comments and duplicates are skipped"""
+    seen = set()
+    numbers = []
+    for line in lines:
+        number = line.split("#", 1)[0].strip()
+        if number and number not in seen:
+            seen.add(number)
+            numbers.append(number)
+    return numbers
+
+
+def numbers_from_db(db_manager, statuses: Sequence[str] = (), limit: Optional[int] = None) -> List[str]:
+    """Stored permit numbers, least recently scraped (or never scraped) first"""
+    from sqlalchemy import nulls_first, select
+
+    from scraper.database.unified_schema import Permit
+
+    # updated_at only moves when a scrape changes something; last_scraped moves on every scrape
+    stmt = select(Permit.permit_number).order_by(nulls_first(Permit.last_scraped), Permit.id)
+    if statuses:
+        stmt = stmt.where(Permit.status.in_(list(statuses)))
+    if limit:
+        stmt = stmt.limit(limit)
+    with db_manager.engine.connect() as conn:
+        return list(conn.execute(stmt).scalars())
+
+
+def cgroup_cpu_limit(root: str = "/sys/fs/cgroup") -> Optional[float]:
+    """CPUs allowed by the cgroup CPU quota (e.g. a container's limit), or None when unlimited or unknown"""
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open(os.path.join(root, "cpu.max")) as f:
+            quota, period = f.read().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1: a quota of -1 means unlimited
+        with open(os.path.join(root, "cpu", "cpu.cfs_quota_us")) as f:
+            quota_us = int(f.read())
+        with open(os.path.join(root, "cpu", "cpu.cfs_period_us")) as f:
+            period_us = int(f.read())
+    except (OSError, ValueError):
+        return None
+    return quota_us / period_us if quota_us > 0 and period_us > 0 else None
+
+
+def available_cpus(cgroup_root: str = "/sys/fs/cgroup") -> int:
+    """CPUs this process may use: its affinity mask, capped by the cgroup quota"""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    limit = cgroup_cpu_limit(cgroup_root)
+    if limit is not None:
+        cpus = min(cpus, max(1, math.ceil(limit)))
+    return cpus
+
+
+def shard(numbers: Sequence[str], shards: int) -> List[List[str]]:
+    """Round-robin split so every shard gets a similar mix of old and new permits"""
+    return [list(numbers[i::shards]) for i in range(shards)]
+
+
+class DetailWorker:
+    """One browser session scraping permits for a worker process"""
+
+    def __init__(self):
+        from scraper.enhanced_detail_scraper_final import EnhancedDetailScraper, PermitDetails
+        from scraper.scrape_cache import ScrapeCache
+
+        # A shared SCRAPE_CACHE_URL lets workers reuse each other's fresh results
+        self.scraper = EnhancedDetailScraper(headless=True, result_cache=ScrapeCache.from_env(PermitDetails))
+        self.scraper.setup_driver()
+        if not self.scraper.login_to_clark_county():
+            self.scraper.close()
+            raise RuntimeError("Login failed")
+
+    def scrape(self, permit_number: str) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        """(upsert row, []) on success, (None, errors) on failure"""
+        from scraper.database.mapping import permit_row_from_details
+
+        details = self.scraper.scrape_permit(permit_url(permit_number), save=False)
+        if details is None or details.extraction_errors:
+            return None, list(details.extraction_errors) if details else ["Unknown error"]
+        return permit_row_from_details(details), []
+
+    def close(self) -> None:
+        self.scraper.close()
+
+
+class DatabaseSink:
+    """Writer-side sink upserting result rows through ``DatabaseManager``"""
+
+    def __init__(self, database_url: Optional[str] = None):
+        from scraper.database.manager import DatabaseManager
+
+        self.db_manager = DatabaseManager(database_url)
+        self.db_manager.create_tables()
+        self.timer = StageTimer()
+        self.started = datetime.utcnow()
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        with self.timer.span("db_write"):
+            self.db_manager.upsert_permits(rows, changed_by="batch")
+
+    def close(self, totals: Dict[str, Any]) -> None:
+        self.db_manager.record_scrape_run(
+            run_id=f"batch-{self.started:%Y%m%dT%H%M%S}",
+            scraper_type="BatchRunner",
+            start_time=self.started,
+            timer=self.timer,
+            status="completed" if not totals["failed"] else "completed_with_errors",
+            permits_processed=totals["done"],
+            errors_count=totals["failed"],
+        )
+
+
+class Progress:
+    """Completed/failed counters with a one-line throughput and ETA summary"""
+
+    def __init__(self, total: int, clock: Callable[[], float] = time.monotonic):
+        self.total = total
+        self.succeeded = 0
+        self.failed = 0
+        self.clock = clock
+        self.started = clock()
+
+    @property
+    def done(self) -> int:
+        return self.succeeded + self.failed
+
+    def line(self) -> str:
+        elapsed = max(self.clock() - self.started, 1e-9)
+        rate = self.done / elapsed
+        remaining = self.total - self.done
+        eta = _format_seconds(remaining / rate) if rate > 0 else "--:--:--"
+        percent = 100.0 * self.done / self.total if self.total else 100.0
+        return (
+            f"{self.done}/{self.total} permits ({percent:.1f}%) | {self.failed} failed | "
+            f"{rate:.2f}/s | elapsed {_format_seconds(elapsed)} | ETA {eta}"
+        )
+
+    def totals(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "done": self.done,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "seconds": round(self.clock() - self.started, 3),
+        }
+
+
+def _format_seconds(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def exit_code(totals: Dict[str, Any], max_failure_rate: float, max_failures: Optional[int] = None) -> int:
+    """EXIT_FAILURE_THRESHOLD when failures exceed either threshold, else EXIT_OK"""
+    failed, total = totals["failed"], totals["total"]
+    if max_failures is not None and failed > max_failures:
+        return EXIT_FAILURE_THRESHOLD
+    if total and failed / total > max_failure_rate:
+        return EXIT_FAILURE_THRESHOLD
+    return EXIT_OK
+
+
+def _worker(index: int, numbers: List[str], worker_factory: Callable[[], Any], results) -> None:
+    try:
+        worker = worker_factory()
+    except Exception as e:
+        logger.error(f"Worker {index} could not start: {e}")
+        for number in numbers:
+            results.put((RESULT, number, None, [f"Worker setup failed: {e}"]))
+        return
+    try:
+        for position, number in enumerate(numbers):
+            try:
+                row, errors = worker.scrape(number)
+            except BrowserUnavailable as e:
+                logger.error(f"Worker {index} stopping: {e}")
+                for remaining in numbers[position:]:
+                    results.put((RESULT, remaining, None, [f"Worker browser unavailable: {e}"]))
+                return
+            except Exception as e:
+                row, errors = None, [f"General extraction error: {e}"]
+            results.put((RESULT, number, row, errors))
+    finally:
+        try:
+            worker.close()
+        except Exception as e:
+            logger.warning(f"Worker {index} close failed: {e}")
+
+
+def _writer(results, summary, total: int, sink_factory: Callable[[], Any], write_batch: int,
+            stream: Optional[TextIO] = None) -> None:
+    stream = stream or sys.stderr
+    live = stream.isatty()
+    progress = Progress(total)
+    sink = sink_factory()
+    pending: List[Dict[str, Any]] = []
+    last_print = 0.0
+
+    def flush() -> None:
+        if not pending:
+            return
+        try:
+            sink.write(pending)
+        except Exception as e:
+            # The rows were scraped but not stored; count them as failures
+            logger.error(f"Writing {len(pending)} permits failed: {e}")
+            progress.succeeded -= len(pending)
+            progress.failed += len(pending)
+        pending.clear()
+
+    while True:
+        try:
+            kind, number, row, errors = results.get(timeout=1.0)
+        except queue.Empty:
+            kind = None
+        if kind == STOP:
+            break
+        if kind == RESULT:
+            if row is not None:
+                progress.succeeded += 1
+                pending.append(row)
+            else:
+                progress.failed += 1
+                logger.warning(f"Permit {number} failed: {errors}")
+            if len(pending) >= write_batch:
+                flush()
+        now = time.monotonic()
+        if live and now - last_print >= 1.0:
+            stream.write(f"\r{progress.line()}\033[K")
+            stream.flush()
+            last_print = now
+        elif not live and now - last_print >= LOG_PROGRESS_INTERVAL:
+            logger.info(progress.line())
+            last_print = now
+
+    flush()
+    # Permits a crashed worker never reported count as failures
+    progress.failed += total - progress.done
+    if live:
+        stream.write(f"\r{progress.line()}\033[K\n")
+    logger.info(f"Batch finished: {progress.line()}")
+    totals = progress.totals()
+    try:
+        sink.close(totals)
+    except Exception as e:
+        logger.warning(f"Could not record the batch run: {e}")
+    summary.put(totals)
+
+
+def run_batch(numbers: Sequence[str], workers: int,
+              worker_factory: Callable[[], Any] = DetailWorker,
+              sink_factory: Callable[[], Any] = DatabaseSink,
+              write_batch: int = DEFAULT_WRITE_BATCH) -> Dict[str, Any]:
+    """
+    Scrape ``numbers`` across ``workers`` processes and write results from one writer process
+
+    Args:
+        worker_factory: Picklable callable building a per-process object with
+            ``scrape(number) -> (row | None, errors)`` and ``close()``
+        sink_factory: Picklable callable building the writer's sink with
+            ``write(rows)`` and ``close(totals)``
+
+    Returns:
+        Totals: total, done, succeeded, failed, seconds
+    """
+    workers = max(1, min(workers, len(numbers)))
+    ctx = multiprocessing.get_context()
+    results = ctx.Queue(maxsize=10 * DEFAULT_WRITE_BATCH)
+    summary = ctx.Queue()
+    writer = ctx.Process(
+        target=_writer, args=(results, summary, len(numbers), sink_factory, write_batch), name="batch-writer"
+    )
+    writer.start()
+    processes = [
+        ctx.Process(target=_worker, args=(i, shard_numbers, worker_factory, results), name=f"batch-worker-{i}")
+        for i, shard_numbers in enumerate(shard(numbers, workers))
+    ]
+    for process in processes:
+        process.start()
+    while any(process.is_alive() for process in processes):
+        if not writer.is_alive():
+            # Nothing drains the bounded queue any more; workers would block forever
+            logger.error("Batch writer died, stopping workers")
+            for process in processes:
+                process.terminate()
+            break
+        wait([process.sentinel for process in processes if process.is_alive()], timeout=1.0)
+    for process in processes:
+        process.join()
+        if process.exitcode:
+            logger.error(f"{process.name} exited with code {process.exitcode}")
+    totals = None
+    if writer.is_alive():
+        results.put((STOP, None, None, None))
+    while totals is None and (writer.is_alive() or not summary.empty()):
+        try:
+            totals = summary.get(timeout=1.0)
+        except queue.Empty:
+            pass
+    writer.join(timeout=10)
+    if totals is None:
+        raise RuntimeError("Batch writer exited without a summary")
+    return totals
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Scrape permit details in parallel worker processes")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="File of permit numbers, one per line ('-' for stdin)")
+    source.add_argument("--from-db", action="store_true", help="Re-scrape stored permits, stalest first")
+    parser.add_argument("--status", action="append", default=[], help="With --from-db, only these statuses")
+    parser.add_argument("--limit", type=int, help="Scrape at most this many permits")
+    parser.add_argument("--workers", type=int, default=available_cpus(),
+                        help="Worker processes, one browser each (default: CPUs allowed by affinity and cgroup quota)")
+    parser.add_argument("--database-url", help="Target database URL (default: config loader)")
+    parser.add_argument("--write-batch", type=int, default=DEFAULT_WRITE_BATCH)
+    parser.add_argument("--max-failure-rate", type=float, default=0.05,
+                        help="Exit non-zero when the failed fraction exceeds this")
+    parser.add_argument("--max-failures", type=int, help="Exit non-zero when more permits than this fail")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        if args.input == "-":
+            numbers = read_numbers(sys.stdin)
+        else:
+            with open(args.input) as f:
+                numbers = read_numbers(f)
+        numbers = numbers[:args.limit] if args.limit else numbers
+    else:
+        from scraper.database.manager import DatabaseManager
+        numbers = numbers_from_db(DatabaseManager(args.database_url), args.status, args.limit)
+    if not numbers:
+        logger.error("No permit numbers to scrape")
+        return EXIT_ERROR
+
+    sink_factory = DatabaseSink
+    if args.database_url:
+        from functools import partial
+        sink_factory = partial(DatabaseSink, args.database_url)
+    logger.info(f"Scraping {len(numbers)} permits with {min(args.workers, len(numbers))} workers")
+    try:
+        totals = run_batch(numbers, args.workers, sink_factory=sink_factory, write_batch=args.write_batch)
+    except RuntimeError as e:
+        logger.error(str(e))
+        return EXIT_ERROR
+    code = exit_code(totals, args.max_failure_rate, args.max_failures)
+    if code != EXIT_OK:
+        logger.error(f"Failure threshold exceeded: {totals['failed']} of {totals['total']} permits failed")
+    return code
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""
+Benchmark full-text search against LIKE scans on synthetic permits
+
+Usage:
+    python -m scraper.benchmarks.search_vs_like --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Dict, List
+
+from sqlalchemy import insert, text
+
+from scraper.database.manager import DatabaseManager, permits_table
+from scraper.database.search import SEARCH_COLUMNS, ensure_search_index, search_permits
+from scraper.database.unified_schema import Base
+
+WORK = ["solar", "pool", "spa", "roof", "reroof", "addition", "garage", "patio", "cover",
+        "kitchen", "remodel", "electrical", "panel", "upgrade", "hvac", "water", "heater",
+        "fence", "wall", "sign", "demolition", "tenant", "improvement", "photovoltaic"]
+FILLER = ["residential", "commercial", "single", "family", "dwelling", "new", "replace",
+          "existing", "install", "per", "plans", "sq", "ft", "unit", "building", "interior"]
+TERMS = ["solar", "pool", "kitchen remodel", "photovoltaic", "demolition"]
+INSERT_CHUNK = 50_000
+
+
+def _phrase(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORK) if rng.random() < 0.3 else rng.choice(FILLER) for _ in range(words))
+
+
+def _load(manager: DatabaseManager, rows: int, seed: int) -> None:
+    rng = random.Random(seed)
+    with manager.engine.begin() as conn:
+        for start in range(0, rows, INSERT_CHUNK):
+            conn.execute(insert(permits_table), [
+                {
+                    "permit_number": f"BD{i:08d}",
+                    "status": rng.choice(("Open", "Issued", "Finaled")),
+                    "project_name": _phrase(rng, 3),
+                    "description": _phrase(rng, 12),
+                    "work_description": _phrase(rng, 8),
+                }
+                for i in range(start, min(start + INSERT_CHUNK, rows))
+            ])
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(rows: int, seed: int = 0, path: str = None) -> List[Dict[str, float]]:
+    """Build a synthetic database and time LIKE vs full-text for each term in TERMS"""
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(f"sqlite:///{path or os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(manager.engine)
+        load_seconds = _timed(lambda: _load(manager, rows, seed))
+        index_seconds = _timed(lambda: ensure_search_index(manager.engine))
+        print(f"{rows:,} rows loaded in {load_seconds:.1f}s, full-text index built in {index_seconds:.1f}s")
+
+        results = []
+        with manager.engine.connect() as conn:
+            for term in TERMS:
+                words = term.split()
+                like = " AND ".join(
+                    "(" + " OR ".join(f"{column} LIKE :w{n}" for column in SEARCH_COLUMNS) + ")"
+                    for n in range(len(words))
+                )
+                like_params = {f"w{n}": f"%{word}%" for n, word in enumerate(words)}
+                counts = {}
+                like_seconds = _timed(lambda: counts.__setitem__("like", conn.execute(
+                    text(f"SELECT count(*) FROM permits WHERE {like}"), like_params).scalar()))
+                fts_seconds = _timed(lambda: counts.__setitem__("fts", conn.execute(
+                    text("SELECT count(*) FROM permits_fts WHERE permits_fts MATCH :q"),
+                    {"q": " ".join(f'"{w}"' for w in words)}).scalar()))
+                ranked_seconds = _timed(lambda: search_permits(manager.engine, term, limit=20))
+                results.append({
+                    "term": term, "like_matches": counts["like"], "fts_matches": counts["fts"],
+                    "like_ms": like_seconds * 1000, "fts_ms": fts_seconds * 1000,
+                    "ranked_top20_ms": ranked_seconds * 1000,
+                })
+        manager.engine.dispose()
+
+    print(f"{'term':<18}{'LIKE ms':>10}{'FTS ms':>10}{'top-20 ms':>11}{'speedup':>9}{'LIKE n':>10}{'FTS n':>10}")
+    for r in results:
+        speedup = r["like_ms"] / max(r["fts_ms"], 1e-6)
+        print(f"{r['term']:<18}{r['like_ms']:>10.1f}{r['fts_ms']:>10.1f}{r['ranked_top20_ms']:>11.1f}"
+              f"{speedup:>8.1f}x{r['like_matches']:>10,}{r['fts_matches']:>10,}")
+    # LIKE also matches substrings ("pool" in "spool"), so counts can differ slightly from token matches
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", help="Keep the generated database at this path")
+    args = parser.parse_args()
+    run(args.rows, args.seed, args.db)
+
+
+if __name__ == "__main__":
+    main()
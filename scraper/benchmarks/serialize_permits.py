@@ -0,0 +1,130 @@
+"""
+Benchmark permit serialization: ORM objects with the per-row to_dict vs Core rows through a RowPlan
+
+Usage:
+    python -m scraper.benchmarks.serialize_permits --rows 1000000
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from scraper.database.manager import DatabaseManager, permits_table
+from scraper.database.serialize import orjson, row_plan, rows_to_ndjson
+from scraper.database.unified_schema import Base, Permit
+
+INSERT_CHUNK = 50_000
+READ_CHUNK = 10_000
+
+
+def legacy_to_dict(permit) -> Dict[str, object]:
+    """``Permit.to_dict`` as it was before row plans, kept as the baseline"""
+    result = {}
+    for column in permit.__table__.columns:
+        value = getattr(permit, column.name)
+        if isinstance(value, (datetime, date)):
+            result[column.name] = value.isoformat()
+        elif column.name in ["job_value", "total_fees", "paid_fees", "balance_due", "square_footage", "property_acreage"]:
+            result[column.name] = str(value) if value is not None else ""
+        elif column.name == "completeness_score":
+            result[column.name] = value if value is not None else 0.0
+        elif column.name == "extraction_notes":
+            if value:
+                try:
+                    result[column.name] = json.loads(value)
+                except (json.JSONDecodeError, TypeError):
+                    result[column.name] = []
+            else:
+                result[column.name] = []
+        else:
+            result[column.name] = value if value is not None else ""
+    if "record_type" in result:
+        result["permit_type"] = result.pop("record_type")
+    return result
+
+
+def _load(manager: DatabaseManager, rows: int, seed: int) -> None:
+    rng = random.Random(seed)
+    start_day = datetime(2015, 1, 1)
+    with manager.engine.begin() as conn:
+        for start in range(0, rows, INSERT_CHUNK):
+            conn.execute(insert(permits_table), [
+                {
+                    "permit_number": f"BD{i:08d}",
+                    "record_type": rng.choice(("Building", "Electrical", "Plumbing")),
+                    "status": rng.choice(("Open", "Issued", "Finaled")),
+                    "address": f"{rng.randint(1, 9999)} Main St",
+                    "applied_date": start_day + timedelta(days=rng.randint(0, 3650)),
+                    "job_value": round(rng.uniform(500, 500000), 2),
+                    "total_fees": round(rng.uniform(50, 5000), 2),
+                    "completeness_score": rng.uniform(40, 100),
+                    "extraction_notes": json.dumps(["missing owner"] if rng.random() < 0.2 else []),
+                    "created_at": start_day,
+                    "updated_at": start_day,
+                }
+                for i in range(start, min(start + INSERT_CHUNK, rows))
+            ])
+
+
+def _legacy(manager: DatabaseManager) -> int:
+    written = 0
+    with Session(manager.engine) as session:
+        result = session.execute(select(Permit).execution_options(yield_per=READ_CHUNK))
+        for permits in result.scalars().partitions():
+            written += len(b"".join(json.dumps(legacy_to_dict(p), default=str).encode() + b"\n" for p in permits))
+    return written
+
+
+def _planned(manager: DatabaseManager) -> int:
+    plan = row_plan(permits_table)
+    written = 0
+    with manager.engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=READ_CHUNK).execute(select(*plan.columns))
+        for rows in result.partitions():
+            written += len(rows_to_ndjson(rows, plan))
+    return written
+
+
+def run(rows: int, seed: int = 0, path: str = None) -> List[Dict[str, float]]:
+    """Build a synthetic database and time both NDJSON paths over every row"""
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = DatabaseManager(f"sqlite:///{path or os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(manager.engine)
+        start = time.perf_counter()
+        _load(manager, rows, seed)
+        print(f"{rows:,} rows loaded in {time.perf_counter() - start:.1f}s (encoder: {'orjson' if orjson else 'json'})")
+
+        results = []
+        for name, fn in (("ORM + to_dict + json", _legacy), ("Core + RowPlan", _planned)):
+            start = time.perf_counter()
+            size = fn(manager)
+            seconds = time.perf_counter() - start
+            results.append({"path": name, "seconds": seconds, "rows_per_s": rows / seconds, "mb": size / 1e6})
+        manager.engine.dispose()
+
+    print(f"{'path':<24}{'seconds':>10}{'rows/s':>12}{'MB':>9}")
+    for r in results:
+        print(f"{r['path']:<24}{r['seconds']:>10.2f}{r['rows_per_s']:>12,.0f}{r['mb']:>9.1f}")
+    print(f"speedup: {results[0]['seconds'] / results[1]['seconds']:.1f}x")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", help="Keep the generated database at this path")
+    args = parser.parse_args()
+    run(args.rows, args.seed, args.db)
+
+
+if __name__ == "__main__":
+    main()
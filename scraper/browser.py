@@ -0,0 +1,250 @@
+"""
+Memory-bounded browser sessions
+
+Chrome's memory grows for as long as a session lives. ``RecyclingBrowser``
+tracks the resident memory of the driver's whole process tree and the number
+of pages it has loaded. Once either crosses its threshold, the browser is
+recycled between permits. New work waits, in-flight work drains, the
+session cookies are copied out, and a fresh browser is started with those
+cookies injected, so no new login is needed.
+
+Thresholds come from ``BROWSER_MAX_RSS_MB`` and ``BROWSER_MAX_PAGES``; RSS
+is read from ``/proc`` every ``BROWSER_RSS_CHECK_EVERY`` pages. Starting the
+replacement is tried ``BROWSER_START_ATTEMPTS`` times with backoff; if it
+still fails, later leases raise ``BrowserUnavailable`` so the worker stops
+instead of failing every remaining permit.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+from scraper.instrumentation import BROWSER_RECYCLES, BROWSERS
+
+MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "600"))
+MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "500"))
+RSS_CHECK_EVERY = int(os.getenv("BROWSER_RSS_CHECK_EVERY", "10"))
+START_ATTEMPTS = int(os.getenv("BROWSER_START_ATTEMPTS", "3"))
+
+# Cookie keys accepted by WebDriver's add_cookie
+COOKIE_KEYS = ("name", "value", "path", "domain", "secure", "httpOnly", "expiry", "sameSite")
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _parent_pids(proc: str) -> Dict[int, int]:
+    parents = {}
+    for entry in os.listdir(proc):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(os.path.join(proc, entry, "stat")) as f:
+                # "pid (comm) state ppid ..."; comm may itself contain spaces and parentheses
+                fields = f.read().rpartition(")")[2].split()
+            parents[int(entry)] = int(fields[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    return parents
+
+
+def process_tree_rss(pid: Optional[int], proc: str = "/proc") -> int:
+    """Resident bytes of ``pid`` and all of its descendants; 0 when /proc is unavailable"""
+    if not pid or not os.path.isdir(proc):
+        return 0
+    children: Dict[int, List[int]] = {}
+    for child, parent in _parent_pids(proc).items():
+        children.setdefault(parent, []).append(child)
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        try:
+            with open(os.path.join(proc, str(current), "statm")) as f:
+                total += int(f.read().split()[1]) * _PAGE_SIZE
+        except (OSError, IndexError, ValueError):
+            pass
+        stack.extend(children.get(current, ()))
+    return total
+
+
+def driver_pid(driver: Any) -> Optional[int]:
+    """PID of the chromedriver process behind a Selenium driver, if it can be found"""
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+
+class BrowserUnavailable(RuntimeError):
+    """The browser was recycled but no replacement could be started; the worker cannot continue"""
+
+
+class RecyclingBrowser:
+    """
+    A browser session that replaces itself when it uses too much memory or has loaded too many pages
+
+    Args:
+        factory: Builds a new WebDriver
+        base_url: Page on the session's domain, loaded before cookies are injected
+        on_replace: Called with each new driver so owners can refresh their references
+        max_rss_bytes: Recycle once the process tree's resident memory exceeds this
+        max_pages: Recycle after this many pages
+        rss_check_every: Pages between RSS measurements (each reads /proc)
+        rss_reader: Returns the resident bytes of a driver; defaults to process_tree_rss
+        start_attempts: Tries at starting the replacement driver, with exponential backoff
+        start_retry_delay: Seconds before the second try
+    """
+
+    def __init__(self, factory: Callable[[], Any], base_url: str,
+                 on_replace: Optional[Callable[[Any], None]] = None,
+                 max_rss_bytes: int = MAX_RSS_MB * 1024 * 1024,
+                 max_pages: int = MAX_PAGES,
+                 rss_check_every: int = RSS_CHECK_EVERY,
+                 rss_reader: Optional[Callable[[Any], int]] = None,
+                 start_attempts: int = START_ATTEMPTS, start_retry_delay: float = 2.0):
+        self.factory = factory
+        self.base_url = base_url
+        self.on_replace = on_replace
+        self.max_rss_bytes = max_rss_bytes
+        self.max_pages = max_pages
+        self.rss_check_every = max(1, rss_check_every)
+        self.rss_reader = rss_reader or (lambda driver: process_tree_rss(driver_pid(driver)))
+        self.start_attempts = max(1, start_attempts)
+        self.start_retry_delay = start_retry_delay
+        self.driver: Any = None
+        self.pages = 0
+        self.rss_bytes = 0
+        self.recycles = 0
+        self._in_flight = 0
+        self._recycle_reason: Optional[str] = None
+        self._broken: Optional[BrowserUnavailable] = None
+        self._cond = threading.Condition()
+
+    def start(self) -> Any:
+        self.driver = self.factory()
+        self.pages = 0
+        self.rss_bytes = 0
+        BROWSERS.inc(state="active")
+        if self.on_replace is not None:
+            self.on_replace(self.driver)
+        return self.driver
+
+    @contextmanager
+    def lease(self) -> Iterator[Any]:
+        """
+        Use the browser for one unit of work (one permit)
+
+        Leases wait while a recycle is pending. When the last lease ends and a
+        threshold has been crossed, the browser is recycled before the next
+        lease is granted. Once a recycle has failed to start a new browser,
+        every lease raises BrowserUnavailable.
+        """
+        with self._cond:
+            while self._recycle_reason is not None:
+                self._cond.wait()
+            if self._broken is not None:
+                raise self._broken
+            self._in_flight += 1
+        try:
+            yield self.driver
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self.pages += 1
+                if self._recycle_reason is None:
+                    self._recycle_reason = self._threshold_crossed()
+                if self._recycle_reason is not None and self._in_flight == 0:
+                    try:
+                        self._recycle(self._recycle_reason)
+                    finally:
+                        self._recycle_reason = None
+                        self._cond.notify_all()
+
+    def _threshold_crossed(self) -> Optional[str]:
+        if self.pages >= self.max_pages:
+            return "pages"
+        if self.pages % self.rss_check_every == 0:
+            self.rss_bytes = self.rss_reader(self.driver)
+            if self.rss_bytes > self.max_rss_bytes:
+                return "rss"
+        return None
+
+    def _recycle(self, reason: str) -> None:
+        started = time.monotonic()
+        BROWSERS.inc(state="recycling")
+        try:
+            cookies = self._cookies()
+            self._quit()
+            try:
+                self._restart()
+            except Exception as e:
+                # The lease that triggered the recycle has finished its work; the next one fails
+                self._broken = BrowserUnavailable(f"No browser after recycling ({reason}): {e}")
+                logger.error(str(self._broken))
+                if self.on_replace is not None:
+                    # Owners must not keep using the driver that was just quit
+                    self.on_replace(None)
+                return
+            self._inject_cookies(cookies)
+        finally:
+            BROWSERS.dec(state="recycling")
+        self.recycles += 1
+        BROWSER_RECYCLES.inc(reason=reason)
+        logger.info(
+            f"Recycled browser ({reason}: {self.rss_bytes / 1024 / 1024:.0f} MB RSS, "
+            f"{self.pages} pages) with {len(cookies)} cookies in {time.monotonic() - started:.1f}s"
+        )
+
+    def _restart(self) -> None:
+        for attempt in range(self.start_attempts):
+            try:
+                self.start()
+                return
+            except Exception as e:
+                if attempt + 1 == self.start_attempts:
+                    raise
+                delay = self.start_retry_delay * 2 ** attempt
+                logger.warning(f"Starting a new browser failed ({e}); retrying in {delay:.0f}s")
+                time.sleep(delay)
+
+    def _cookies(self) -> List[Dict[str, Any]]:
+        try:
+            return [{k: c[k] for k in COOKIE_KEYS if k in c} for c in self.driver.get_cookies()]
+        except Exception as e:
+            logger.warning(f"Could not read session cookies before recycling: {e}")
+            return []
+
+    def _inject_cookies(self, cookies: List[Dict[str, Any]]) -> None:
+        if not cookies:
+            return
+        # WebDriver only accepts cookies for the domain of the current page
+        try:
+            self.driver.get(self.base_url)
+        except Exception as e:
+            # Runs inside a lease; the session logs in again on the next lease instead
+            logger.warning(f"Could not open {self.base_url} to restore session cookies: {e}")
+            return
+        for cookie in cookies:
+            try:
+                self.driver.add_cookie(cookie)
+            except Exception as e:
+                logger.debug(f"Cookie {cookie.get('name')} not restored: {e}")
+
+    def _quit(self) -> None:
+        if self.driver is None:
+            return
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"Browser quit failed: {e}")
+        finally:
+            self.driver = None
+            BROWSERS.dec(state="active")
+
+    def close(self) -> None:
+        with self._cond:
+            self._quit()
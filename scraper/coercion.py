@@ -0,0 +1,209 @@
+"""
+Typed coercion of scraped strings into unified schema types
+
+Values scraped from ACA pages are strings ("03/14/2025", "$1,250.00",
+"1,200 sq ft"). This module converts whole columns of a batch at once,
+caches repeated date strings, and reports per-field parse failures
+instead of silently dropping them.
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Precompiled patterns for the formats seen on ACA pages
+_US_DATE = re.compile(
+    r"^(\d{1,2})[/-](\d{1,2})[/-](\d{4}|\d{2})"
+    r"(?:\s+(\d{1,2}):(\d{2})(?::(\d{2}))?\s*([AaPp][Mm])?)?$"
+)
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)?$")
+_NAMED_MONTH_FORMATS = ("%b %d, %Y", "%B %d, %Y", "%d-%b-%Y", "%d-%b-%y")
+_MONEY = re.compile(r"^(\()?\s*(-)?\s*\$?\s*(-)?\s*(\d[\d,]*(?:\.\d+)?|\.\d+)\s*(\))?$")
+_NUMBER = re.compile(r"(?:-?\d[\d,]*(?:\.\d+)?|-?\.\d+)(?:[eE][+-]?\d+)?")
+_WHITESPACE = re.compile(r"\s+")
+
+MAX_EXAMPLES = 5
+
+
+@lru_cache(maxsize=65536)
+def parse_date(value: str) -> Optional[datetime]:
+    """Parse an ACA date string; returns None if the format is not recognized"""
+    value = _WHITESPACE.sub(" ", value.strip())
+    match = _US_DATE.match(value)
+    if match:
+        month, day, year, hour, minute, second, meridiem = match.groups()
+        year = int(year)
+        if year < 100:
+            # Same pivot as strptime's %y
+            year += 2000 if year < 69 else 1900
+        hour = int(hour) if hour else 0
+        if meridiem:
+            meridiem = meridiem.lower()
+            if meridiem == "pm" and hour < 12:
+                hour += 12
+            elif meridiem == "am" and hour == 12:
+                hour = 0
+        try:
+            return datetime(year, int(month), int(day), hour, int(minute or 0), int(second or 0))
+        except ValueError:
+            return None
+    if _ISO_DATE.match(value):
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    for fmt in _NAMED_MONTH_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def parse_money(value: str) -> Optional[float]:
+    """Parse "$1,250.00", "1250", "(45.00)" (negative); None if not a money value"""
+    match = _MONEY.match(value.strip())
+    if not match:
+        return None
+    open_paren, sign, inner_sign, number, close_paren = match.groups()
+    if bool(open_paren) != bool(close_paren):
+        return None
+    amount = float(number.replace(",", ""))
+    if open_paren or sign or inner_sign:
+        amount = -amount
+    return amount
+
+
+def parse_float(value: str) -> Optional[float]:
+    """Parse the first number in the string, e.g. "1,200.5 sq ft" -> 1200.5, "1e3" -> 1000.0"""
+    match = _NUMBER.search(value)
+    if not match:
+        return None
+    return float(match.group(0).replace(",", ""))
+
+
+def parse_int(value: str) -> Optional[int]:
+    """Parse the first number in the string as an integer, e.g. "2 stories" -> 2"""
+    number = parse_float(value)
+    if number is None or number != int(number):
+        return None
+    return int(number)
+
+
+# Column kind -> (parser, already-converted types passed through unchanged)
+PARSERS: Dict[str, Tuple[Callable[[str], Any], tuple]] = {
+    "date": (parse_date, (datetime, date)),
+    "money": (parse_money, (int, float)),
+    "float": (parse_float, (int, float)),
+    "int": (parse_int, (int,)),
+}
+
+MONEY_COLUMNS = frozenset({"job_value", "total_fees", "paid_fees", "balance_due"})
+
+
+def schema_for_model(model) -> Dict[str, str]:
+    """Derive a column -> kind coercion schema from a SQLAlchemy model"""
+    # Imported here so parsing-only callers do not pay for SQLAlchemy
+    from sqlalchemy import DateTime, Float, Integer
+
+    schema = {}
+    for column in model.__table__.columns:
+        if column.primary_key or column.foreign_keys:
+            continue
+        if isinstance(column.type, DateTime):
+            schema[column.name] = "date"
+        elif isinstance(column.type, Float):
+            schema[column.name] = "money" if column.name in MONEY_COLUMNS else "float"
+        elif isinstance(column.type, Integer):
+            schema[column.name] = "int"
+    return schema
+
+
+@dataclass
+class CoercionReport:
+    """Per-field parse failures of one coerced batch"""
+    rows: int = 0
+    failures: Dict[str, int] = field(default_factory=dict)
+    examples: Dict[str, List[str]] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failures
+
+    def record(self, column: str, value: Any) -> None:
+        self.failures[column] = self.failures.get(column, 0) + 1
+        examples = self.examples.setdefault(column, [])
+        if len(examples) < MAX_EXAMPLES:
+            examples.append(str(value))
+
+    def merge(self, other: "CoercionReport") -> None:
+        self.rows += other.rows
+        for column, count in other.failures.items():
+            self.failures[column] = self.failures.get(column, 0) + count
+            examples = self.examples.setdefault(column, [])
+            examples.extend(other.examples.get(column, [])[:MAX_EXAMPLES - len(examples)])
+
+    def __str__(self) -> str:
+        if self.ok:
+            return f"CoercionReport(rows={self.rows}, no failures)"
+        parts = ", ".join(
+            f"{column}={count} (e.g. {self.examples[column][0]!r})"
+            for column, count in sorted(self.failures.items())
+        )
+        return f"CoercionReport(rows={self.rows}, failures: {parts})"
+
+
+def coerce_column(values: List[Any], kind: str, column: str, report: CoercionReport) -> List[Any]:
+    """
+    Convert one column of a batch
+
+    Empty strings and None become None without counting as failures;
+    values of the target type pass through; anything else that fails to
+    parse becomes None and is recorded in ``report``.
+    """
+    parser, passthrough = PARSERS[kind]
+    converted: List[Any] = []
+    append = converted.append
+    for value in values:
+        if value is None:
+            append(None)
+        elif isinstance(value, passthrough):
+            if kind == "date" and not isinstance(value, datetime):
+                value = datetime(value.year, value.month, value.day)
+            append(value)
+        elif isinstance(value, str):
+            if not value.strip():
+                append(None)
+                continue
+            parsed = parser(value)
+            if parsed is None:
+                report.record(column, value)
+            append(parsed)
+        else:
+            report.record(column, value)
+            append(None)
+    return converted
+
+
+def coerce_batch(rows: Iterable[Dict[str, Any]], schema: Dict[str, str]) -> Tuple[List[Dict[str, Any]], CoercionReport]:
+    """
+    Coerce a batch of row dicts column by column
+
+    Only columns present in ``schema`` are converted; other keys are copied
+    unchanged. Columns absent from a row stay absent.
+
+    Returns:
+        The coerced rows and a report of per-field parse failures
+    """
+    rows = [dict(row) for row in rows]
+    report = CoercionReport(rows=len(rows))
+    for column, kind in schema.items():
+        positions = [i for i, row in enumerate(rows) if column in row]
+        if not positions:
+            continue
+        converted = coerce_column([rows[i][column] for i in positions], kind, column, report)
+        for i, value in zip(positions, converted):
+            rows[i][column] = value
+    return rows, report
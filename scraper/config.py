@@ -1,29 +1,64 @@
 import os
+from typing import Dict, Optional
+
 from dotenv import load_dotenv
 
+from scraper.secret_store import get_provider
+
 
-def fetch_and_set_aws_secret(secret_name: str, region_name: str = None):
+def fetch_and_set_aws_secret(secret_name: str, region_name: str = None, refresh: bool = False) -> Dict[str, str]:
     """
     Fetch secrets from AWS Secrets Manager and set them as environment variables.
+    Reads go through the cached secret provider; ``refresh`` forces a new fetch.
+    """
+    try:
+        secret_dict = get_provider().get(secret_name, region_name, refresh=refresh)
+    except Exception as e:
+        import logging
+        logging.warning(f"Could not fetch secret from AWS: {e}")
+        return {}
+    for k, v in secret_dict.items():
+        os.environ[k] = str(v)
+    return secret_dict
+
+
+def database_url_from_secret(secret: Dict[str, str]) -> Optional[str]:
     """
+    Database URL held by a secret
+
+    Either a ``DATABASE_URL`` key or the RDS-style ``host``/``username``/``password``
+    fields. When both are present, ``password`` wins over the one in the URL,
+    because rotation only rewrites ``password``.
+    """
+    from sqlalchemy.engine import URL, make_url
+
+    if secret.get("DATABASE_URL"):
+        url = make_url(secret["DATABASE_URL"])
+        if secret.get("password"):
+            url = url.set(password=secret["password"])
+        return url.render_as_string(hide_password=False)
+    if secret.get("host") and secret.get("username"):
+        return URL.create(
+            "postgresql",
+            username=secret["username"],
+            password=secret.get("password"),
+            host=secret["host"],
+            port=int(secret["port"]) if secret.get("port") else None,
+            database=secret.get("dbname"),
+        ).render_as_string(hide_password=False)
+    return None
+
+
+def _database_url_from_aws(refresh: bool = False) -> Optional[str]:
+    secret_name = os.getenv('DB_SECRET_NAME', 'clark-county-permit-db')
+    region_name = os.getenv('AWS_REGION', 'us-west-2')
     try:
-        import boto3
-        import json as _json
-        session = boto3.session.Session()
-        if region_name is None:
-            region_name = session.region_name or 'us-west-2'
-        client = session.client(
-            service_name='secretsmanager',
-            region_name=region_name
-        )
-        get_secret_value_response = client.get_secret_value(SecretId=secret_name)
-        secret = get_secret_value_response['SecretString']
-        secret_dict = _json.loads(secret)
-        for k, v in secret_dict.items():
-            os.environ[k] = v
+        secret = get_provider().get(secret_name, region_name, refresh=refresh)
     except Exception as e:
         import logging
         logging.warning(f"Could not fetch secret from AWS: {e}")
+        return None
+    return database_url_from_secret(secret)
 
 
 def get_database_url():
@@ -37,12 +72,20 @@ def get_database_url():
     if db_url:
         return db_url
 
-    # If not found, try AWS Secrets Manager
-    secret_name = os.getenv('DB_SECRET_NAME', 'clark-county-permit-db')
-    region_name = os.getenv('AWS_REGION', 'us-west-2')
-    fetch_and_set_aws_secret(secret_name, region_name)
-    db_url = os.getenv('DATABASE_URL')
+    # If not found, try AWS Secrets Manager (cached across processes; see scraper.secret_store)
+    db_url = _database_url_from_aws()
     if db_url:
         return db_url
 
-    raise RuntimeError('DATABASE_URL not found in environment or AWS Secrets Manager.') 
\ No newline at end of file
+    raise RuntimeError('DATABASE_URL not found in environment or AWS Secrets Manager.')
+
+
+def refresh_database_url() -> Optional[str]:
+    """
+    Refetch the database URL after the stored credentials were rejected
+
+    Returns None when the URL comes from the environment, which a refetch cannot change.
+    """
+    if os.getenv('DATABASE_URL'):
+        return None
+    return _database_url_from_aws(refresh=True)
@@ -0,0 +1,468 @@
+"""
+Hot/cold tiering of permits by application year
+
+Every upsert maintains all of the indexes on ``permits``, and the nightly
+queries scan it, so both got slower each year as history accumulated.
+Settled permits (finaled, expired, ...) from past years are now moved out
+of ``permits`` into a cold archive partitioned by ``applied_date`` year.
+``permits`` keeps what can still change: recent years, and older permits
+that are still open. Write and query cost follow that set, not the whole
+history.
+
+The layout of the archive depends on the backend:
+
+    PostgreSQL  ``permits_archive``, declared ``PARTITION BY RANGE (applied_date)``,
+                with one partition per year (``permits_archive_2019``) created on first use
+    SQLite      one database file per year (``<archive dir>/permits_2019.db``),
+                ATTACHed only while it is read or written
+
+An archived row holds the permit's columns, plus its inspections, fees,
+documents, status history and change log as JSON. ``archived_permits`` in
+the main database maps each archived permit number to its year, so looking
+one up touches a single partition. A cold year can also be detached to a
+zstd-compressed Parquet file. Its partition (or file) is then dropped and
+``archived_permits`` points at the Parquet file instead.
+
+The upsert path routes through the index. When a batch contains an archived
+permit (it was re-scraped because it changed again), ``restore_archived``
+moves it back into ``permits``, children included, before the batch is
+diffed, so change tracking continues from the archived state.
+
+``permits`` itself is not partitioned on PostgreSQL. The child tables
+reference ``permits.id``, and ``permit_number`` must stay unique, but a
+partitioned table can only enforce unique keys that include the partition
+column.
+
+Usage:
+    python -m scraper.database.archive archive --before-year 2023
+    python -m scraper.database.archive detach 2016 /data/cold
+    python -m scraper.database.archive status
+
+Configuration:
+    DB_ARCHIVE_DIR        directory of the SQLite year files (default: "archive" next to the database file)
+    DB_ARCHIVE_STATUSES   statuses that count as settled (default finaled,final,closed,expired,withdrawn,void)
+    DB_ARCHIVE_HOT_YEARS  years kept hot by default, including the current one (default 2)
+"""
+
+import argparse
+import json
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+from sqlalchemy import Column, DateTime, Index, MetaData, Table, Text, delete, func, insert, inspect, select, update
+
+from scraper.database.export import arrow_type
+from scraper.database.serialize import dumps
+from scraper.database.unified_schema import (
+    ArchivedPermit,
+    Document,
+    Fee,
+    Inspection,
+    Permit,
+    PermitChange,
+    StatusHistory,
+)
+from scraper.lazy import lazy_import
+
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATUSES = "finaled,final,closed,expired,withdrawn,void"
+SETTLED_STATUSES = tuple(
+    s.strip().lower() for s in os.getenv("DB_ARCHIVE_STATUSES", DEFAULT_STATUSES).split(",") if s.strip()
+)
+HOT_YEARS = int(os.getenv("DB_ARCHIVE_HOT_YEARS", "2"))
+# Keep IN (...) lists under SQLite's default host-parameter limit
+MOVE_BATCH = 500
+
+ARCHIVED = "archive"
+PARQUET = "parquet"
+
+# Child rows travel with their permit, as JSON columns of the archived row
+CHILD_TABLES = {
+    "inspections": Inspection.__table__,
+    "fees": Fee.__table__,
+    "documents": Document.__table__,
+    "status_history": StatusHistory.__table__,
+    "changes": PermitChange.__table__,
+}
+
+permits_table = Permit.__table__
+index_table = ArchivedPermit.__table__
+
+archive_table = Table(
+    "permits_archive",
+    MetaData(),
+    # Plain copies: no primary key or foreign keys, which a partition could not enforce anyway
+    *[Column(c.name, c.type) for c in permits_table.columns],
+    *[Column(name, Text) for name in CHILD_TABLES],
+    Column("archived_at", DateTime),
+    Index("idx_permits_archive_number", "permit_number"),
+    postgresql_partition_by="RANGE (applied_date)",
+)
+
+
+def _child_columns(table) -> List[Any]:
+    return [c for c in table.columns if c.name not in ("id", "permit_id")]
+
+
+def _year_bounds(year: int) -> tuple:
+    return datetime(year, 1, 1), datetime(year + 1, 1, 1)
+
+
+def _in_year(table, year: int) -> tuple:
+    """Predicates limiting ``table`` to one year; lets PostgreSQL prune to that partition"""
+    start, end = _year_bounds(year)
+    return table.c.applied_date >= start, table.c.applied_date < end
+
+
+def archive_dir(engine) -> str:
+    """Directory of the per-year SQLite files"""
+    configured = os.getenv("DB_ARCHIVE_DIR")
+    if configured:
+        return configured
+    database = engine.url.database
+    if not database or database == ":memory:":
+        raise ValueError("Set DB_ARCHIVE_DIR to archive permits of an in-memory SQLite database")
+    return os.path.join(os.path.dirname(os.path.abspath(database)), "archive")
+
+
+def _year_path(engine, year: int) -> str:
+    return os.path.join(archive_dir(engine), f"permits_{year}.db")
+
+
+_ATTACHED_TABLES: Dict[str, Table] = {}
+
+
+def _attached_table(schema: str) -> Table:
+    table = _ATTACHED_TABLES.get(schema)
+    if table is None:
+        table = _ATTACHED_TABLES[schema] = archive_table.to_metadata(MetaData(), schema=schema)
+    return table
+
+
+@contextmanager
+def _partition(conn, year: int, create: bool = False) -> Iterator[Optional[Table]]:
+    """
+    The archive table holding ``year``, or None when it has no partition
+
+    On PostgreSQL this is the partitioned parent, which routes inserts by
+    ``applied_date``. On SQLite the year's file is attached as a schema until
+    the block exits, so ``conn`` must not be in a transaction on entry; the
+    block commits its own work, and anything left uncommitted is rolled back.
+    """
+    if conn.dialect.name != "sqlite":
+        name = f"permits_archive_{year}"
+        if create:
+            archive_table.create(conn, checkfirst=True)
+            start, end = _year_bounds(year)
+            conn.exec_driver_sql(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF permits_archive "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+            )
+        elif not inspect(conn).has_table(name):
+            yield None
+            return
+        yield archive_table
+        return
+
+    path = _year_path(conn.engine, year)
+    if not create and not os.path.exists(path):
+        yield None
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    schema = f"archive_{year}"
+    conn.exec_driver_sql(f"ATTACH DATABASE ? AS {schema}", (path,))
+    try:
+        table = _attached_table(schema)
+        if create:
+            table.create(conn, checkfirst=True)
+        yield table
+    finally:
+        conn.rollback()
+        conn.exec_driver_sql(f"DETACH DATABASE {schema}")
+        conn.commit()
+
+
+def _encode_children(conn, ids: List[int]) -> Dict[int, Dict[str, str]]:
+    encoded: Dict[int, Dict[str, str]] = {permit_id: {} for permit_id in ids}
+    for name, table in CHILD_TABLES.items():
+        columns = _child_columns(table)
+        found: Dict[int, List[Dict[str, Any]]] = {}
+        for r in conn.execute(
+            select(table.c.permit_id, *columns)
+            .where(table.c.permit_id.in_(ids))
+            .order_by(table.c.permit_id, table.c.id)
+        ):
+            found.setdefault(r[0], []).append({c.name: value for c, value in zip(columns, r[1:])})
+        for permit_id in ids:
+            encoded[permit_id][name] = dumps(found.get(permit_id, [])).decode()
+    return encoded
+
+
+def _decode_children(table, text: Optional[str]) -> List[Dict[str, Any]]:
+    children = json.loads(text) if text else []
+    dates = [c.name for c in _child_columns(table) if isinstance(c.type, DateTime)]
+    for child in children:
+        for name in dates:
+            if child.get(name):
+                child[name] = datetime.fromisoformat(child[name])
+    return children
+
+
+def _move_out(conn, target: Table, ids: List[int], cold) -> int:
+    """Copy permits (with children) into ``target`` and delete them from the hot tables"""
+    rows = [
+        dict(r._mapping) for r in conn.execute(
+            # Re-checked under lock: a permit re-scraped since it was picked may no longer be settled
+            select(permits_table).where(permits_table.c.id.in_(ids), *cold).with_for_update()
+        )
+    ]
+    if not rows:
+        return 0
+    ids = [row["id"] for row in rows]
+    children = _encode_children(conn, ids)
+    now = datetime.utcnow()
+    for row in rows:
+        row.update(children[row["id"]], archived_at=now)
+    conn.execute(insert(target), rows)
+    conn.execute(insert(index_table), [
+        {
+            "permit_number": row["permit_number"], "applied_year": row["applied_date"].year,
+            "tier": ARCHIVED, "location": None, "archived_at": now,
+        }
+        for row in rows
+    ])
+    for table in CHILD_TABLES.values():
+        conn.execute(delete(table).where(table.c.permit_id.in_(ids)))
+    conn.execute(delete(permits_table).where(permits_table.c.id.in_(ids)))
+    return len(rows)
+
+
+def archive_permits(db_manager, before_year: int, statuses: Sequence[str] = SETTLED_STATUSES,
+                    batch_size: int = MOVE_BATCH) -> Dict[int, int]:
+    """
+    Move settled permits applied for before ``before_year`` into their year's archive partition
+
+    Args:
+        statuses: Lowercase statuses that count as settled
+        batch_size: Permits moved per transaction
+
+    Returns:
+        Permits moved, per year
+    """
+    engine = db_manager.engine
+    cold = (
+        permits_table.c.applied_date < datetime(before_year, 1, 1),
+        func.lower(permits_table.c.status).in_([s.lower() for s in statuses]),
+    )
+    by_year: Dict[int, List[int]] = {}
+    with engine.connect() as conn:
+        for permit_id, applied in conn.execute(
+            select(permits_table.c.id, permits_table.c.applied_date).where(*cold).order_by(permits_table.c.id)
+        ):
+            by_year.setdefault(applied.year, []).append(permit_id)
+
+    moved: Dict[int, int] = {}
+    for year in sorted(by_year):
+        ids = by_year[year]
+        moved[year] = 0
+        with engine.connect() as conn, _partition(conn, year, create=True) as target:
+            for start in range(0, len(ids), batch_size):
+                moved[year] += _move_out(conn, target, ids[start:start + batch_size], cold)
+                conn.commit()
+        logger.info(f"Archived {moved[year]} permits applied for in {year}")
+    return moved
+
+
+def _parquet_rows(location: str, permit_numbers: List[str]) -> List[Dict[str, Any]]:
+    return pq.read_table(location, filters=[("permit_number", "in", permit_numbers)]).to_pylist()
+
+
+def _archived_rows(conn, source: Optional[Table], year: int, permit_numbers: List[str]) -> List[Dict[str, Any]]:
+    if source is None:
+        return []
+    return [
+        dict(r._mapping) for r in conn.execute(
+            select(source).where(source.c.permit_number.in_(permit_numbers), *_in_year(source, year))
+        )
+    ]
+
+
+def _move_in(conn, rows: List[Dict[str, Any]], source: Optional[Table]) -> Set[str]:
+    """Reinsert archived rows into the hot tables; permits get new ids"""
+    if not rows:
+        return set()
+    numbers = [row["permit_number"] for row in rows]
+    conn.execute(insert(permits_table), [
+        {c.name: row.get(c.name) for c in permits_table.columns if c.name != "id"} for row in rows
+    ])
+    ids = dict(conn.execute(
+        select(permits_table.c.permit_number, permits_table.c.id).where(permits_table.c.permit_number.in_(numbers))
+    ).all())
+    for name, table in CHILD_TABLES.items():
+        children = [
+            dict(child, permit_id=ids[row["permit_number"]])
+            for row in rows for child in _decode_children(table, row.get(name))
+        ]
+        if children:
+            conn.execute(insert(table), children)
+    if source is not None:
+        conn.execute(delete(source).where(source.c.permit_number.in_(numbers)))
+    conn.execute(delete(index_table).where(index_table.c.permit_number.in_(numbers)))
+    return set(numbers)
+
+
+def restore_archived(engine, permit_numbers: Iterable[str]) -> Set[str]:
+    """
+    Move any of ``permit_numbers`` that are archived back into ``permits``
+
+    ``DatabaseManager.upsert_permits`` calls this before each batch. When
+    none of the permits are archived, the cost is one indexed lookup in
+    ``archived_permits``. Returns the permit numbers restored.
+    """
+    numbers = list(permit_numbers)
+    with engine.connect() as conn:
+        entries = conn.execute(
+            select(index_table.c.permit_number, index_table.c.applied_year, index_table.c.tier,
+                   index_table.c.location)
+            .where(index_table.c.permit_number.in_(numbers))
+        ).all()
+    if not entries:
+        return set()
+    groups: Dict[tuple, List[str]] = {}
+    for entry in entries:
+        groups.setdefault((entry.tier, entry.applied_year, entry.location), []).append(entry.permit_number)
+
+    restored: Set[str] = set()
+    for (tier, year, location), group in groups.items():
+        with engine.connect() as conn:
+            if tier == PARQUET:
+                restored |= _move_in(conn, _parquet_rows(location, group), None)
+                conn.commit()
+                continue
+            with _partition(conn, year) as source:
+                restored |= _move_in(conn, _archived_rows(conn, source, year, group), source)
+                conn.commit()
+    missing = {entry.permit_number for entry in entries} - restored
+    if missing:
+        logger.warning(f"Archived permits not found in their partition, treating as new: {sorted(missing)}")
+        with engine.begin() as conn:
+            conn.execute(delete(index_table).where(index_table.c.permit_number.in_(list(missing))))
+    logger.info(f"Restored {len(restored)} archived permits to the hot table")
+    return restored
+
+
+def archived_permit(engine, permit_number: str) -> Optional[Dict[str, Any]]:
+    """An archived permit's row (permit columns, child JSON columns, archived_at), or None"""
+    with engine.connect() as conn:
+        entry = conn.execute(select(index_table).where(index_table.c.permit_number == permit_number)).first()
+    if entry is None:
+        return None
+    if entry.tier == PARQUET:
+        rows = _parquet_rows(entry.location, [permit_number])
+    else:
+        with engine.connect() as conn, _partition(conn, entry.applied_year) as source:
+            rows = _archived_rows(conn, source, entry.applied_year, [permit_number])
+    return rows[0] if rows else None
+
+
+def archive_schema():
+    """Arrow schema of archived rows, as written by ``detach_year``"""
+    return pa.schema([pa.field(c.name, arrow_type(c)) for c in archive_table.columns])
+
+
+def _drop_partition(engine, year: int) -> None:
+    if engine.dialect.name == "sqlite":
+        os.unlink(_year_path(engine, year))
+        return
+    name = f"permits_archive_{year}"
+    with engine.begin() as conn:
+        conn.exec_driver_sql(f"ALTER TABLE permits_archive DETACH PARTITION {name}")
+        conn.exec_driver_sql(f"DROP TABLE {name}")
+
+
+def detach_year(db_manager, year: int, destination: str, compression: str = "zstd",
+                batch_size: int = 10000) -> Dict[str, Any]:
+    """
+    Write one archived year to a Parquet file in ``destination`` and drop its partition
+
+    The year's ``archived_permits`` entries point at the file afterwards, so
+    its permits can still be read and restored.
+
+    Returns:
+        The file written and its row count
+    """
+    engine = db_manager.engine
+    os.makedirs(destination, exist_ok=True)
+    path = os.path.join(destination, f"permits_{year}-{datetime.utcnow():%Y%m%dT%H%M%S}.parquet")
+    schema = archive_schema()
+    rows = 0
+    with engine.connect() as conn, _partition(conn, year) as source:
+        if source is None:
+            raise ValueError(f"No archive partition for {year}")
+        with pq.ParquetWriter(path, schema, compression=compression) as writer:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+                select(source).where(*_in_year(source, year))
+            )
+            for partition in result.partitions():
+                writer.write_batch(pa.RecordBatch.from_pylist([dict(r._mapping) for r in partition], schema=schema))
+                rows += len(partition)
+        conn.execute(
+            update(index_table)
+            .where(index_table.c.applied_year == year, index_table.c.tier == ARCHIVED)
+            .values(tier=PARQUET, location=path)
+        )
+        conn.commit()
+    _drop_partition(engine, year)
+    logger.info(f"Detached {rows} archived permits of {year} to {path}")
+    return {"path": path, "rows": rows}
+
+
+def archive_status(engine) -> List[Dict[str, Any]]:
+    """Archived permit counts per year and tier"""
+    with engine.connect() as conn:
+        return [
+            dict(r._mapping) for r in conn.execute(
+                select(index_table.c.applied_year, index_table.c.tier, func.count().label("permits"))
+                .group_by(index_table.c.applied_year, index_table.c.tier)
+                .order_by(index_table.c.applied_year)
+            )
+        ]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from scraper.database.manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Move settled permits between the hot table and the cold archive")
+    parser.add_argument("--database-url", help="Database URL (default: config loader)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    move = commands.add_parser("archive", help="Archive settled permits of past years")
+    move.add_argument("--before-year", type=int, default=datetime.utcnow().year - HOT_YEARS + 1,
+                      help="Archive permits applied for before this year")
+    detach = commands.add_parser("detach", help="Move an archived year to a Parquet file")
+    detach.add_argument("year", type=int)
+    detach.add_argument("destination", help="Directory for the Parquet file")
+    commands.add_parser("status", help="Show archived permits per year and tier")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    db_manager = DatabaseManager(args.database_url)
+    db_manager.create_tables()
+    if args.command == "archive":
+        logger.info(f"Archived permits per year: {archive_permits(db_manager, args.before_year)}")
+    elif args.command == "detach":
+        logger.info(f"Detached {args.year}: {detach_year(db_manager, args.year, args.destination)}")
+    else:
+        for row in archive_status(db_manager.engine):
+            print(f"{row['applied_year']}  {row['tier']:<8} {row['permits']:>10,}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,368 @@
+"""
+Owner and contractor entity resolution
+
+Names scraped from permits vary in punctuation, suffixes and typos
+("ABC CONSTRUCTION LLC", "A.B.C. Construction, L.L.C."). Each upsert batch
+resolves ``owner_name`` and ``contractor_name`` (+ ``contractor_license``)
+to stable ``entities`` ids stored on the permit:
+
+1. Names are normalized; a normalized name already seen resolves through
+   ``entity_aliases`` with one indexed lookup.
+2. Otherwise candidates are fetched by blocking keys (license, Soundex of
+   the first significant token, a 4-character token prefix) through the
+   ``entities`` indexes, and fuzzy-compared only within those blocks.
+3. The best candidate above MATCH_THRESHOLD wins; otherwise a new entity is
+   created. The alias is recorded either way.
+
+Work per batch is bounded by the block sizes, never by the table size.
+
+Usage:
+    python -m scraper.database.entities    # resolve permits stored before this stage existed
+"""
+
+import argparse
+import logging
+import re
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, insert, or_, select
+from sqlalchemy.engine import Connection
+
+from scraper.database.unified_schema import Entity, EntityAlias, Permit
+
+logger = logging.getLogger(__name__)
+
+entities_table = Entity.__table__
+aliases_table = EntityAlias.__table__
+
+# Permit name column -> (entity type, license column or None, permit entity-id column)
+ENTITY_FIELDS = {
+    "owner_name": ("owner", None, "owner_entity_id"),
+    "contractor_name": ("contractor", "contractor_license", "contractor_entity_id"),
+}
+
+MATCH_THRESHOLD = 0.88
+# Blocks larger than this are skipped for fuzzy matching (e.g. a very common surname)
+MAX_BLOCK_SIZE = 500
+IN_CHUNK = 400
+
+LEGAL_SUFFIXES = frozenset({
+    "LLC", "INC", "INCORPORATED", "CORP", "CORPORATION", "CO", "COMPANY", "LTD", "LIMITED",
+    "LP", "LLP", "PLLC", "PC", "PLC", "DBA", "THE",
+})
+# Tokens too common to block on
+BLOCK_STOPWORDS = frozenset({"AND", "OF", "LAS", "VEGAS", "NEVADA", "NV", "TRUST", "FAMILY", "HOMES"})
+
+_DOTTED_INITIALS = re.compile(r"\b((?:\w\.){2,})")
+_NON_WORD = re.compile(r"[^\w\s]")
+_LICENSE = re.compile(r"[^0-9A-Z]")
+_SOUNDEX_CODES = {c: str(d) for d, letters in enumerate(
+    ("AEIOUYHW", "BFPV", "CGJKQSXZ", "DT", "L", "MN", "R")
+) for c in letters}
+
+
+def normalize_name(name: str) -> str:
+    """Uppercase, collapse dotted initials, drop punctuation and legal suffixes"""
+    text = name.upper().replace("&", " AND ")
+    # "A.B.C." -> "ABC", "L.L.C." -> "LLC"
+    text = _DOTTED_INITIALS.sub(lambda m: m.group(1).replace(".", ""), text)
+    tokens = _NON_WORD.sub(" ", text).split()
+    while tokens and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+    while tokens and tokens[0] == "THE":
+        tokens.pop(0)
+    return " ".join(tokens)
+
+
+def normalize_license(license: Optional[str]) -> str:
+    return _LICENSE.sub("", (license or "").upper())
+
+
+def soundex(token: str) -> str:
+    """American Soundex code, e.g. "ROBERT" -> "R163" """
+    letters = [c for c in token.upper() if c.isalpha()]
+    if not letters:
+        return ""
+    code = letters[0]
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for c in letters[1:]:
+        digit = _SOUNDEX_CODES.get(c, "")
+        if digit and digit != "0" and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        if c not in "HW":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def blocking_keys(normalized: str) -> Tuple[str, str]:
+    """
+    (phonetic key, token prefix) of a normalized name
+
+    The phonetic key is the Soundex of the first significant token; the
+    prefix comes from the alphabetically first one, so reordered names
+    ("SMITH JOHN" / "JOHN SMITH") still share a block.
+    """
+    tokens = [t for t in normalized.split() if t not in BLOCK_STOPWORDS] or normalized.split()
+    if not tokens:
+        return "", ""
+    return soundex(tokens[0]), min(tokens)[:4]
+
+
+def _sorted_tokens(normalized: str) -> str:
+    return " ".join(sorted(normalized.split()))
+
+
+def similarity(a: str, b: str) -> float:
+    """Order-insensitive fuzzy similarity of two normalized names (0..1)"""
+    if a == b:
+        return 1.0
+    return max(
+        SequenceMatcher(None, a, b).ratio(),
+        SequenceMatcher(None, _sorted_tokens(a), _sorted_tokens(b)).ratio(),
+    )
+
+
+class _Matcher:
+    """
+    Scores candidates against one name, reusing difflib's analysis of it
+
+    difflib caches the second sequence, so the name being resolved is set
+    once; the cheap real_quick_ratio/quick_ratio upper bounds reject most
+    candidates before the full ratio is computed.
+    """
+
+    def __init__(self, normalized: str):
+        self.normalized = normalized
+        self.direct = SequenceMatcher(None)
+        self.direct.set_seq2(normalized)
+        self.reordered = SequenceMatcher(None)
+        self.reordered.set_seq2(_sorted_tokens(normalized))
+
+    @staticmethod
+    def _ratio_at_least(matcher: SequenceMatcher, other: str, floor: float) -> float:
+        matcher.set_seq1(other)
+        if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+            return 0.0
+        return matcher.ratio()
+
+    def score(self, other: str, other_sorted: str, floor: float) -> float:
+        if other == self.normalized:
+            return 1.0
+        return max(
+            self._ratio_at_least(self.direct, other, floor),
+            self._ratio_at_least(self.reordered, other_sorted, floor),
+        )
+
+
+def _chunks(items: List[Any], size: int = IN_CHUNK) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Block entry: (normalized name, token-sorted name, license)
+_Entry = Tuple[str, str, str]
+
+
+class _Block:
+    """Candidates of one entity type, indexed by blocking key"""
+
+    def __init__(self):
+        self.by_key: Dict[Tuple[str, str], Dict[int, _Entry]] = {}
+
+    def add(self, entity_id: int, normalized: str, license: str, phonetic: str, prefix: str) -> None:
+        entry = (normalized, _sorted_tokens(normalized), license)
+        for key in (("license", license), ("phonetic", phonetic), ("prefix", prefix)):
+            if key[1]:
+                self.by_key.setdefault(key, {})[entity_id] = entry
+
+    def candidates(self, license: str, phonetic: str, prefix: str) -> Dict[int, _Entry]:
+        found: Dict[int, _Entry] = {}
+        for key in (("license", license), ("phonetic", phonetic), ("prefix", prefix)):
+            members = self.by_key.get(key, {})
+            if key[0] != "license" and len(members) > MAX_BLOCK_SIZE:
+                continue
+            found.update(members)
+        return found
+
+
+def _best_match(normalized: str, license: str, candidates: Dict[int, _Entry]) -> Optional[int]:
+    matcher = _Matcher(normalized)
+    best_id, best_score = None, MATCH_THRESHOLD
+    for entity_id, (other_name, other_sorted, other_license) in candidates.items():
+        if license and other_license:
+            # Licenses are authoritative: same license is the same contractor
+            if license == other_license:
+                return entity_id
+            continue
+        score = matcher.score(other_name, other_sorted, best_score)
+        if score >= best_score:
+            best_id, best_score = entity_id, score
+    return best_id
+
+
+def resolve_entities(conn: Connection, rows: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Set ``owner_entity_id``/``contractor_entity_id`` on upsert rows in place
+
+    Returns:
+        Counts of names resolved through aliases, fuzzy matches and new entities
+    """
+    stats = {"alias_hits": 0, "matched": 0, "created": 0}
+    for name_column, (entity_type, license_column, id_column) in ENTITY_FIELDS.items():
+        keyed = []
+        mentions: Dict[Tuple[str, str], str] = {}
+        for row in rows:
+            raw = row.get(name_column)
+            if not isinstance(raw, str) or not raw.strip():
+                continue
+            normalized = normalize_name(raw)
+            if normalized:
+                license = normalize_license(row.get(license_column)) if license_column else ""
+                mentions.setdefault((normalized, license), raw.strip())
+                keyed.append((row, (normalized, license)))
+        if not mentions:
+            continue
+        resolved = _resolve_mentions(conn, entity_type, mentions, stats)
+        for row, key in keyed:
+            row[id_column] = resolved[key]
+    return stats
+
+
+def _resolve_mentions(conn: Connection, entity_type: str, mentions: Dict[Tuple[str, str], str],
+                      stats: Dict[str, int]) -> Dict[Tuple[str, str], int]:
+    keys = sorted(mentions)
+    resolved: Dict[Tuple[str, str], int] = {}
+    for chunk in _chunks(keys, IN_CHUNK // 2):
+        for r in conn.execute(
+            select(aliases_table.c.normalized_name, aliases_table.c.license, aliases_table.c.entity_id)
+            .where(aliases_table.c.entity_type == entity_type)
+            .where(aliases_table.c.normalized_name.in_([name for name, _ in chunk]))
+        ):
+            if (r.normalized_name, r.license) in mentions:
+                resolved[(r.normalized_name, r.license)] = r.entity_id
+    stats["alias_hits"] += len(resolved)
+    pending = [key for key in keys if key not in resolved]
+    if not pending:
+        return resolved
+
+    block_keys = {key: blocking_keys(key[0]) for key in pending}
+    licenses = sorted({license for _, license in pending if license})
+    phonetics = sorted({p for p, _ in block_keys.values() if p})
+    prefixes = sorted({x for _, x in block_keys.values() if x})
+    block = _Block()
+    c = entities_table.c
+    for column, values in ((c.license, licenses), (c.phonetic_key, phonetics), (c.name_prefix, prefixes)):
+        for chunk in _chunks(values):
+            for r in conn.execute(
+                select(c.id, c.normalized_name, c.license, c.phonetic_key, c.name_prefix)
+                .where(c.entity_type == entity_type, column.in_(chunk))
+            ):
+                block.add(r.id, r.normalized_name, r.license or "", r.phonetic_key or "", r.name_prefix or "")
+
+    # New entities get provisional negative ids so later names in the batch
+    # can match them; real ids come back from one bulk INSERT ... RETURNING
+    new_entities: List[Dict[str, Any]] = []
+    for key in pending:
+        normalized, license = key
+        phonetic, prefix = block_keys[key]
+        entity_id = _best_match(normalized, license, block.candidates(license, phonetic, prefix))
+        if entity_id is None:
+            new_entities.append({
+                "entity_type": entity_type, "canonical_name": mentions[key], "normalized_name": normalized,
+                "license": license or None, "phonetic_key": phonetic, "name_prefix": prefix,
+            })
+            entity_id = -len(new_entities)
+            block.add(entity_id, normalized, license, phonetic, prefix)
+        else:
+            stats["matched"] += 1
+        resolved[key] = entity_id
+    if new_entities:
+        ids: List[int] = conn.execute(
+            insert(entities_table).returning(entities_table.c.id, sort_by_parameter_order=True),
+            new_entities,
+        ).scalars().all()
+        stats["created"] += len(ids)
+        for key in pending:
+            if resolved[key] < 0:
+                resolved[key] = ids[-resolved[key] - 1]
+    _insert_aliases(conn, [
+        {"entity_type": entity_type, "normalized_name": name, "license": license, "entity_id": resolved[(name, license)]}
+        for name, license in pending
+    ])
+    # Another writer may have recorded some of these names first; its alias wins
+    for chunk in _chunks(pending, IN_CHUNK // 2):
+        for r in conn.execute(
+            select(aliases_table.c.normalized_name, aliases_table.c.license, aliases_table.c.entity_id)
+            .where(aliases_table.c.entity_type == entity_type)
+            .where(aliases_table.c.normalized_name.in_([name for name, _ in chunk]))
+        ):
+            if (r.normalized_name, r.license) in mentions:
+                resolved[(r.normalized_name, r.license)] = r.entity_id
+    if new_entities:
+        orphans = set(ids) - set(resolved.values())
+        if orphans:
+            conn.execute(delete(entities_table).where(entities_table.c.id.in_(orphans)))
+            stats["created"] -= len(orphans)
+    return resolved
+
+
+def _insert_aliases(conn: Connection, rows: List[Dict[str, Any]]) -> None:
+    """INSERT that skips aliases already present (idx_entity_alias_lookup) instead of failing"""
+    stmt: Any
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        stmt = pg_insert(aliases_table)
+    elif conn.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(aliases_table)
+    else:
+        conn.execute(insert(aliases_table), rows)
+        return
+    conn.execute(stmt.on_conflict_do_nothing(index_elements=["entity_type", "normalized_name", "license"]), rows)
+
+
+def backfill_entities(db_manager, batch_size: int = 5000) -> int:
+    """Resolve entities for stored permits that have names but no entity ids"""
+    done, last_id = 0, 0
+    while True:
+        with db_manager.engine.connect() as conn:
+            rows = [dict(r._mapping) for r in conn.execute(
+                select(Permit.id, Permit.permit_number, Permit.owner_name,
+                       Permit.contractor_name, Permit.contractor_license)
+                .where(Permit.id > last_id)
+                .where(or_(
+                    and_(Permit.owner_name.is_not(None), Permit.owner_entity_id.is_(None)),
+                    and_(Permit.contractor_name.is_not(None), Permit.contractor_entity_id.is_(None)),
+                ))
+                .order_by(Permit.id).limit(batch_size)
+            )]
+        if not rows:
+            return done
+        last_id = rows[-1]["id"]
+        for row in rows:
+            del row["id"]
+        db_manager.upsert_permits(rows, changed_by="entity_resolution")
+        done += len(rows)
+        logger.info(f"Resolved entities for {done} permits")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from scraper.database.manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Resolve owner/contractor entities for stored permits")
+    parser.add_argument("--database-url", help="Target database URL (default: config loader)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    db_manager = DatabaseManager(args.database_url)
+    db_manager.create_tables()
+    backfill_entities(db_manager, args.batch_size)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,263 @@
+"""
+Partitioned Parquet export of the permits table
+
+Permits are streamed through a server-side cursor in ``batch_size`` chunks
+and converted to Arrow record batches. Child tables can be attached as
+list-of-struct columns (one row per permit, no join fan-out). The batches
+are written with ``pyarrow.dataset.write_dataset`` into a hive-partitioned
+layout:
+
+    <dest>/applied_year=2024/applied_month=3/record_type=Building/part-<run>-0.parquet
+
+Column statistics are written for every row group, so readers can skip
+files and row groups by predicate. Memory stays constant: only one batch is
+held at a time.
+
+A full export replaces everything at the destination. Incremental exports
+keep a watermark per destination in ``export_watermarks``. Each run writes
+only permits whose ``(updated_at, id)`` is past the watermark, into new
+files next to the earlier ones. An updated permit therefore appears once per
+export that saw it; readers keep the row with the newest ``updated_at`` per
+``permit_number``.
+
+Writers stamp ``updated_at`` when their batch starts, not when it commits,
+so a slow batch can commit rows stamped slightly in the past. Exports
+therefore never advance the watermark past ``now - EXPORT_SAFETY_LAG_SECONDS``
+(default 300), and incremental runs leave newer rows for the next run.
+
+Usage:
+    python -m scraper.database.export exports/permits                 # full export
+    python -m scraper.database.export s3://bucket/permits --incremental --include inspections fees
+"""
+
+import argparse
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Boolean, DateTime, Float, Integer, and_, or_, select
+
+from scraper.database.unified_schema import Document, ExportWatermark, Fee, Inspection, Permit, StatusHistory
+from scraper.lazy import lazy_import
+
+pa = lazy_import("pyarrow")
+ds = lazy_import("pyarrow.dataset")
+pafs = lazy_import("pyarrow.fs")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10000
+# Longer than any upsert transaction: rows stamped before now - lag have committed
+SAFETY_LAG = timedelta(seconds=float(os.getenv("EXPORT_SAFETY_LAG_SECONDS", "300")))
+# Keep IN (...) lists under SQLite's default host-parameter limit
+IN_CHUNK = 500
+
+CHILD_TABLES = {
+    "inspections": Inspection.__table__,
+    "fees": Fee.__table__,
+    "documents": Document.__table__,
+    "status_history": StatusHistory.__table__,
+}
+
+permits_table = Permit.__table__
+
+
+def arrow_type(column):
+    """Arrow type for a SQLAlchemy column; anything not numeric, boolean or datetime is written as text"""
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def _child_columns(table) -> List[Any]:
+    return [c for c in table.columns if c.name != "permit_id"]
+
+
+def export_schema(include: Sequence[str] = ()):
+    """Arrow schema of exported rows: permit columns, child lists, then the partition keys"""
+    fields = [pa.field(c.name, arrow_type(c)) for c in permits_table.columns]
+    for name in include:
+        struct = pa.struct([pa.field(c.name, arrow_type(c)) for c in _child_columns(CHILD_TABLES[name])])
+        fields.append(pa.field(name, pa.list_(struct)))
+    fields += [
+        pa.field("applied_year", pa.int16()),
+        pa.field("applied_month", pa.int8()),
+    ]
+    return pa.schema(fields)
+
+
+def _partitioning():
+    return ds.partitioning(
+        pa.schema([
+            pa.field("applied_year", pa.int16()),
+            pa.field("applied_month", pa.int8()),
+            pa.field("record_type", pa.string()),
+        ]),
+        flavor="hive",
+    )
+
+
+def _attach_children(conn, rows: List[Dict[str, Any]], include: Sequence[str]) -> None:
+    ids = [row["id"] for row in rows]
+    for name in include:
+        table = CHILD_TABLES[name]
+        columns = _child_columns(table)
+        children: Dict[int, List[Dict[str, Any]]] = {}
+        for start in range(0, len(ids), IN_CHUNK):
+            for r in conn.execute(
+                select(table.c.permit_id, *columns)
+                .where(table.c.permit_id.in_(ids[start:start + IN_CHUNK]))
+                .order_by(table.c.permit_id, table.c.id)
+            ):
+                mapping = r._mapping
+                children.setdefault(mapping["permit_id"], []).append({c.name: mapping[c.name] for c in columns})
+        for row in rows:
+            row[name] = children.get(row["id"], [])
+
+
+def _batches(engine, schema, include: Sequence[str], batch_size: int, after: Optional[tuple],
+             cutoff: datetime, incremental: bool, progress: Dict[str, Any]) -> Iterator[Any]:
+    stmt = select(permits_table)
+    if incremental:
+        # Rows stamped after the cutoff may still have uncommitted peers stamped before them
+        stmt = stmt.where(permits_table.c.updated_at <= cutoff)
+    if after is not None:
+        # (updated_at, id) keyset past the watermark; rows with no updated_at are only in the first export
+        last_updated_at, last_id = after
+        stmt = stmt.where(or_(
+            permits_table.c.updated_at > last_updated_at,
+            and_(permits_table.c.updated_at == last_updated_at, permits_table.c.id > last_id),
+        )).order_by(permits_table.c.updated_at, permits_table.c.id)
+    else:
+        stmt = stmt.order_by(permits_table.c.id)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+        for partition in result.partitions():
+            rows = [dict(r._mapping) for r in partition]
+            if include:
+                _attach_children(conn, rows, include)
+            for row in rows:
+                applied = row["applied_date"]
+                row["applied_year"] = applied.year if applied else None
+                row["applied_month"] = applied.month if applied else None
+            newest = max(
+                ((r["updated_at"], r["id"]) for r in rows if r["updated_at"] is not None and r["updated_at"] <= cutoff),
+                default=None,
+            )
+            if newest is not None and (progress["last"] is None or newest > progress["last"]):
+                progress["last"] = newest
+            progress["rows"] += len(rows)
+            yield pa.RecordBatch.from_pylist(rows, schema=schema)
+            logger.info(f"Exported {progress['rows']} permits")
+
+
+def _load_watermark(db_manager, name: str) -> Optional[tuple]:
+    with db_manager.engine.connect() as conn:
+        row = conn.execute(
+            select(ExportWatermark.last_updated_at, ExportWatermark.last_permit_id).where(ExportWatermark.name == name)
+        ).first()
+    if row is None or row.last_updated_at is None:
+        return None
+    return row.last_updated_at, row.last_permit_id or 0
+
+
+def _save_watermark(db_manager, name: str, last: tuple, rows: int) -> None:
+    session = db_manager.SessionLocal()
+    try:
+        watermark = session.query(ExportWatermark).filter_by(name=name).one_or_none()
+        if watermark is None:
+            watermark = ExportWatermark(name=name, rows_exported=0)
+            session.add(watermark)
+        watermark.last_updated_at, watermark.last_permit_id = last
+        watermark.rows_exported = (watermark.rows_exported or 0) + rows
+        session.commit()
+    finally:
+        session.close()
+
+
+def _clear_destination(destination: str) -> None:
+    """Remove earlier files so a full export never leaves duplicates behind"""
+    filesystem, path = pafs.FileSystem.from_uri(destination) if "://" in destination else (
+        pafs.LocalFileSystem(), os.path.abspath(destination)
+    )
+    filesystem.delete_dir_contents(path, missing_dir_ok=True)
+
+
+def export_permits(db_manager, destination: str, include: Sequence[str] = (), incremental: bool = False,
+                   batch_size: int = DEFAULT_BATCH_SIZE, name: Optional[str] = None,
+                   compression: str = "zstd") -> Dict[str, Any]:
+    """
+    Write permits to a partitioned Parquet dataset at ``destination`` (a path or filesystem URI)
+
+    Args:
+        include: Child tables (keys of CHILD_TABLES) to attach as list columns
+        incremental: Export only permits updated since this destination's watermark;
+            otherwise replace everything at ``destination``
+        name: Watermark key; defaults to ``destination``
+
+    Returns:
+        Totals: rows exported and the new watermark
+    """
+    unknown = set(include) - set(CHILD_TABLES)
+    if unknown:
+        raise ValueError(f"Unknown child tables: {sorted(unknown)} (choose from {sorted(CHILD_TABLES)})")
+    name = name or destination
+    after = _load_watermark(db_manager, name) if incremental else None
+    cutoff = datetime.utcnow() - SAFETY_LAG
+    if not incremental:
+        _clear_destination(destination)
+    schema = export_schema(include)
+    progress: Dict[str, Any] = {"rows": 0, "last": after}
+    # Unique per run so incremental files never overwrite earlier ones in the same partition
+    run = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    reader = pa.RecordBatchReader.from_batches(
+        schema, _batches(db_manager.engine, schema, include, batch_size, after, cutoff, incremental, progress)
+    )
+    ds.write_dataset(
+        reader,
+        destination,
+        format="parquet",
+        partitioning=_partitioning(),
+        basename_template=f"part-{run}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(compression=compression, write_statistics=True),
+        max_rows_per_group=batch_size,
+        min_rows_per_group=min(batch_size, 1024),
+    )
+    # Only advance the watermark once every file has been written
+    if progress["last"] is not None and progress["rows"]:
+        _save_watermark(db_manager, name, progress["last"], progress["rows"])
+    last = progress["last"]
+    return {"rows": progress["rows"], "watermark": last[0].isoformat() if last else None}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from scraper.database.manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Export permits to partitioned Parquet")
+    parser.add_argument("destination", help="Output directory or filesystem URI (e.g. s3://bucket/permits)")
+    parser.add_argument("--database-url", help="Source database URL (default: config loader)")
+    parser.add_argument("--include", nargs="*", default=[], choices=sorted(CHILD_TABLES),
+                        help="Child tables to attach as nested list columns")
+    parser.add_argument("--incremental", action="store_true", help="Only permits updated since the last export")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    db_manager = DatabaseManager(args.database_url)
+    db_manager.create_tables()
+    totals = export_permits(db_manager, args.destination, args.include, args.incremental, args.batch_size)
+    logger.info(f"Export to {args.destination} finished: {totals}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,242 @@
+"""
+Related-permit graph: edge persistence, incremental clustering and cluster queries
+
+Permits are linked by the related-permit links on their detail pages
+(``permit_relations``) and by sharing a parcel. Every node's connected
+component is kept in ``permit_clusters`` so a whole development is one
+indexed lookup on ``cluster_id``.
+
+Clusters are maintained with a union-find over the stored cluster ids: a
+batch of new edges loads only the clusters it touches, merges them in memory
+and relabels the smaller clusters (union by size), so each node is relabelled
+O(log n) times over the life of the table. Links are never removed
+incrementally; ``rebuild_clusters`` recomputes everything from scratch, e.g.
+after parcel corrections.
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import func, insert, select, tuple_, update
+from sqlalchemy.engine import Connection, Engine
+
+from scraper.database.unified_schema import Permit, PermitCluster, PermitRelation
+
+logger = logging.getLogger(__name__)
+
+clusters_table = PermitCluster.__table__
+relations_table = PermitRelation.__table__
+
+PARCEL_PREFIX = "parcel:"
+# Keep IN (...) lists under SQLite's default host-parameter limit
+IN_CHUNK = 500
+
+RESULT_COLUMNS = ("permit_number", "record_type", "status", "address", "parcel_number", "date_opened")
+
+
+def parcel_node(parcel_number: str) -> str:
+    return f"{PARCEL_PREFIX}{parcel_number}"
+
+
+def _chunks(items: Sequence[Any], size: int = IN_CHUNK) -> Iterable[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class UnionFind:
+    """Disjoint sets with path halving and union by size"""
+
+    def __init__(self):
+        self.parent: Dict[str, str] = {}
+        self.size: Dict[str, int] = {}
+
+    def add(self, item: str, size: int = 1) -> None:
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = size
+
+    def find(self, item: str) -> str:
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: str, b: str) -> str:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return ra
+        # The larger set's root survives; ties go to the smaller key for determinism
+        if (self.size[ra], rb) < (self.size[rb], ra):
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+        return ra
+
+
+def add_relations(conn: Connection, pairs: Iterable[Tuple[str, str]]) -> int:
+    """Insert related-permit links that are not stored yet; returns the number inserted"""
+    pairs = sorted({(a, b) for a, b in pairs if a and b and a != b})
+    if not pairs:
+        return 0
+    existing: Set[Tuple[str, str]] = set()
+    for chunk in _chunks(pairs, IN_CHUNK // 2):
+        existing.update(
+            (r.permit_number, r.related_number) for r in conn.execute(
+                select(relations_table.c.permit_number, relations_table.c.related_number)
+                .where(tuple_(relations_table.c.permit_number, relations_table.c.related_number).in_(chunk))
+            )
+        )
+    new = [{"permit_number": a, "related_number": b} for a, b in pairs if (a, b) not in existing]
+    if new:
+        conn.execute(insert(relations_table), new)
+    return len(new)
+
+
+def link_nodes(conn: Connection, edges: Iterable[Tuple[str, str]]) -> int:
+    """
+    Merge the clusters of each edge's endpoints, creating clusters for unseen nodes
+
+    Returns:
+        The number of cluster merges performed
+    """
+    edges = [(a, b) for a, b in edges if a and b]
+    if not edges:
+        return 0
+    nodes = sorted({n for edge in edges for n in edge})
+    cluster_of: Dict[str, str] = {}
+    for chunk in _chunks(nodes):
+        cluster_of.update(
+            (r.node, r.cluster_id) for r in conn.execute(
+                select(clusters_table.c.node, clusters_table.c.cluster_id).where(clusters_table.c.node.in_(chunk))
+            )
+        )
+    known_clusters = sorted(set(cluster_of.values()))
+    sizes: Dict[str, int] = {}
+    for chunk in _chunks(known_clusters):
+        sizes.update(
+            (r.cluster_id, r.members) for r in conn.execute(
+                select(clusters_table.c.cluster_id)
+                .add_columns(func.count().label("members"))
+                .where(clusters_table.c.cluster_id.in_(chunk))
+                .group_by(clusters_table.c.cluster_id)
+            )
+        )
+
+    uf = UnionFind()
+    for cluster_id, size in sizes.items():
+        uf.add(cluster_id, size)
+    new_nodes = [n for n in nodes if n not in cluster_of]
+    for node in new_nodes:
+        # A new node starts as its own singleton cluster
+        cluster_of[node] = node
+        uf.add(node, 1)
+    merges = 0
+    for a, b in edges:
+        ca, cb = uf.find(cluster_of[a]), uf.find(cluster_of[b])
+        if ca != cb:
+            uf.union(ca, cb)
+            merges += 1
+
+    relabel: Dict[str, List[str]] = {}
+    for cluster_id in known_clusters:
+        root = uf.find(cluster_id)
+        if root != cluster_id:
+            relabel.setdefault(root, []).append(cluster_id)
+    for root, absorbed in relabel.items():
+        for chunk in _chunks(absorbed):
+            conn.execute(
+                update(clusters_table).where(clusters_table.c.cluster_id.in_(chunk)).values(cluster_id=root)
+            )
+    if new_nodes:
+        conn.execute(insert(clusters_table), [
+            {"node": node, "cluster_id": uf.find(node)} for node in new_nodes
+        ])
+    return merges
+
+
+def edges_for_rows(rows: Iterable[Dict[str, Any]]) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """
+    Graph edges carried by upsert rows
+
+    Returns:
+        (related-permit pairs, cluster edges); cluster edges include the
+        related pairs and a permit -> parcel node edge per ``parcel_number``
+    """
+    related, edges = [], []
+    for row in rows:
+        number = row["permit_number"]
+        for other in row.get("related_permits") or ():
+            if other and other != number:
+                related.append((number, other))
+        if row.get("parcel_number"):
+            edges.append((number, parcel_node(row["parcel_number"])))
+    return related, related + edges
+
+
+def rebuild_clusters(engine: Engine, batch_size: int = 10000) -> int:
+    """
+    Recompute every cluster from ``permit_relations`` and ``permits.parcel_number``
+
+    Returns:
+        The number of clusters
+    """
+    uf = UnionFind()
+    with engine.connect() as conn:
+        for r in conn.execution_options(yield_per=batch_size).execute(
+            select(relations_table.c.permit_number, relations_table.c.related_number)
+        ):
+            uf.add(r.permit_number)
+            uf.add(r.related_number)
+            uf.union(r.permit_number, r.related_number)
+        for r in conn.execution_options(yield_per=batch_size).execute(
+            select(Permit.permit_number, Permit.parcel_number).where(Permit.parcel_number.is_not(None))
+        ):
+            if not r.parcel_number:
+                continue
+            parcel = parcel_node(r.parcel_number)
+            uf.add(r.permit_number)
+            uf.add(parcel)
+            uf.union(r.permit_number, parcel)
+    rows = [{"node": node, "cluster_id": uf.find(node)} for node in uf.parent]
+    with engine.begin() as conn:
+        conn.execute(clusters_table.delete())
+        for start in range(0, len(rows), batch_size):
+            conn.execute(insert(clusters_table), rows[start:start + batch_size])
+    clusters = len({row["cluster_id"] for row in rows})
+    logger.info(f"Rebuilt {clusters} permit clusters over {len(rows)} nodes")
+    return clusters
+
+
+def project_cluster(engine: Engine, permit_number: str) -> List[Dict[str, Any]]:
+    """
+    Every permit in the same development as ``permit_number``
+
+    Linked permits that have not been scraped yet are included with only
+    their ``permit_number``. A permit with no links returns just itself.
+    """
+    columns = [Permit.__table__.c[name] for name in RESULT_COLUMNS if name != "permit_number"]
+    cluster_id = (
+        select(clusters_table.c.cluster_id).where(clusters_table.c.node == permit_number).scalar_subquery()
+    )
+    stmt = (
+        select(clusters_table.c.node.label("permit_number"), *columns)
+        .select_from(clusters_table.outerjoin(Permit.__table__, Permit.permit_number == clusters_table.c.node))
+        .where(clusters_table.c.cluster_id == cluster_id, ~clusters_table.c.node.startswith(PARCEL_PREFIX))
+        .order_by(clusters_table.c.node)
+    )
+    with engine.connect() as conn:
+        members = [dict(r._mapping) for r in conn.execute(stmt)]
+        if members:
+            return members
+        own = conn.execute(
+            select(*[Permit.__table__.c[name] for name in RESULT_COLUMNS]).where(Permit.permit_number == permit_number)
+        ).first()
+    return [dict(own._mapping)] if own else []
+
+
+def cluster_id_for(engine: Engine, permit_number: str) -> Optional[str]:
+    with engine.connect() as conn:
+        return conn.execute(
+            select(clusters_table.c.cluster_id).where(clusters_table.c.node == permit_number)
+        ).scalar()
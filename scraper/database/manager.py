@@ -1,40 +1,486 @@
 """Database manager for Clark County permits"""
 
 import logging
-# from contextlib import contextmanager  # unused
-# from datetime import datetime  # unused
-# from typing import Any  # unused
-# from sqlalchemy import and_, asc, desc, text  # unused
-from sqlalchemy import create_engine
-# from sqlalchemy.exc import IntegrityError  # unused
-# from sqlalchemy.orm import Session  # unused
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import bindparam, create_engine, delete, event, insert, select, update
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
-# from scraper.database.unified_schema import Base  # unused
-from scraper.config import get_database_url
+
+from scraper.config import get_database_url, refresh_database_url
+from scraper.database.entities import resolve_entities
+from scraper.database.graph import add_relations, edges_for_rows, link_nodes, project_cluster
+from scraper.database.pool import PoolProfile, instrument_pool, pool_profile
+from scraper.database.search import ensure_search_index, search_permits
+from scraper.database.spatial import ensure_spatial_index, permits_within
+from scraper.database.unified_schema import (
+    Base,
+    Fee,
+    Inspection,
+    Permit,
+    PermitChange,
+    ScrapeRun,
+    StatusHistory,
+)
+from scraper.database.upgrade import ensure_added_columns
+from scraper.instrumentation import DB_BATCH_SIZES, StageTimer
 
 logger = logging.getLogger(__name__)
 
+permits_table = Permit.__table__
+
+# Derived by the write path from other columns (entity resolution); written when they differ, never logged
+DERIVED_COLUMNS = ("owner_entity_id", "contractor_entity_id")
+# Columns maintained by the write path itself; they never count as a change
+BOOKKEEPING_COLUMNS = frozenset({
+    "id", "permit_number", "created_at", "updated_at", "last_scraped",
+    "scraped_date", "scrape_source", "completeness_score", "extraction_notes",
+    *DERIVED_COLUMNS,
+})
+# Columns diffed against the stored row; changes are logged to permit_changes
+TRACKED_COLUMNS = tuple(
+    c.name for c in permits_table.columns if c.name not in BOOKKEEPING_COLUMNS
+)
+# Keep IN (...) lists under SQLite's default host-parameter limit
+UPSERT_BATCH_SIZE = 500
+# Child collections carried on upsert rows -> (table, columns compared and written)
+CHILD_TABLES = {
+    key: (model.__table__, tuple(
+        c.name for c in model.__table__.columns if c.name not in ("id", "permit_id", "created_at")
+    ))
+    for key, model in (("fees", Fee), ("inspections", Inspection))
+}
+
+
+def _normalize(value: Any) -> Any:
+    """Treat NULL and empty string as the same stored value when diffing"""
+    if value is None or value == "":
+        return None
+    return value
+
+
+def _as_text(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _column_defaults(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill absent columns with their Python-side defaults so executemany sees uniform keys"""
+    full = {}
+    for column in permits_table.columns:
+        if column.name == "id":
+            continue
+        if column.name in row:
+            full[column.name] = row[column.name]
+        elif column.default is not None:
+            default = column.default
+            full[column.name] = default.arg(None) if default.is_callable else default.arg
+        else:
+            full[column.name] = None
+    return full
+
+# SQLSTATE invalid_authorization_specification / invalid_password, and the messages drivers use for them
+AUTH_FAILURE_CODES = frozenset({"28000", "28P01"})
+AUTH_FAILURE_MESSAGES = ("password authentication failed", "authentication failed", "access denied for user")
+
+
+def is_auth_failure(error: BaseException) -> bool:
+    """Whether a connect error means the credentials were rejected (e.g. after a password rotation)"""
+    orig = getattr(error, "orig", None) or error
+    code = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+    if code in AUTH_FAILURE_CODES:
+        return True
+    message = str(orig).lower()
+    return any(m in message for m in AUTH_FAILURE_MESSAGES)
+
+
 class DatabaseManager:
     """Handles all database operations for permit data"""
 
-    def __init__(self, database_url: str = None):
+    def __init__(self, database_url: str = None,
+                 credentials_refresher: Optional[Callable[[], Optional[str]]] = None,
+                 concurrency: Optional[int] = None, pool: Optional[PoolProfile] = None):
         """
         Initialize database manager
 
         Args:
             database_url: Optional database URL. If not provided, uses config loader.
+            credentials_refresher: Returns a fresh database URL when connecting fails
+                authentication. Defaults to refetching the Secrets Manager secret when
+                the URL came from the config loader.
+            concurrency: Threads in this process that use the database at once; sizes
+                the connection pool (see ``scraper.database.pool``)
+            pool: Explicit pool profile, overriding ``concurrency`` and DB_POOL_PROFILE
         """
         if database_url is None:
             database_url = get_database_url()
+            if credentials_refresher is None:
+                credentials_refresher = refresh_database_url
         if database_url.startswith('sqlite'):
+            self.pool_profile = None
             self.engine = create_engine(database_url)
         else:
-            self.engine = create_engine(
-                database_url,
-                pool_size=20,
-                max_overflow=40,
+            self.pool_profile = pool or pool_profile(concurrency)
+            self.engine = create_engine(database_url, **self.pool_profile.engine_kwargs(database_url))
+            logger.info(
+                f"Database pool profile {self.pool_profile.name} "
+                f"(max connections: {self.pool_profile.max_connections or 'unbounded, via PgBouncer'})"
             )
+        instrument_pool(self.engine)
         self.SessionLocal = sessionmaker(bind=self.engine)
-        # ... rest of __init__ and class unchanged ...
+        self._write_listeners: List[Callable[[Set[str]], None]] = []
+        self._credentials_refresher = credentials_refresher
+        self._connect_args: Optional[tuple] = None
+        self._credentials_generation = 0
+        self._credentials_lock = threading.Lock()
+        if credentials_refresher is not None:
+            event.listen(self.engine, "do_connect", self._connect)
+
+    def _connect(self, dialect, conn_rec, cargs, cparams):
+        """
+        ``do_connect`` hook: connect with the newest credentials, and on an
+        authentication failure refetch them once and retry
+
+        The engine object stays the same, so everything holding
+        ``self.engine`` keeps working across a password rotation.
+        """
+        generation = self._credentials_generation
+        if self._connect_args is not None:
+            cargs[:], new_params = self._connect_args
+            cparams.clear()
+            cparams.update(new_params)
+        try:
+            return dialect.connect(*cargs, **cparams)
+        except Exception as e:
+            if not is_auth_failure(e) or not self.refresh_credentials(since=generation):
+                raise
+        cargs[:], new_params = self._connect_args
+        cparams.clear()
+        cparams.update(new_params)
+        return dialect.connect(*cargs, **cparams)
+
+    def refresh_credentials(self, since: Optional[int] = None) -> bool:
+        """
+        Refetch the database URL and rebuild the connection pool with it
+
+        Concurrent callers that failed with the same credentials share one
+        refetch: when ``since`` is older than the current generation, another
+        thread has already refreshed and this returns True without fetching.
+
+        Returns:
+            Whether new credentials are available to retry with
+        """
+        if self._credentials_refresher is None:
+            return False
+        with self._credentials_lock:
+            if since is not None and since != self._credentials_generation:
+                return self._connect_args is not None
+            try:
+                url = self._credentials_refresher()
+            except Exception as e:
+                logger.error(f"Refetching database credentials failed: {e}")
+                return False
+            if not url:
+                return False
+            cargs, cparams = self.engine.dialect.create_connect_args(make_url(url))
+            self._connect_args = (list(cargs), dict(cparams))
+            self._credentials_generation += 1
+        logger.warning("Database rejected the stored credentials; refetched them and rebuilt the connection pool")
+        # Idle connections opened with the old credentials are closed; checked-out ones finish normally
+        self.engine.dispose()
+        return True
+
+    def add_write_listener(self, listener: Callable[[Set[str]], None]) -> None:
+        """Call ``listener(permit_numbers)`` after each committed batch that wrote permits"""
+        self._write_listeners.append(listener)
+
+    def _notify_writes(self, permit_numbers: Set[str]) -> None:
+        if not permit_numbers:
+            return
+        for listener in self._write_listeners:
+            try:
+                listener(permit_numbers)
+            except Exception as e:
+                logger.error(f"Write listener {listener!r} failed: {e}")
+
+    def create_tables(self) -> None:
+        """Create any missing unified-schema tables and indexes, including full-text and spatial"""
+        Base.metadata.create_all(self.engine)
+        # Columns added to tables that already existed; before the indexes that read them
+        ensure_added_columns(self.engine)
+        ensure_search_index(self.engine)
+        ensure_spatial_index(self.engine)
 
-# ... (rest of the manager.py from old directory, with import paths updated to local package) 
\ No newline at end of file
+    def search_permits(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Ranked full-text search over project name, description and work description"""
+        return search_permits(self.engine, query, limit)
+
+    def project_cluster(self, permit_number: str) -> List[Dict[str, Any]]:
+        """Every permit linked to ``permit_number`` by related-permit links or a shared parcel"""
+        return project_cluster(self.engine, permit_number)
+
+    def archived_permit(self, permit_number: str) -> Optional[Dict[str, Any]]:
+        """A permit moved to the cold archive, as its archived row; see ``scraper.database.archive``"""
+        # Imported on use: the archive table loads the PostgreSQL dialect, which most processes never need
+        from scraper.database.archive import archived_permit
+
+        return archived_permit(self.engine, permit_number)
+
+    def permits_within(self, latitude: float, longitude: float, miles: float,
+                       limit: int = 500) -> List[Dict[str, Any]]:
+        """Geocoded permits within ``miles`` of a point, nearest first"""
+        return permits_within(self.engine, latitude, longitude, miles, limit)
+
+    def record_scrape_run(
+        self,
+        run_id: str,
+        scraper_type: str,
+        start_time: datetime,
+        timer: StageTimer,
+        status: str = "completed",
+        permits_processed: int = 0,
+        errors_count: int = 0,
+        end_time: Optional[datetime] = None,
+    ) -> None:
+        """
+        Persist a ScrapeRun row with the run's per-stage timing summary
+
+        Args:
+            run_id: Unique identifier of the run
+            scraper_type: Name of the scraper that produced the run
+            start_time: When the run started
+            timer: Stage timer holding the spans recorded during the run
+        """
+        session = self.SessionLocal()
+        try:
+            session.add(ScrapeRun(
+                run_id=run_id,
+                scraper_type=scraper_type,
+                start_time=start_time,
+                end_time=end_time or datetime.utcnow(),
+                status=status,
+                permits_processed=permits_processed,
+                errors_count=errors_count,
+                stage_timings=timer.to_json(),
+            ))
+            session.commit()
+        finally:
+            session.close()
+        logger.info(f"Recorded scrape run {run_id}")
+
+    def upsert_permits(self, rows: Iterable[Dict[str, Any]], changed_by: str = "scraper") -> Dict[str, int]:
+        """
+        Insert or update permits, recording status and field changes
+
+        Each batch is diffed against the stored rows with one set-based
+        SELECT. Unchanged permits are not written at all; changed permits
+        get a StatusHistory row (on status change) and one PermitChange row
+        per changed tracked column. Only the keys present in a row are
+        compared and written, so partial rows never blank out fields.
+        Rows may carry ``fees`` and ``inspections`` lists; see
+        ``_replace_children``. A ``related_permits`` list of permit numbers
+        and the ``parcel_number`` feed the related-permit graph; see
+        ``scraper.database.graph``. Owner and contractor names are resolved
+        to entity ids first; see ``scraper.database.entities``. Archived permits
+        in the batch are moved back to ``permits`` first; see
+        ``scraper.database.archive``. Write listeners are notified after each
+        committed batch with the permit numbers it wrote.
+
+        Args:
+            rows: Dicts keyed by ``permits`` column names; ``permit_number`` is required
+            changed_by: Recorded on StatusHistory/PermitChange rows
+
+        Returns:
+            Counts of inserted, updated and unchanged permits and of logged changes
+        """
+        stats = {
+            "inserted": 0, "updated": 0, "unchanged": 0,
+            "status_changes": 0, "field_changes": 0, "children_replaced": 0,
+            "relations_added": 0, "cluster_merges": 0,
+            "entities_created": 0, "entities_matched": 0, "restored": 0,
+        }
+        batch: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            # Copied: entity resolution adds entity-id keys to the batch rows
+            batch[row["permit_number"]] = dict(row)
+            if len(batch) >= UPSERT_BATCH_SIZE:
+                self._notify_writes(self._upsert_batch(batch, changed_by, stats))
+                batch = {}
+        if batch:
+            self._notify_writes(self._upsert_batch(batch, changed_by, stats))
+        return stats
+
+    def _upsert_batch(self, batch: Dict[str, Dict[str, Any]], changed_by: str, stats: Dict[str, int]) -> Set[str]:
+        """Write one batch in a single transaction; returns the permit numbers written"""
+        now = datetime.utcnow()
+        table = permits_table
+        DB_BATCH_SIZES.observe("permits", len(batch))
+        from scraper.database.archive import restore_archived
+
+        # Its own transaction: on SQLite the archive files are attached, which cannot happen inside one
+        stats["restored"] += len(restore_archived(self.engine, batch))
+        with self.engine.begin() as conn:
+            resolved = resolve_entities(conn, list(batch.values()))
+            stats["entities_created"] += resolved["created"]
+            stats["entities_matched"] += resolved["alias_hits"] + resolved["matched"]
+            existing = {
+                r.permit_number: r._mapping
+                for r in conn.execute(
+                    select(table.c.id, table.c.permit_number,
+                           *[table.c[n] for n in TRACKED_COLUMNS + DERIVED_COLUMNS])
+                    .where(table.c.permit_number.in_(list(batch)))
+                )
+            }
+
+            new_rows: List[Dict[str, Any]] = []
+            updates: Dict[frozenset, List[Dict[str, Any]]] = {}
+            history: List[Dict[str, Any]] = []
+            changes: List[Dict[str, Any]] = []
+            unchanged: Set[str] = set()
+            # Unchanged permits still record the scrape, so an older spooled row cannot pass as newer
+            rescraped: List[Dict[str, Any]] = []
+            for permit_number, row in batch.items():
+                stored = existing.get(permit_number)
+                if stored is None:
+                    new_rows.append(_column_defaults(dict(row, last_scraped=row.get("last_scraped", now))))
+                    continue
+                changed = [
+                    name for name in TRACKED_COLUMNS
+                    if name in row and _normalize(row[name]) != _normalize(stored[name])
+                ]
+                rederived = any(name in row and row[name] != stored[name] for name in DERIVED_COLUMNS)
+                if not changed and not rederived:
+                    stats["unchanged"] += 1
+                    unchanged.add(permit_number)
+                    rescraped.append({"_id": stored["id"], "v_last_scraped": row.get("last_scraped", now)})
+                    continue
+                values = {k: v for k, v in row.items() if k in table.c and k not in ("id", "permit_number")}
+                values.update(updated_at=now, last_scraped=row.get("last_scraped", now))
+                # Bind names must not collide with column names in an UPDATE's SET clause
+                params = {f"v_{k}": v for k, v in values.items()}
+                params["_id"] = stored["id"]
+                updates.setdefault(frozenset(values), []).append(params)
+                for name in changed:
+                    if name == "status":
+                        history.append({
+                            "permit_id": stored["id"], "old_status": stored["status"],
+                            "new_status": row["status"], "changed_date": now, "changed_by": changed_by,
+                            "notes": None,
+                        })
+                    changes.append({
+                        "permit_id": stored["id"], "field_name": name,
+                        "old_value": _as_text(stored[name]), "new_value": _as_text(row[name]),
+                        "changed_date": now, "changed_by": changed_by,
+                    })
+
+            id_by_number = {number: stored["id"] for number, stored in existing.items()}
+            if new_rows:
+                conn.execute(insert(table), new_rows)
+                inserted_ids = conn.execute(
+                    select(table.c.id, table.c.permit_number)
+                    .where(table.c.permit_number.in_([r["permit_number"] for r in new_rows]))
+                )
+                id_by_number.update({r.permit_number: r.id for r in inserted_ids})
+                for r in new_rows:
+                    if r.get("status"):
+                        history.append({
+                            "permit_id": id_by_number[r["permit_number"]], "old_status": None,
+                            "new_status": r["status"], "changed_date": now, "changed_by": changed_by,
+                            "notes": "first seen",
+                        })
+            for keys, group in updates.items():
+                stmt = update(table).where(table.c.id == bindparam("_id")).values(
+                    {k: bindparam(f"v_{k}") for k in keys}
+                )
+                conn.execute(stmt, group)
+            if rescraped:
+                conn.execute(
+                    update(table).where(table.c.id == bindparam("_id"))
+                    # Not a change: keep updated_at, which incremental exports key on
+                    .values(last_scraped=bindparam("v_last_scraped"), updated_at=table.c.updated_at),
+                    rescraped,
+                )
+            if history:
+                conn.execute(insert(StatusHistory.__table__), history)
+            if changes:
+                conn.execute(insert(PermitChange.__table__), changes)
+            children_changed: Set[str] = set()
+            for key in CHILD_TABLES:
+                replaced = self._replace_children(conn, key, batch, id_by_number)
+                stats["children_replaced"] += len(replaced)
+                children_changed |= replaced
+            # Incremental exports carry fees and inspections, so a child-only change still moves updated_at
+            children_only = [id_by_number[number] for number in children_changed & unchanged]
+            if children_only:
+                conn.execute(update(table).where(table.c.id.in_(children_only)).values(updated_at=now))
+            unchanged -= children_changed
+
+            # Graph edges: related links, and parcel membership of new or re-parcelled permits
+            graph_rows = [
+                row for number, row in batch.items()
+                if row.get("related_permits") or (row.get("parcel_number") and (
+                    number not in existing
+                    or _normalize(row["parcel_number"]) != _normalize(existing[number]["parcel_number"])
+                ))
+            ]
+            if graph_rows:
+                related, edges = edges_for_rows(graph_rows)
+                added = add_relations(conn, related)
+                merges = link_nodes(conn, edges)
+                stats["relations_added"] += added
+                stats["cluster_merges"] += merges
+                if added or merges:
+                    unchanged -= {row["permit_number"] for row in graph_rows}
+
+        stats["inserted"] += len(new_rows)
+        stats["updated"] += sum(len(g) for g in updates.values())
+        stats["status_changes"] += len(history)
+        stats["field_changes"] += len(changes)
+        return set(batch) - unchanged
+
+    def _replace_children(self, conn, key: str, batch: Dict[str, Dict[str, Any]],
+                          id_by_number: Dict[str, int]) -> Set[str]:
+        """
+        Replace the fee or inspection rows of every permit in the batch whose set changed
+
+        Existing children are read with one query; permits whose child set
+        differs get one DELETE ... WHERE permit_id IN (...) and one bulk
+        INSERT for the whole batch. Permits without the key are untouched.
+        Returns the permit numbers whose children were replaced.
+        """
+        child_table, columns = CHILD_TABLES[key]
+        incoming = {
+            id_by_number[number]: [
+                tuple(child.get(name) for name in columns) for child in row[key]
+            ]
+            for number, row in batch.items() if key in row
+        }
+        if not incoming:
+            return set()
+        stored: Dict[int, List[tuple]] = {permit_id: [] for permit_id in incoming}
+        for r in conn.execute(
+            select(child_table.c.permit_id, *[child_table.c[n] for n in columns])
+            .where(child_table.c.permit_id.in_(list(incoming)))
+        ):
+            stored[r[0]].append(tuple(r[1:]))
+        changed = [
+            permit_id for permit_id, children in incoming.items()
+            if sorted(children, key=repr) != sorted(stored[permit_id], key=repr)
+        ]
+        if not changed:
+            return set()
+        conn.execute(delete(child_table).where(child_table.c.permit_id.in_(changed)))
+        rows = [
+            dict(zip(columns, child), permit_id=permit_id)
+            for permit_id in changed for child in incoming[permit_id]
+        ]
+        if rows:
+            DB_BATCH_SIZES.observe(child_table.name, len(rows))
+            conn.execute(insert(child_table), rows)
+        changed_ids = set(changed)
+        return {number for number, permit_id in id_by_number.items() if permit_id in changed_ids}
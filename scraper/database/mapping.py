@@ -0,0 +1,149 @@
+"""Mapping from scraped permit structures to unified ``permits`` rows"""
+
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Tuple
+
+from scraper.coercion import CoercionReport, coerce_batch, schema_for_model
+from scraper.database.unified_schema import Fee, Inspection, Permit
+
+logger = logging.getLogger(__name__)
+
+PERMIT_SCHEMA = schema_for_model(Permit)
+CHILD_SCHEMAS = {"fees": schema_for_model(Fee), "inspections": schema_for_model(Inspection)}
+
+# CompletePermitData field -> permits column, where the names differ
+COMPLETE_DATA_COLUMNS = {"permit_type": "record_type"}
+
+
+def _raw_row_from_details(details) -> Dict[str, Any]:
+    row = {
+        "permit_number": details.permit_number,
+        "record_type": details.permit_type,
+        "status": details.status,
+        "description": details.description,
+        "work_description": details.work_description,
+        "project_name": details.project_name,
+        "address": details.address,
+        "parcel_number": details.parcel_number,
+        "subdivision": details.subdivision,
+        "lot": details.lot,
+        "block": details.block,
+        "owner_name": details.owner_name,
+        "contractor_name": details.contractor_name,
+        "contractor_license": details.contractor_license,
+        "job_value": details.job_value,
+        "total_fees": details.total_fees,
+        "paid_fees": details.fees_paid,
+        "balance_due": details.fees_due,
+        "applied_date": details.applied_date,
+        "application_date": details.applied_date,
+        "date_opened": details.applied_date,
+        "issued_date": details.issued_date,
+        "issue_date": details.issued_date,
+        "finaled_date": details.final_date,
+        "expiration_date": details.expiration_date,
+        "square_footage": details.square_footage,
+        "number_of_units": details.dwelling_units,
+        "construction_type": details.construction_type,
+        "zoning": details.zoning,
+        "use_code": details.use_code,
+        "occupancy_type": details.occupancy_type,
+        "latitude": details.latitude,
+        "longitude": details.longitude,
+        "completeness_score": details.completeness_score,
+        "extraction_notes": json.dumps(details.extraction_errors + details.data_quality_flags),
+        "last_scraped": details.scraped_timestamp,
+        "scrape_source": "EnhancedDetailScraper",
+    }
+    fees = [
+        {
+            "fee_type": fee.get("description"),
+            "amount": fee.get("amount"),
+            "status": fee.get("status"),
+            "paid_date": fee.get("paid_date"),
+        }
+        for fee in details.itemized_fees
+    ]
+    inspections = [
+        {
+            "inspection_type": inspection.get("inspection_type"),
+            "scheduled_date": inspection.get("scheduled_date"),
+            "completed_date": inspection.get("completed_date"),
+            "status": inspection.get("status"),
+            "outcome": inspection.get("outcome"),
+            "inspector_name": inspection.get("inspector_name"),
+            "comments": inspection.get("comments"),
+        }
+        for inspection in details.inspections
+    ]
+    # Empty lists are omitted like missing fields: a table that failed to
+    # load must not wipe the stored children
+    if details.related_permits:
+        row["related_permits"] = list(details.related_permits)
+    if fees:
+        row["fees"] = fees
+    if inspections:
+        row["inspections"] = inspections
+    return row
+
+
+def coerce_permit_rows(rows: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], CoercionReport]:
+    """
+    Coerce raw permit rows (and their fee/inspection children) to schema types
+
+    Values that are missing or fail to parse are dropped from the row, so an
+    upsert never blanks out a previously stored value; parse failures are
+    counted in the returned report, child columns as ``fees.<column>``.
+    """
+    rows, report = coerce_batch(rows, PERMIT_SCHEMA)
+    for key, schema in CHILD_SCHEMAS.items():
+        owners = [row for row in rows if key in row]
+        children = [child for row in owners for child in row[key]]
+        if not children:
+            continue
+        coerced, child_report = coerce_batch(children, schema)
+        for column, count in child_report.failures.items():
+            report.failures[f"{key}.{column}"] = count
+            report.examples[f"{key}.{column}"] = child_report.examples[column]
+        position = 0
+        for row in owners:
+            count = len(row[key])
+            row[key] = coerced[position:position + count]
+            position += count
+    cleaned = [
+        {key: value for key, value in row.items() if value is not None and value != ""}
+        for row in rows
+    ]
+    return cleaned, report
+
+
+def permit_rows_from_details(details_list: Iterable[Any]) -> Tuple[List[Dict[str, Any]], CoercionReport]:
+    """Convert a batch of PermitDetails into typed ``permits`` rows"""
+    return coerce_permit_rows(_raw_row_from_details(details) for details in details_list)
+
+
+def permit_row_from_details(details) -> Dict[str, Any]:
+    """
+    Convert a PermitDetails into a dict keyed by ``permits`` column names
+
+    Fields the scraper did not find (None) are left out so that an upsert
+    never blanks out a previously scraped value after a transient miss.
+    Itemized fees and inspections are carried as ``fees``/``inspections``
+    lists of child-row dicts when any were found.
+    """
+    rows, report = permit_rows_from_details([details])
+    if not report.ok:
+        logger.warning(f"Permit {details.permit_number}: {report}")
+    return rows[0]
+
+
+def permit_rows_from_complete_data(items: Iterable[Any]) -> Tuple[List[Dict[str, Any]], CoercionReport]:
+    """Convert CompletePermitData records (all-text fields) into typed ``permits`` rows"""
+    raw_rows = []
+    for item in items:
+        data = item.to_dict()
+        row = {COMPLETE_DATA_COLUMNS.get(key, key): value for key, value in data.items()}
+        row["extraction_notes"] = json.dumps(data["extraction_notes"])
+        raw_rows.append(row)
+    return coerce_permit_rows(raw_rows)
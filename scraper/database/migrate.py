@@ -0,0 +1,260 @@
+"""
+Streaming migrator from the legacy SQLite stores into the unified schema
+
+Legacy stores:
+  - ``enhanced``:  ``permits.db`` / ``permit_details_enhanced`` written by EnhancedDetailScraper
+  - ``automated``: ``data/permits/automated_permits.db`` / ``permits`` written by
+    Enhanced100PercentScraper
+
+Rows are read in rowid-keyset chunks (constant memory, no OFFSET), mapped
+to ``permits`` column names, coerced to schema types and bulk upserted
+through ``DatabaseManager.upsert_permits``. Progress is checkpointed per
+source after every chunk, so an interrupted run resumes where it stopped;
+re-processing a chunk is harmless because the upsert is idempotent.
+
+Usage:
+    python -m scraper.database.migrate enhanced permits.db
+    python -m scraper.database.migrate automated data/permits/automated_permits.db --chunk-size 10000
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from scraper.coercion import CoercionReport
+from scraper.database.manager import DatabaseManager
+from scraper.database.mapping import coerce_permit_rows
+from scraper.database.unified_schema import MigrationCheckpoint
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _json_list(value: Optional[str]) -> List[Any]:
+    if not value:
+        return []
+    try:
+        parsed = json.loads(value)
+    except (TypeError, ValueError):
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+def map_enhanced_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Map a permit_details_enhanced row to raw ``permits`` values"""
+    mapped = {
+        "permit_number": row.get("permit_number"),
+        "record_type": row.get("permit_type"),
+        "status": row.get("status"),
+        "description": row.get("description"),
+        "work_description": row.get("work_description"),
+        "project_name": row.get("project_name"),
+        "address": row.get("address"),
+        "parcel_number": row.get("parcel_number"),
+        "subdivision": row.get("subdivision"),
+        "lot": row.get("lot"),
+        "block": row.get("block"),
+        "owner_name": row.get("owner_name"),
+        "contractor_name": row.get("contractor_name"),
+        "contractor_license": row.get("contractor_license"),
+        "job_value": row.get("job_value"),
+        "total_fees": row.get("total_fees"),
+        "paid_fees": row.get("fees_paid"),
+        "balance_due": row.get("fees_due"),
+        "applied_date": row.get("applied_date"),
+        "application_date": row.get("applied_date"),
+        "date_opened": row.get("applied_date"),
+        "issued_date": row.get("issued_date"),
+        "issue_date": row.get("issued_date"),
+        "finaled_date": row.get("final_date"),
+        "expiration_date": row.get("expiration_date"),
+        "square_footage": row.get("square_footage"),
+        "number_of_units": row.get("dwelling_units"),
+        "construction_type": row.get("construction_type"),
+        "zoning": row.get("zoning"),
+        "use_code": row.get("use_code"),
+        "occupancy_type": row.get("occupancy_type"),
+        "latitude": row.get("latitude"),
+        "longitude": row.get("longitude"),
+        "completeness_score": row.get("completeness_score"),
+        "extraction_notes": json.dumps(
+            _json_list(row.get("extraction_errors")) + _json_list(row.get("data_quality_flags"))
+        ),
+        "last_scraped": row.get("scraped_timestamp"),
+        "scrape_source": "EnhancedDetailScraper",
+    }
+    fees = [
+        {
+            "fee_type": fee.get("description"),
+            "amount": fee.get("amount"),
+            "status": fee.get("status"),
+            "paid_date": fee.get("paid_date"),
+        }
+        for fee in _json_list(row.get("itemized_fees")) if isinstance(fee, dict)
+    ]
+    if fees:
+        mapped["fees"] = fees
+    related = [number for number in _json_list(row.get("related_permits")) if isinstance(number, str)]
+    if related:
+        mapped["related_permits"] = related
+    return mapped
+
+
+# automated_permits.db column -> permits column, for the columns whose names differ
+AUTOMATED_COLUMNS = {
+    "type": "record_type",
+    "valuation": "job_value",
+    "project_address": "address",
+    "record_date": "date_opened",
+    "scraped_date": "last_scraped",
+}
+# automated_permits.db columns copied under the same name
+AUTOMATED_PASSTHROUGH = (
+    "permit_number", "status", "funded_amount", "owner_name", "contractor_name",
+    "finaled_date", "completeness_score", "description", "parcel_number",
+    "square_footage", "zoning", "subdivision", "lot", "block", "construction_type",
+    "dwelling_units", "total_fees", "applied_date", "issued_date", "expiration_date",
+    "last_inspection_date",
+)
+
+
+def map_automated_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Map an automated_permits.db ``permits`` row to raw ``permits`` values"""
+    mapped = {name: row.get(name) for name in AUTOMATED_PASSTHROUGH if name in row}
+    for legacy, column in AUTOMATED_COLUMNS.items():
+        if legacy in row:
+            mapped[column] = row[legacy]
+    if "applied_date" in mapped:
+        mapped.setdefault("application_date", mapped["applied_date"])
+    if mapped.get("dwelling_units") is not None:
+        mapped["dwelling_units"] = str(mapped["dwelling_units"])
+    mapped["scrape_source"] = "Enhanced100PercentScraper"
+    return mapped
+
+
+# Source kind -> (legacy table, row mapper)
+SOURCES: Dict[str, Tuple[str, Callable[[Dict[str, Any]], Dict[str, Any]]]] = {
+    "enhanced": ("permit_details_enhanced", map_enhanced_row),
+    "automated": ("permits", map_automated_row),
+}
+
+
+def iter_chunks(path: str, table: str, after_rowid: int, chunk_size: int) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    Yield ``(last_rowid, rows)`` chunks in rowid order, starting after ``after_rowid``
+
+    Each chunk is a keyset query (``rowid > ? ORDER BY rowid LIMIT ?``) on a
+    read-only connection, so memory stays bounded by ``chunk_size``.
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        while True:
+            cursor = conn.execute(
+                f'SELECT rowid AS _rowid, * FROM "{table}" WHERE rowid > ? ORDER BY rowid LIMIT ?',
+                (after_rowid, chunk_size),
+            )
+            rows = [dict(r) for r in cursor]
+            if not rows:
+                return
+            after_rowid = rows[-1]["_rowid"]
+            yield after_rowid, rows
+    finally:
+        conn.close()
+
+
+class LegacyMigrator:
+    """Moves one legacy SQLite store into the unified schema with resumable progress"""
+
+    def __init__(self, db_manager: DatabaseManager, kind: str, path: str,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if kind not in SOURCES:
+            raise ValueError(f"Unknown legacy source {kind!r}; expected one of {sorted(SOURCES)}")
+        self.db_manager = db_manager
+        self.kind = kind
+        self.path = path
+        self.chunk_size = chunk_size
+        self.table, self.mapper = SOURCES[kind]
+        self.source_key = f"{kind}:{os.path.abspath(path)}"
+        self.report = CoercionReport()
+
+    def _load_checkpoint(self) -> Tuple[int, int]:
+        session = self.db_manager.SessionLocal()
+        try:
+            checkpoint = session.query(MigrationCheckpoint).filter_by(source_key=self.source_key).first()
+            if checkpoint is None:
+                return 0, 0
+            return checkpoint.last_rowid or 0, checkpoint.rows_migrated or 0
+        finally:
+            session.close()
+
+    def _save_checkpoint(self, last_rowid: int, rows_migrated: int) -> None:
+        session = self.db_manager.SessionLocal()
+        try:
+            checkpoint = session.query(MigrationCheckpoint).filter_by(source_key=self.source_key).first()
+            if checkpoint is None:
+                checkpoint = MigrationCheckpoint(source_key=self.source_key)
+                session.add(checkpoint)
+            checkpoint.last_rowid = last_rowid
+            checkpoint.rows_migrated = rows_migrated
+            session.commit()
+        finally:
+            session.close()
+
+    def reset(self) -> None:
+        """Forget saved progress so the next run starts from the first row"""
+        self._save_checkpoint(0, 0)
+
+    def run(self) -> Dict[str, int]:
+        """Migrate all rows after the saved checkpoint and return upsert counts"""
+        last_rowid, migrated = self._load_checkpoint()
+        if last_rowid:
+            logger.info(f"Resuming {self.source_key} after rowid {last_rowid} ({migrated} rows done)")
+        totals: Dict[str, int] = {}
+        started = time.monotonic()
+        for last_rowid, rows in iter_chunks(self.path, self.table, last_rowid, self.chunk_size):
+            mapped = [self.mapper(row) for row in rows]
+            mapped = [row for row in mapped if row.get("permit_number")]
+            coerced, report = coerce_permit_rows(mapped)
+            self.report.merge(report)
+            stats = self.db_manager.upsert_permits(coerced, changed_by=f"migration:{self.kind}")
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+            migrated += len(rows)
+            self._save_checkpoint(last_rowid, migrated)
+            rate = migrated / max(time.monotonic() - started, 1e-9)
+            logger.info(f"{self.source_key}: {migrated} rows migrated ({rate:,.0f} rows/s)")
+        if not self.report.ok:
+            logger.warning(f"{self.source_key}: {self.report}")
+        return totals
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Migrate a legacy SQLite permit store into the unified schema")
+    parser.add_argument("kind", choices=sorted(SOURCES), help="Legacy store layout")
+    parser.add_argument("path", help="Path to the legacy SQLite file")
+    parser.add_argument("--database-url", help="Target database URL (default: config loader)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true", help="Ignore saved progress and start over")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    db_manager = DatabaseManager(args.database_url)
+    db_manager.create_tables()
+    migrator = LegacyMigrator(db_manager, args.kind, args.path, chunk_size=args.chunk_size)
+    if args.restart:
+        migrator.reset()
+    started = datetime.utcnow()
+    totals = migrator.run()
+    logger.info(f"Migration of {args.path} finished in {datetime.utcnow() - started}: {totals}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
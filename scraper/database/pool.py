@@ -0,0 +1,128 @@
+"""
+Connection pool profiles for DatabaseManager
+
+Each process used to open a pool of 20 connections plus 40 overflow,
+although most processes only ever use one or two at a time. A profile sizes
+the pool from the number of threads that use the database concurrently:
+
+    single      one connection plus one overflow (scripts, batch workers, the batch writer)
+    threaded    ``concurrency`` connections plus half as many overflow (the read API)
+    pgbouncer   no pool in the process (NullPool); PgBouncer in transaction mode does the pooling
+
+``auto`` (the default) picks ``single`` or ``threaded`` from the concurrency.
+Every profile except ``pgbouncer`` checks connections with a ping on
+checkout and replaces them after ``DB_POOL_RECYCLE`` seconds, so connections
+dropped by RDS failover or idle timeouts are never handed out.
+
+Checkout time and connection counts are exported as
+``scraper_db_checkout_seconds`` and ``scraper_db_connections``.
+
+Configuration:
+    DB_POOL_PROFILE     auto, single, threaded or pgbouncer (default auto)
+    DB_CONCURRENCY      threads in this process that use the database at once (default 1)
+    DB_POOL_RECYCLE     seconds before a pooled connection is replaced (default 1800)
+    DB_POOL_PRE_PING    "0" to skip the liveness check on checkout
+    DB_POOL_TIMEOUT     seconds to wait for a free connection before failing (default 30)
+"""
+
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Type
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool, Pool, QueuePool
+
+from scraper.instrumentation import DB_CHECKOUT_WAIT, DB_CONNECTIONS
+
+PROFILES = ("auto", "single", "threaded", "pgbouncer")
+
+
+@dataclass(frozen=True)
+class PoolProfile:
+    """How one process pools its database connections"""
+    name: str
+    pool_size: int = 1
+    max_overflow: int = 1
+    null_pool: bool = False
+    pre_ping: bool = True
+    recycle: int = 1800
+    timeout: float = 30.0
+
+    @property
+    def max_connections(self) -> Optional[int]:
+        """Upper bound on connections this process opens; None when PgBouncer bounds them"""
+        return None if self.null_pool else self.pool_size + self.max_overflow
+
+    def engine_kwargs(self, database_url: str) -> Dict[str, Any]:
+        """Keyword arguments for ``create_engine``"""
+        if self.null_pool:
+            kwargs: Dict[str, Any] = {"poolclass": _timed_pool(NullPool, self.name)}
+            # Server-side prepared statements do not survive PgBouncer's transaction pooling
+            if make_url(database_url).get_driver_name() == "psycopg":
+                kwargs["connect_args"] = {"prepare_threshold": None}
+            return kwargs
+        return {
+            "poolclass": _timed_pool(QueuePool, self.name),
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.timeout,
+            "pool_recycle": self.recycle,
+            "pool_pre_ping": self.pre_ping,
+        }
+
+
+def pool_profile(concurrency: Optional[int] = None, name: Optional[str] = None) -> PoolProfile:
+    """
+    Profile for a process with ``concurrency`` threads using the database
+
+    Args:
+        concurrency: Defaults to DB_CONCURRENCY, else 1
+        name: One of PROFILES; defaults to DB_POOL_PROFILE, else "auto"
+    """
+    name = (name or os.getenv("DB_POOL_PROFILE") or "auto").lower()
+    if name not in PROFILES:
+        raise ValueError(f"Unknown DB_POOL_PROFILE {name!r} (choose from {', '.join(PROFILES)})")
+    if concurrency is None:
+        concurrency = int(os.getenv("DB_CONCURRENCY", "1"))
+    concurrency = max(1, concurrency)
+    if name == "auto":
+        name = "single" if concurrency == 1 else "threaded"
+    if name == "pgbouncer":
+        return PoolProfile(name, pool_size=0, max_overflow=0, null_pool=True, pre_ping=False)
+
+    recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    pre_ping = os.getenv("DB_POOL_PRE_PING", "1") != "0"
+    timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    if name == "single":
+        return PoolProfile(name, pool_size=1, max_overflow=1, recycle=recycle, pre_ping=pre_ping, timeout=timeout)
+    return PoolProfile(name, pool_size=concurrency, max_overflow=max(1, concurrency // 2),
+                       recycle=recycle, pre_ping=pre_ping, timeout=timeout)
+
+
+_TIMED_POOLS: Dict[tuple, Type[Pool]] = {}
+
+
+def _timed_pool(base: Type[Pool], label: str) -> Type[Pool]:
+    """``base`` subclass that records how long each checkout takes under ``label``"""
+    key = (base, label)
+    if key not in _TIMED_POOLS:
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                return base._do_get(self)
+            finally:
+                DB_CHECKOUT_WAIT.observe(label, time.perf_counter() - started)
+
+        # A class attribute rather than an instance one, so Pool.recreate() (engine.dispose()) keeps it
+        _TIMED_POOLS[key] = type(f"Timed{base.__name__}", (base,), {"_do_get": _do_get})
+    return _TIMED_POOLS[key]
+
+
+def instrument_pool(engine) -> None:
+    """Track open and checked-out connections of ``engine`` in scraper_db_connections"""
+    event.listen(engine, "connect", lambda dbapi_conn, record: DB_CONNECTIONS.inc(state="open"))
+    event.listen(engine, "close", lambda dbapi_conn, record: DB_CONNECTIONS.dec(state="open"))
+    event.listen(engine, "checkout", lambda dbapi_conn, record, proxy: DB_CONNECTIONS.inc(state="in_use"))
+    event.listen(engine, "checkin", lambda dbapi_conn, record: DB_CONNECTIONS.dec(state="in_use"))
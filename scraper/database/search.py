@@ -0,0 +1,134 @@
+"""
+Full-text search over permit free text (project name, description, work description)
+
+SQLite uses an external-content FTS5 table, ``permits_fts``, kept in step with
+``permits`` by insert/update/delete triggers. Postgres uses a stored
+generated ``search_vector`` tsvector column with a GIN index. In both cases
+the index changes in the same transaction as the row, so every write path
+(``upsert_permits``, ORM sessions, the migrator) keeps it current with no
+extra round trips.
+"""
+
+import logging
+import re
+from typing import Any, Dict, List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Indexed columns, from most to least significant for ranking
+SEARCH_COLUMNS = ("project_name", "description", "work_description")
+# bm25 / setweight weights, aligned with SEARCH_COLUMNS
+SQLITE_WEIGHTS = (10.0, 5.0, 1.0)
+POSTGRES_WEIGHTS = ("A", "B", "C")
+
+RESULT_COLUMNS = ("permit_number", "record_type", "status", "address", "project_name", "date_opened")
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+_SQLITE_DDL = (
+    """
+    CREATE VIRTUAL TABLE permits_fts USING fts5(
+        project_name, description, work_description,
+        content='permits', content_rowid='id', tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER permits_fts_insert AFTER INSERT ON permits BEGIN
+        INSERT INTO permits_fts(rowid, project_name, description, work_description)
+        VALUES (new.id, new.project_name, new.description, new.work_description);
+    END
+    """,
+    """
+    CREATE TRIGGER permits_fts_delete AFTER DELETE ON permits BEGIN
+        INSERT INTO permits_fts(permits_fts, rowid, project_name, description, work_description)
+        VALUES ('delete', old.id, old.project_name, old.description, old.work_description);
+    END
+    """,
+    # Only fires when an indexed column is written, so status-only updates cost nothing
+    """
+    CREATE TRIGGER permits_fts_update AFTER UPDATE OF project_name, description, work_description
+    ON permits BEGIN
+        INSERT INTO permits_fts(permits_fts, rowid, project_name, description, work_description)
+        VALUES ('delete', old.id, old.project_name, old.description, old.work_description);
+        INSERT INTO permits_fts(rowid, project_name, description, work_description)
+        VALUES (new.id, new.project_name, new.description, new.work_description);
+    END
+    """,
+)
+
+
+def _postgres_ddl() -> List[str]:
+    vector = " || ".join(
+        f"setweight(to_tsvector('english', coalesce({column}, '')), '{weight}')"
+        for column, weight in zip(SEARCH_COLUMNS, POSTGRES_WEIGHTS)
+    )
+    return [
+        f"ALTER TABLE permits ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS ({vector}) STORED",
+        "CREATE INDEX IF NOT EXISTS idx_permit_search ON permits USING GIN (search_vector)",
+    ]
+
+
+def ensure_search_index(engine: Engine) -> None:
+    """
+    Create the full-text index for ``engine``'s dialect if it is missing
+
+    A newly created SQLite index is rebuilt from the existing rows; the
+    Postgres generated column is computed for existing rows by the ALTER.
+    """
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        if "permits_fts" in inspect(engine).get_table_names():
+            return
+        with engine.begin() as conn:
+            for statement in _SQLITE_DDL:
+                conn.exec_driver_sql(statement)
+            conn.exec_driver_sql("INSERT INTO permits_fts(permits_fts) VALUES ('rebuild')")
+        logger.info("Created permits_fts full-text index")
+    elif dialect == "postgresql":
+        with engine.begin() as conn:
+            for statement in _postgres_ddl():
+                conn.exec_driver_sql(statement)
+    else:
+        logger.warning(f"No full-text index support for dialect {dialect}")
+
+
+def _fts5_query(query: str) -> str:
+    """Turn free text into an FTS5 AND query of quoted terms, so user input is never parsed as syntax"""
+    return " ".join(f'"{term}"' for term in _TERM.findall(query))
+
+
+def search_permits(engine: Engine, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Rank permits whose free text matches every word of ``query``
+
+    Returns:
+        Up to ``limit`` dicts with RESULT_COLUMNS and a ``rank`` (higher is better)
+    """
+    columns = ", ".join(f"p.{column}" for column in RESULT_COLUMNS)
+    if engine.dialect.name == "postgresql":
+        if not _TERM.search(query):
+            return []
+        sql = text(
+            f"SELECT {columns}, ts_rank_cd(p.search_vector, q) AS rank "
+            "FROM permits p, websearch_to_tsquery('english', :query) q "
+            "WHERE p.search_vector @@ q ORDER BY rank DESC, p.id LIMIT :limit"
+        )
+        params = {"query": query, "limit": limit}
+    else:
+        match = _fts5_query(query)
+        if not match:
+            return []
+        weights = ", ".join(str(w) for w in SQLITE_WEIGHTS)
+        # bm25() is lower-is-better; negate it so both dialects rank descending
+        sql = text(
+            f"SELECT {columns}, -bm25(permits_fts, {weights}) AS rank "
+            "FROM permits_fts JOIN permits p ON p.id = permits_fts.rowid "
+            "WHERE permits_fts MATCH :query ORDER BY rank DESC, p.id LIMIT :limit"
+        )
+        params = {"query": match, "limit": limit}
+    with engine.connect() as conn:
+        return [dict(row._mapping) for row in conn.execute(sql, params)]
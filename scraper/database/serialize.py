@@ -0,0 +1,169 @@
+"""
+Bulk serialization of permit rows to JSON
+
+``Permit.to_dict`` used to decide how to render each column by inspecting
+every value of every row. A ``RowPlan`` makes those decisions once per
+table: it picks one converter per column and compiles them into a single
+function. That function unpacks a plain result tuple and builds the same
+dict as ``to_dict``, with the common conversions inlined.
+
+``rows_to_json`` and ``rows_to_ndjson`` apply a plan to Core result rows
+(``select(*plan.columns)``), so bulk readers never build ORM objects.
+Encoding uses orjson when it is installed and the standard library
+otherwise.
+
+    plan = row_plan(Permit.__table__)
+    with engine.connect() as conn:
+        body = rows_to_ndjson(conn.execute(select(*plan.columns)), plan)
+
+``python -m scraper.benchmarks.serialize_permits`` compares it with ``to_dict``.
+"""
+
+import json
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Date, DateTime
+
+orjson: Optional[ModuleType]
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is several times slower but produces the same documents
+    orjson = None
+
+# Rendered as strings ("" when NULL) for clients that expect exact decimal text
+MONEY_COLUMNS = frozenset({
+    "job_value", "total_fees", "paid_fees", "balance_due", "square_footage", "property_acreage",
+})
+# Output key for columns whose public name differs
+RENAMED = {"record_type": "permit_type"}
+
+
+def _blank_if_none(value: Any) -> Any:
+    return value if value is not None else ""
+
+
+def _iso_or_blank(value: Any) -> Any:
+    return value.isoformat() if value is not None else ""
+
+
+def _str_or_blank(value: Any) -> str:
+    return str(value) if value is not None else ""
+
+
+def _score(value: Any) -> float:
+    return value if value is not None else 0.0
+
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+def _notes(value: Any) -> List[Any]:
+    if not value:
+        return []
+    try:
+        return _loads(value)
+    except (ValueError, TypeError):
+        return []
+
+
+def _converter(column) -> Callable[[Any], Any]:
+    if column.name in MONEY_COLUMNS:
+        return _str_or_blank
+    if column.name == "completeness_score":
+        return _score
+    if column.name == "extraction_notes":
+        return _notes
+    if isinstance(column.type, (DateTime, Date)):
+        return _iso_or_blank
+    return _blank_if_none
+
+
+# Converters inlined as expressions by RowPlan; "{v}" is the column's local variable
+_INLINE: Dict[Callable[[Any], Any], str] = {
+    _blank_if_none: "'' if {v} is None else {v}",
+    _iso_or_blank: "'' if {v} is None else {v}.isoformat()",
+    _str_or_blank: "'' if {v} is None else str({v})",
+    _score: "0.0 if {v} is None else {v}",
+}
+
+
+class RowPlan:
+    """Per-table conversion from a result tuple to the public dict form"""
+
+    def __init__(self, table):
+        columns = list(table.columns)
+        # Renamed keys go last, matching the key order to_dict always produced
+        columns.sort(key=lambda column: column.name in RENAMED)
+        self.table = table
+        self.columns = columns
+        self.keys: Tuple[str, ...] = tuple(RENAMED.get(c.name, c.name) for c in columns)
+        self.converters: Tuple[Callable[[Any], Any], ...] = tuple(_converter(c) for c in columns)
+        self.to_dict = self._compile()
+
+    def _compile(self) -> Callable[[Sequence[Any]], Dict[str, Any]]:
+        """
+        One function for the whole row: ``to_dict(values)`` with ``values`` in
+        ``self.columns`` order (a Core Row or any sequence)
+        """
+        namespace: Dict[str, Any] = {}
+        names = [f"c{i}" for i in range(len(self.columns))]
+        items = []
+        for name, key, convert in zip(names, self.keys, self.converters):
+            template = _INLINE.get(convert)
+            if template is None:
+                namespace[f"convert_{name}"] = convert
+                expression = f"convert_{name}({name})"
+            else:
+                expression = template.format(v=name)
+            items.append(f"        {key!r}: {expression},")
+        unpack = ", ".join(names) + ("," if len(names) == 1 else "")
+        source = "\n".join([
+            "def to_dict(values):",
+            f"    {unpack} = values",
+            "    return {",
+            *items,
+            "    }",
+        ])
+        exec(compile(source, f"<row plan {self.table.name}>", "exec"), namespace)
+        return namespace["to_dict"]
+
+    def values_of(self, obj: Any) -> Tuple[Any, ...]:
+        """Column values of an ORM instance, in plan order"""
+        return tuple(getattr(obj, column.key) for column in self.columns)
+
+    def dicts(self, rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+        to_dict = self.to_dict
+        return [to_dict(row) for row in rows]
+
+
+_PLANS: Dict[Any, RowPlan] = {}
+
+
+def row_plan(table) -> RowPlan:
+    """The table's plan, built on first use"""
+    plan = _PLANS.get(table)
+    if plan is None:
+        plan = _PLANS[table] = RowPlan(table)
+    return plan
+
+
+def dumps(value: Any) -> bytes:
+    """Compact JSON bytes; values JSON cannot represent are rendered with ``str``"""
+    if orjson is not None:
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, default=str, separators=(",", ":")).encode()
+
+
+def rows_to_json(rows: Iterable[Sequence[Any]], plan: RowPlan) -> bytes:
+    """A JSON array of converted rows"""
+    return dumps(plan.dicts(rows))
+
+
+def rows_to_ndjson(rows: Iterable[Sequence[Any]], plan: RowPlan) -> bytes:
+    """Converted rows as newline-delimited JSON (each line ends in ``\\n``)"""
+    to_dict = plan.to_dict
+    if orjson is not None:
+        option = orjson.OPT_APPEND_NEWLINE
+        return b"".join(orjson.dumps(to_dict(row), default=str, option=option) for row in rows)
+    return b"".join(dumps(to_dict(row)) + b"\n" for row in rows)
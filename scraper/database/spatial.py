@@ -0,0 +1,149 @@
+"""
+Spatial index over permit coordinates and radius queries
+
+SQLite keeps an R*Tree virtual table, ``permits_rtree``, in step with
+``permits.latitude``/``longitude`` through triggers. Postgres uses a GiST
+index on the PostGIS geography of each permit when the extension can be
+enabled, and otherwise a plain (latitude, longitude) B-tree for the bounding
+box prefilter. Radius queries prefilter on the bounding box through the
+index and then apply the exact great-circle distance.
+"""
+
+import logging
+import math
+from typing import Any, Dict, List
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_MILES = 3958.8
+METERS_PER_MILE = 1609.344
+
+RESULT_COLUMNS = ("permit_number", "record_type", "status", "address", "latitude", "longitude")
+
+_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE permits_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon)",
+    """
+    CREATE TRIGGER permits_rtree_insert AFTER INSERT ON permits
+    WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+        INSERT INTO permits_rtree VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END
+    """,
+    """
+    CREATE TRIGGER permits_rtree_update AFTER UPDATE OF latitude, longitude ON permits BEGIN
+        DELETE FROM permits_rtree WHERE id = old.id;
+        INSERT INTO permits_rtree
+        SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END
+    """,
+    """
+    CREATE TRIGGER permits_rtree_delete AFTER DELETE ON permits BEGIN
+        DELETE FROM permits_rtree WHERE id = old.id;
+    END
+    """,
+    """
+    INSERT INTO permits_rtree
+    SELECT id, latitude, latitude, longitude, longitude FROM permits
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """,
+)
+
+_POSTGIS_POINT = "(ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography)"
+
+
+def _has_postgis(engine: Engine) -> bool:
+    with engine.connect() as conn:
+        return bool(conn.exec_driver_sql(
+            "SELECT 1 FROM pg_extension WHERE extname = 'postgis'"
+        ).scalar())
+
+
+def ensure_spatial_index(engine: Engine) -> None:
+    """Create the spatial index for ``engine``'s dialect if it is missing"""
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        if "permits_rtree" in inspect(engine).get_table_names():
+            return
+        with engine.begin() as conn:
+            for statement in _SQLITE_DDL:
+                conn.exec_driver_sql(statement)
+        logger.info("Created permits_rtree spatial index")
+    elif dialect == "postgresql":
+        try:
+            with engine.begin() as conn:
+                conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS postgis")
+        except DBAPIError as e:
+            logger.warning(f"PostGIS unavailable, using a B-tree bounding-box index: {e}")
+        with engine.begin() as conn:
+            if _has_postgis(engine):
+                conn.exec_driver_sql(
+                    f"CREATE INDEX IF NOT EXISTS idx_permit_geog ON permits USING GIST ({_POSTGIS_POINT})"
+                )
+            else:
+                conn.exec_driver_sql(
+                    "CREATE INDEX IF NOT EXISTS idx_permit_lat_lon ON permits (latitude, longitude)"
+                )
+    else:
+        logger.warning(f"No spatial index support for dialect {dialect}")
+
+
+def haversine_miles(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+def bounding_box(latitude: float, longitude: float, miles: float):
+    """(min_lat, max_lat, min_lon, max_lon) enclosing the circle of ``miles`` around the point"""
+    dlat = math.degrees(miles / EARTH_RADIUS_MILES)
+    dlon = dlat / max(math.cos(math.radians(latitude)), 1e-6)
+    return latitude - dlat, latitude + dlat, longitude - dlon, longitude + dlon
+
+
+def permits_within(engine: Engine, latitude: float, longitude: float, miles: float,
+                   limit: int = 500) -> List[Dict[str, Any]]:
+    """
+    Permits within ``miles`` of a point, nearest first
+
+    Returns:
+        Up to ``limit`` dicts with RESULT_COLUMNS and ``distance_miles``
+    """
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, miles)
+    columns = ", ".join(f"p.{column}" for column in RESULT_COLUMNS)
+    box = {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon}
+    if engine.dialect.name == "sqlite":
+        sql = text(
+            f"SELECT {columns} FROM permits_rtree r JOIN permits p ON p.id = r.id "
+            "WHERE r.max_lat >= :min_lat AND r.min_lat <= :max_lat "
+            "AND r.max_lon >= :min_lon AND r.min_lon <= :max_lon"
+        )
+        params = box
+    elif engine.dialect.name == "postgresql" and _has_postgis(engine):
+        sql = text(
+            f"SELECT {columns} FROM permits p WHERE ST_DWithin({_POSTGIS_POINT}, "
+            "ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography, :meters)"
+        )
+        params = {"lat": latitude, "lon": longitude, "meters": miles * METERS_PER_MILE}
+    else:
+        sql = text(
+            f"SELECT {columns} FROM permits p WHERE p.latitude BETWEEN :min_lat AND :max_lat "
+            "AND p.longitude BETWEEN :min_lon AND :max_lon"
+        )
+        params = box
+    with engine.connect() as conn:
+        rows = [dict(r._mapping) for r in conn.execute(sql, params)]
+    # The box (and the R*Tree's float32 storage) over-selects; apply the exact distance
+    results = []
+    for row in rows:
+        distance = haversine_miles(latitude, longitude, row["latitude"], row["longitude"])
+        if distance <= miles:
+            row["distance_miles"] = round(distance, 4)
+            results.append(row)
+    results.sort(key=lambda row: row["distance_miles"])
+    return results[:limit]
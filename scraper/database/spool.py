@@ -0,0 +1,315 @@
+"""
+Local write-ahead spool for permit rows the database cannot take right now
+
+When RDS is failing over, rotating credentials or unreachable, the
+background writer appends its batches here instead of dropping them.
+``SpoolReplayer`` drains the spool into the database once it is back.
+
+On disk the spool is a directory of segments. Rows are appended to the one
+open segment (``<seq>.open``), which is sealed (renamed to ``<seq>.seg``)
+once it passes ``segment_bytes`` or when the replayer picks it up. Each
+record is
+
+    length (4 bytes, big endian) | crc32 (4 bytes) | flags (1 byte) | payload
+
+where the payload is the JSON row, zlib-compressed when flag bit 0 is set.
+Every append reaches the OS immediately, but fsync runs at most once per
+``fsync_every`` records or ``fsync_interval`` seconds, so a burst of
+appends costs one disk flush. A record torn by a crash fails its length or
+CRC check and ends the segment.
+
+Replay is idempotent. Segments are applied oldest first and deleted only
+after every row in them is committed. A row is skipped when the database
+already holds a scrape of that permit at least as new (``last_scraped``), so
+re-applying a partly replayed segment, or a row the writer got through
+later, never rolls a permit back. While a backlog exists the writer appends
+new rows to the spool too, so rows reach the database in scrape order.
+
+Configuration:
+    DB_SPOOL_DIR            directory to spool into; unset disables the spool
+    DB_SPOOL_SEGMENT_MB     segment size before rotation (default 64)
+    DB_SPOOL_COMPRESS       "0" to store records uncompressed
+    DB_SPOOL_REPLAY_SECONDS seconds between replay attempts (default 30)
+"""
+
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from datetime import date, datetime
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional
+
+from sqlalchemy import select
+
+from scraper.database.unified_schema import Permit
+from scraper.instrumentation import QUEUE_DEPTH, SPOOL_RECORDS
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_BYTES = int(os.getenv("DB_SPOOL_SEGMENT_MB", "64")) * 1024 * 1024
+COMPRESS = os.getenv("DB_SPOOL_COMPRESS", "1") != "0"
+REPLAY_INTERVAL = float(os.getenv("DB_SPOOL_REPLAY_SECONDS", "30"))
+REPLAY_BATCH = 500
+
+_HEADER = struct.Struct(">IIB")
+_COMPRESSED = 1
+OPEN_SUFFIX = ".open"
+SEALED_SUFFIX = ".seg"
+
+permits_table = Permit.__table__
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, date):
+        return {"$date": value.isoformat()}
+    raise TypeError(f"Cannot spool {type(value).__name__}")
+
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        if "$datetime" in obj:
+            return datetime.fromisoformat(obj["$datetime"])
+        if "$date" in obj:
+            return date.fromisoformat(obj["$date"])
+    return obj
+
+
+def encode_record(row: Dict[str, Any], compress: bool = COMPRESS) -> bytes:
+    payload = json.dumps(row, default=_encode_value, separators=(",", ":")).encode()
+    flags = 0
+    if compress:
+        payload = zlib.compress(payload, 1)
+        flags |= _COMPRESSED
+    return _HEADER.pack(len(payload), zlib.crc32(payload), flags) + payload
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Rows of one segment, stopping at the first torn or corrupt record"""
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            header = f.read(_HEADER.size)
+            if not header:
+                return
+            if len(header) < _HEADER.size:
+                logger.warning(f"Truncated record header at {path}:{offset}; ignoring the rest")
+                return
+            length, crc, flags = _HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                logger.warning(f"Torn or corrupt record at {path}:{offset}; ignoring the rest")
+                return
+            if flags & _COMPRESSED:
+                payload = zlib.decompress(payload)
+            yield json.loads(payload, object_hook=_decode_object)
+            offset += _HEADER.size + length
+
+
+class Spool:
+    """
+    Append-only, segment-rotated record log in ``directory``
+
+    Args:
+        segment_bytes: Seal the open segment once it is this large
+        compress: zlib-compress each record
+        fsync_every: fsync after this many unsynced records
+        fsync_interval: fsync when the oldest unsynced record is this many seconds old
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = SEGMENT_BYTES, compress: bool = COMPRESS,
+                 fsync_every: int = 100, fsync_interval: float = 1.0):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.compress = compress
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._lock = threading.RLock()
+        self._file: Optional[BinaryIO] = None
+        self._path: Optional[str] = None
+        self._size = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        # Segments left open by a crashed process are complete up to their last intact record
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(OPEN_SUFFIX):
+                self._seal_path(os.path.join(directory, name))
+        self._seq = max((self._seq_of(name) for name in os.listdir(directory)), default=0)
+        self._report()
+
+    @staticmethod
+    def _seq_of(name: str) -> int:
+        stem = name.split(".", 1)[0]
+        return int(stem) if stem.isdigit() else 0
+
+    def _seal_path(self, path: str) -> None:
+        os.replace(path, path[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+
+    def _report(self) -> None:
+        QUEUE_DEPTH.set(len(self.sealed_segments()) + (1 if self._size else 0), queue="spool_segments")
+
+    def append_many(self, rows: List[Dict[str, Any]]) -> None:
+        """Append rows; they are on disk once the next batched fsync runs (see ``sync``)"""
+        if not rows:
+            return
+        with self._lock:
+            if self._file is None:
+                self._seq += 1
+                self._path = os.path.join(self.directory, f"{self._seq:010d}{OPEN_SUFFIX}")
+                self._file = open(self._path, "ab")
+                self._size = 0
+            data = b"".join(encode_record(row, self.compress) for row in rows)
+            self._file.write(data)
+            # Hand the bytes to the OS now; a process crash then loses nothing, only a host crash can
+            self._file.flush()
+            self._size += len(data)
+            self._unsynced += len(rows)
+            SPOOL_RECORDS.inc(len(rows), event="appended")
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self.sync()
+            if self._size >= self.segment_bytes:
+                self.rotate()
+            self._report()
+
+    def sync(self) -> None:
+        with self._lock:
+            if self._file is not None and self._unsynced:
+                os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def rotate(self) -> None:
+        """Seal the open segment, if it holds anything, so the replayer can take it"""
+        with self._lock:
+            if self._file is None or self._path is None:
+                return
+            self.sync()
+            self._file.close()
+            self._seal_path(self._path)
+            self._file = None
+            self._path = None
+            self._size = 0
+            self._report()
+
+    def sealed_segments(self) -> List[str]:
+        return sorted(
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if name.endswith(SEALED_SUFFIX)
+        )
+
+    def has_backlog(self) -> bool:
+        with self._lock:
+            return self._file is not None or bool(self.sealed_segments())
+
+    def close(self) -> None:
+        self.rotate()
+
+
+def _drop_stale(conn, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Rows whose scrape is newer than what the database holds for that permit"""
+    stored = dict(conn.execute(
+        select(permits_table.c.permit_number, permits_table.c.last_scraped)
+        .where(permits_table.c.permit_number.in_({row["permit_number"] for row in rows}))
+    ).all())
+    fresh = []
+    for row in rows:
+        have, scraped = stored.get(row["permit_number"]), row.get("last_scraped")
+        if have is not None and scraped is not None and scraped <= have:
+            continue
+        fresh.append(row)
+    return fresh
+
+
+def replay(spool: Spool, db_manager, batch_size: int = REPLAY_BATCH) -> Dict[str, int]:
+    """
+    Apply every spooled row to the database, oldest segment first
+
+    Stops at the first failed batch and leaves that segment in place for the
+    next attempt. Returns counts of replayed and skipped rows and of segments drained.
+    """
+    totals = {"replayed": 0, "skipped": 0, "segments": 0}
+    spool.rotate()
+    for path in spool.sealed_segments():
+        batch: List[Dict[str, Any]] = []
+        for row in read_records(path):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _apply(db_manager, batch, totals)
+                batch = []
+        if batch:
+            _apply(db_manager, batch, totals)
+        os.unlink(path)
+        totals["segments"] += 1
+        spool._report()
+    if totals["segments"]:
+        logger.info(f"Replayed spool: {totals}")
+    return totals
+
+
+def _apply(db_manager, rows: List[Dict[str, Any]], totals: Dict[str, int]) -> None:
+    with db_manager.engine.connect() as conn:
+        fresh = _drop_stale(conn, rows)
+    if fresh:
+        db_manager.upsert_permits(fresh, changed_by="spool")
+    totals["replayed"] += len(fresh)
+    totals["skipped"] += len(rows) - len(fresh)
+    SPOOL_RECORDS.inc(len(fresh), event="replayed")
+    SPOOL_RECORDS.inc(len(rows) - len(fresh), event="skipped")
+
+
+class SpoolReplayer:
+    """Thread draining ``spool`` into the database every ``interval`` seconds while it has a backlog"""
+
+    def __init__(self, spool: Spool, db_manager, interval: float = REPLAY_INTERVAL):
+        self.spool = spool
+        self.db_manager = db_manager
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SpoolReplayer":
+        self._thread = threading.Thread(target=self._run, name="spool-replayer", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            # Bounds how long a quiet tail of appends can sit without an fsync
+            self.spool.sync()
+            if not self.spool.has_backlog():
+                continue
+            try:
+                replay(self.spool, self.db_manager)
+            except Exception as e:
+                logger.warning(f"Spool replay failed, retrying in {self.interval:.0f}s: {e}")
+
+    def close(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def drain(self, timeout: float = 5.0) -> None:
+        """
+        Stop the thread, make a last replay attempt and close the spool
+
+        Called at shutdown after the writer has flushed. Whatever cannot be
+        written stays on disk for the next process using this directory.
+        """
+        self.close(timeout)
+        if self._thread is not None and self._thread.is_alive():
+            logger.warning("Spool replay still running at shutdown; leaving the rest on disk")
+            return
+        if self.spool.has_backlog():
+            try:
+                replay(self.spool, self.db_manager)
+            except Exception as e:
+                logger.warning(
+                    f"Final spool replay failed; {len(self.spool.sealed_segments())} segments stay in "
+                    f"{self.spool.directory}: {e}"
+                )
+        self.spool.close()
@@ -21,6 +21,8 @@ from sqlalchemy import (
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 
+from scraper.database.serialize import row_plan
+
 Base = declarative_base()
 logger = logging.getLogger(__name__)
 
@@ -77,6 +79,10 @@ class Permit(Base):
     water_provider = Column(String(100))
     sanitation_provider = Column(String(100))
     property_acreage = Column(Float)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    owner_entity_id = Column(Integer, ForeignKey("entities.id"), index=True)
+    contractor_entity_id = Column(Integer, ForeignKey("entities.id"), index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_scraped = Column(DateTime)
@@ -96,37 +102,20 @@ class Permit(Base):
     status_history = relationship(
         "StatusHistory", back_populates="permit", cascade="all, delete-orphan"
     )
+    changes = relationship(
+        "PermitChange", back_populates="permit", cascade="all, delete-orphan"
+    )
     __table_args__ = (
         Index("idx_permit_date_status", "date_opened", "status"),
         Index("idx_permit_owner", "owner_name"),
         Index("idx_permit_address", "address"),
         Index("idx_permit_updated", "updated_at"),
+        Index("idx_permit_contractor", "contractor_name"),
     )
     def to_dict(self):
-        import json
-        from datetime import date, datetime
-        result = {}
-        for column in self.__table__.columns:
-            value = getattr(self, column.name)
-            if isinstance(value, (datetime, date)):
-                result[column.name] = value.isoformat()
-            elif column.name in ["job_value", "total_fees", "paid_fees", "balance_due", "square_footage", "property_acreage"]:
-                result[column.name] = str(value) if value is not None else ""
-            elif column.name == "completeness_score":
-                result[column.name] = value if value is not None else 0.0
-            elif column.name == "extraction_notes":
-                if value:
-                    try:
-                        result[column.name] = json.loads(value)
-                    except (json.JSONDecodeError, TypeError):
-                        result[column.name] = []
-                else:
-                    result[column.name] = []
-            else:
-                result[column.name] = value if value is not None else ""
-        if "record_type" in result:
-            result["permit_type"] = result.pop("record_type")
-        return result
+        """Public dict form; see ``scraper.database.serialize`` for bulk use"""
+        plan = row_plan(self.__table__)
+        return plan.to_dict(plan.values_of(self))
 
 class Inspection(Base):
     __tablename__ = "inspections"
@@ -136,6 +125,7 @@ class Inspection(Base):
     scheduled_date = Column(DateTime)
     completed_date = Column(DateTime)
     status = Column(String(50))
+    outcome = Column(String(20))
     inspector_name = Column(String(255))
     comments = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -143,6 +133,8 @@ class Inspection(Base):
     __table_args__ = (
         Index("idx_inspection_permit", "permit_id"),
         Index("idx_inspection_date", "scheduled_date"),
+        Index("idx_inspection_outcome_completed", "outcome", "completed_date"),
+        Index("idx_inspection_type", "inspection_type"),
     )
 
 class Document(Base):
@@ -174,6 +166,8 @@ class Fee(Base):
     __table_args__ = (
         Index("idx_fee_permit", "permit_id"),
         Index("idx_fee_status", "status"),
+        Index("idx_fee_type", "fee_type"),
+        Index("idx_fee_paid_date", "paid_date"),
     )
 
 class StatusHistory(Base):
@@ -191,6 +185,22 @@ class StatusHistory(Base):
         Index("idx_status_history_date", "changed_date"),
     )
 
+class PermitChange(Base):
+    """Generic field-level change log written by the CDC upsert path."""
+    __tablename__ = "permit_changes"
+    id = Column(Integer, primary_key=True)
+    permit_id = Column(Integer, ForeignKey("permits.id", ondelete="CASCADE"))
+    field_name = Column(String(100), nullable=False)
+    old_value = Column(Text)
+    new_value = Column(Text)
+    changed_date = Column(DateTime, default=datetime.utcnow)
+    changed_by = Column(String(100))
+    permit = relationship("Permit", back_populates="changes")
+    __table_args__ = (
+        Index("idx_permit_change_permit", "permit_id"),
+        Index("idx_permit_change_field_date", "field_name", "changed_date"),
+    )
+
 class ScrapeRun(Base):
     __tablename__ = "scrape_runs"
     id = Column(Integer, primary_key=True)
@@ -203,9 +213,96 @@ class ScrapeRun(Base):
     permits_processed = Column(Integer, default=0)
     errors_count = Column(Integer, default=0)
     error_details = Column(Text)
+    stage_timings = Column(Text)
     __table_args__ = (
         Index("idx_scrape_run_time", "start_time"),
         Index("idx_scrape_run_status", "status"),
     )
 
-# --- End full unified_schema.py content --- 
\ No newline at end of file
+class PermitRelation(Base):
+    """Related-permit link as listed on the permit's detail page, keyed by permit number."""
+    __tablename__ = "permit_relations"
+    id = Column(Integer, primary_key=True)
+    permit_number = Column(String(50), nullable=False)
+    related_number = Column(String(50), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        Index("idx_permit_relation_pair", "permit_number", "related_number", unique=True),
+        Index("idx_permit_relation_reverse", "related_number", "permit_number"),
+    )
+
+class PermitCluster(Base):
+    """
+    Connected component ("project cluster") of each node in the permit graph.
+
+    Nodes are permit numbers and ``parcel:<parcel_number>`` keys, so permits
+    on the same parcel or linked as related permits share a cluster_id.
+    """
+    __tablename__ = "permit_clusters"
+    node = Column(String(80), primary_key=True)
+    cluster_id = Column(String(80), nullable=False, index=True)
+
+class Entity(Base):
+    """
+    Resolved owner or contractor; ids are stable once assigned.
+
+    The license, phonetic_key and name_prefix columns are the blocking keys:
+    candidates for a new name are fetched through their indexes only.
+    """
+    __tablename__ = "entities"
+    id = Column(Integer, primary_key=True)
+    entity_type = Column(String(20), nullable=False)
+    canonical_name = Column(String(255), nullable=False)
+    normalized_name = Column(String(255), nullable=False)
+    license = Column(String(50))
+    phonetic_key = Column(String(10))
+    name_prefix = Column(String(10))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        Index("idx_entity_license", "entity_type", "license"),
+        Index("idx_entity_phonetic", "entity_type", "phonetic_key"),
+        Index("idx_entity_prefix", "entity_type", "name_prefix"),
+    )
+
+class EntityAlias(Base):
+    """Normalized name (and license) already resolved to an entity; exact repeats skip matching."""
+    __tablename__ = "entity_aliases"
+    id = Column(Integer, primary_key=True)
+    entity_type = Column(String(20), nullable=False)
+    normalized_name = Column(String(255), nullable=False)
+    license = Column(String(50), nullable=False, default="")
+    entity_id = Column(Integer, ForeignKey("entities.id"), nullable=False)
+    __table_args__ = (
+        Index("idx_entity_alias_lookup", "entity_type", "normalized_name", "license", unique=True),
+    )
+
+class MigrationCheckpoint(Base):
+    """Resumable progress of a legacy-store migration, one row per source."""
+    __tablename__ = "migration_checkpoints"
+    id = Column(Integer, primary_key=True)
+    source_key = Column(String(500), unique=True, nullable=False)
+    last_rowid = Column(Integer, default=0)
+    rows_migrated = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ExportWatermark(Base):
+    """Newest (updated_at, id) already exported to a destination, for incremental exports."""
+    __tablename__ = "export_watermarks"
+    id = Column(Integer, primary_key=True)
+    name = Column(String(500), unique=True, nullable=False)
+    last_updated_at = Column(DateTime)
+    last_permit_id = Column(Integer, default=0)
+    rows_exported = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class ArchivedPermit(Base):
+    """Where a permit moved out of ``permits`` is kept; see scraper.database.archive."""
+    __tablename__ = "archived_permits"
+    id = Column(Integer, primary_key=True)
+    permit_number = Column(String(50), unique=True, nullable=False)
+    applied_year = Column(Integer, nullable=False, index=True)
+    tier = Column(String(20), nullable=False)  # "archive" (year partition) or "parquet" (detached file)
+    location = Column(String(500))
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+# --- End full unified_schema.py content --- 
@@ -0,0 +1,60 @@
+"""
+In-place upgrade of tables that already exist in a deployed database
+
+``create_all`` only creates missing tables; it never alters one that is
+already there. Columns added to an existing table are listed in
+``ADDED_COLUMNS`` and added by ``ensure_added_columns``, which
+``DatabaseManager.create_tables`` runs. Postgres uses
+``ALTER TABLE ... ADD COLUMN IF NOT EXISTS``, so concurrent pods starting at
+once are safe; SQLite has no such clause, so present columns are skipped
+after an inspection. Indexes on those tables are then created if missing.
+"""
+
+import logging
+from typing import Dict, Tuple
+
+from sqlalchemy import Column, inspect
+from sqlalchemy.engine import Connection, Engine
+
+from scraper.database.unified_schema import Base
+
+logger = logging.getLogger(__name__)
+
+# Columns added to tables after their first release, by table name
+ADDED_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    "permits": ("latitude", "longitude", "owner_entity_id", "contractor_entity_id"),
+    "inspections": ("outcome",),
+    "scrape_runs": ("stage_timings",),
+}
+
+
+def _column_ddl(conn: Connection, column: Column) -> str:
+    ddl = f"{column.name} {column.type.compile(dialect=conn.dialect)}"
+    for key in column.foreign_keys:
+        ddl += f" REFERENCES {key.column.table.name}({key.column.name})"
+    return ddl
+
+
+def ensure_added_columns(engine: Engine) -> None:
+    """Add any ADDED_COLUMNS missing from existing tables, and the indexes of those tables"""
+    existing_tables = set(inspect(engine).get_table_names())
+    with engine.begin() as conn:
+        for table_name, names in ADDED_COLUMNS.items():
+            if table_name not in existing_tables:
+                continue
+            table = Base.metadata.tables[table_name]
+            if conn.dialect.name == "postgresql":
+                present = set()
+                if_not_exists = "IF NOT EXISTS "
+            else:
+                present = {c["name"] for c in inspect(conn).get_columns(table_name)}
+                if_not_exists = ""
+            for name in names:
+                if name in present:
+                    continue
+                conn.exec_driver_sql(
+                    f"ALTER TABLE {table_name} ADD COLUMN {if_not_exists}{_column_ddl(conn, table.c[name])}"
+                )
+                logger.debug(f"Ensured column {table_name}.{name}")
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
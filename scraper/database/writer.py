@@ -0,0 +1,233 @@
+"""
+Background database writer
+
+``BackgroundWriter`` takes commits off the scrape path. Scrapers ``submit``
+permit rows to a bounded queue and move on; one thread drains the queue and
+writes whatever has accumulated as a single ``upsert_permits`` batch. When
+the database is fast, each row is written almost immediately. When it falls
+behind, batches grow. Once the queue is full, ``submit`` blocks, so memory
+stays bounded and the scrape rate drops to what the database can absorb.
+
+Failed batches are retried with backoff and then handed to ``on_failure``
+(or logged and dropped). With a ``spool`` (see ``scraper.database.spool``)
+a failed batch is spooled at once instead, and while the spool holds a
+backlog new batches are spooled behind it, so scraping never waits on an
+unavailable database and rows still reach it in order.
+
+``close`` writes everything still queued; ``close_on_signal`` does the same
+on SIGTERM, within the pod's grace period.
+
+Configuration:
+    DB_WRITER_QUEUE             rows buffered before submit blocks (default 1000)
+    DB_WRITER_BATCH             rows per upsert at most (default 100)
+    DB_WRITER_SHUTDOWN_SECONDS  time allowed to flush on shutdown (default 20; the Deployment grants 30)
+"""
+
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from scraper.instrumentation import DB_WRITER_BLOCKED, DB_WRITER_ROWS, QUEUE_DEPTH, StageTimer, stage_timer
+
+logger = logging.getLogger(__name__)
+
+MAX_QUEUE = int(os.getenv("DB_WRITER_QUEUE", "1000"))
+BATCH_SIZE = int(os.getenv("DB_WRITER_BATCH", "100"))
+SHUTDOWN_TIMEOUT = float(os.getenv("DB_WRITER_SHUTDOWN_SECONDS", "20"))
+RETRIES = 3
+
+_STOP = object()
+
+
+class BackgroundWriter:
+    """
+    Single thread batching submitted rows into ``DatabaseManager.upsert_permits``
+
+    Args:
+        db_manager: Target DatabaseManager
+        max_queue: Rows buffered before ``submit`` blocks
+        batch_size: Rows per upsert at most
+        changed_by: Recorded on the change-log rows
+        retries: Further attempts for a failed batch, with exponential backoff
+        retry_delay: Seconds before the first retry
+        on_failure: Called with a batch that still failed after all retries
+        timer: Stage timer receiving the ``db_write`` spans
+        spool: Write-ahead spool taking batches the database cannot; retries default to 0 with one
+    """
+
+    def __init__(self, db_manager, max_queue: int = MAX_QUEUE, batch_size: int = BATCH_SIZE,
+                 changed_by: str = "scraper", retries: Optional[int] = None, retry_delay: float = 1.0,
+                 on_failure: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                 timer: Optional[StageTimer] = None, spool=None):
+        self.db_manager = db_manager
+        self.batch_size = max(1, batch_size)
+        self.changed_by = changed_by
+        self.spool = spool
+        self.retries = retries if retries is not None else (RETRIES if spool is None else 0)
+        self.retry_delay = retry_delay
+        self.on_failure = on_failure
+        self.timer = timer or stage_timer
+        self.written = 0
+        self.failed = 0
+        self.spooled = 0
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_queue))
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+    def start(self) -> "BackgroundWriter":
+        self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, row: Dict[str, Any]) -> None:
+        """Queue a permit row; blocks only while the queue is full"""
+        if self._closed:
+            raise RuntimeError("BackgroundWriter is closed")
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            started = time.monotonic()
+            self._queue.put(row)
+            blocked = time.monotonic() - started
+            DB_WRITER_BLOCKED.inc(blocked)
+            if blocked > 1:
+                logger.warning(f"Database writer is behind; scraping waited {blocked:.1f}s for queue space")
+        QUEUE_DEPTH.set(self._queue.qsize(), queue="db_writer")
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def flush(self) -> None:
+        """Wait until every row submitted so far has been written (or handed to ``on_failure``)"""
+        self._queue.join()
+
+    def close(self, timeout: float = SHUTDOWN_TIMEOUT) -> bool:
+        """
+        Write everything still queued and stop the thread
+
+        Returns:
+            False when rows were still unwritten after ``timeout`` seconds
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self._closed = True
+            return self._queue.empty()
+        if not self._closed:
+            self._closed = True
+            deadline = time.monotonic() + timeout
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            self._thread.join(max(0.0, deadline - time.monotonic()))
+        if self._thread.is_alive():
+            logger.error(f"Database writer did not finish within {timeout:.0f}s; {self.pending()} rows unwritten")
+            return False
+        logger.info(
+            f"Database writer stopped: {self.written} rows written, {self.spooled} spooled, {self.failed} failed"
+        )
+        return True
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            batch: List[Dict[str, Any]] = []
+            taken = 1
+            stopping = item is _STOP
+            if not stopping:
+                batch.append(item)
+            # Take whatever else is already waiting, up to one batch
+            while not stopping and len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                taken += 1
+                if item is _STOP:
+                    stopping = True
+                else:
+                    batch.append(item)
+            try:
+                if batch:
+                    self._write(batch)
+            finally:
+                for _ in range(taken):
+                    self._queue.task_done()
+                QUEUE_DEPTH.set(self._queue.qsize(), queue="db_writer")
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        if self.spool is not None and self.spool.has_backlog():
+            self._spool(batch)
+            return
+        for attempt in range(self.retries + 1):
+            try:
+                with self.timer.span("db_write"):
+                    stats = self.db_manager.upsert_permits(batch, changed_by=self.changed_by)
+            except Exception as e:
+                if attempt < self.retries:
+                    delay = self.retry_delay * 2 ** attempt
+                    logger.warning(f"Writing {len(batch)} permits failed ({e}); retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    continue
+                logger.error(f"Writing {len(batch)} permits failed after {self.retries + 1} attempts: {e}")
+                break
+            self.written += len(batch)
+            DB_WRITER_ROWS.inc(len(batch), result="written")
+            logger.debug(f"Wrote {len(batch)} permits: {stats}")
+            return
+        if self.spool is not None:
+            self._spool(batch)
+            return
+        self.failed += len(batch)
+        DB_WRITER_ROWS.inc(len(batch), result="failed")
+        if self.on_failure is None:
+            logger.error(f"Dropped permits {[row.get('permit_number') for row in batch]}")
+            return
+        try:
+            self.on_failure(batch)
+        except Exception as e:
+            logger.error(f"Database writer failure handler raised: {e}")
+
+    def _spool(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            self.spool.append_many(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            DB_WRITER_ROWS.inc(len(batch), result="failed")
+            logger.error(f"Spooling {len(batch)} permits failed, dropping them: {e}")
+            return
+        self.spooled += len(batch)
+        DB_WRITER_ROWS.inc(len(batch), result="spooled")
+
+
+def close_on_signal(writer: BackgroundWriter, signals: Sequence[int] = (signal.SIGTERM,),
+                    timeout: float = SHUTDOWN_TIMEOUT, replayer: Optional[Any] = None) -> None:
+    """
+    Flush ``writer`` when one of ``signals`` arrives, then defer to the previous handler
+
+    With a ``replayer`` (scraper.database.spool.SpoolReplayer) the spool gets a
+    last replay attempt after the flush, so a clean shutdown leaves no backlog
+    when the database is up.
+
+    Without a previous Python handler the process exits with 128 + signal
+    number, as it would have without this one. Must be called from the main thread.
+    """
+    previous: Dict[int, Any] = {}
+
+    def handler(signum, frame):
+        logger.info(f"Received signal {signum}; flushing {writer.pending()} queued permits")
+        writer.close(timeout)
+        if replayer is not None:
+            replayer.drain()
+        prior = previous.get(signum)
+        if callable(prior):
+            prior(signum, frame)
+        else:
+            raise SystemExit(128 + signum)
+
+    for signum in signals:
+        previous[signum] = signal.signal(signum, handler)
@@ -9,37 +9,52 @@ import re
 import json
 import time
 import sqlite3
-import hashlib
 from datetime import datetime
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass, field
 from pathlib import Path
 import os
+from contextlib import nullcontext
 from dotenv import load_dotenv
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException
 from loguru import logger
-import usaddress
-import boto3
-import great_expectations as ge
-import watchtower  # CloudWatch logging handler
+
+from scraper.browser import BrowserUnavailable, RecyclingBrowser
+from scraper.coercion import parse_int
+from scraper.layout import PlanCache, apply_plan, structure_hash
+from scraper.lazy import lazy_import
+from scraper.instrumentation import (
+    PERMITS_SCRAPED,
+    SCRAPE_FAILURES,
+    StageTimer,
+    classify_failure,
+    stage_timer,
+)
+from scraper.metrics_server import health, start_metrics_server
+from scraper.page_scripts import (
+    FEE_ROW_SELECTOR,
+    INSPECTION_ROW_SELECTOR,
+    LABEL_SELECTOR,
+    PAGE_EXTRACTOR_ARGS,
+    PAGE_EXTRACTOR_JS,
+    PagePayload,
+)
+
+# Heavy dependencies are imported on first use so that parsing, storage and
+# test code paths never load the browser stack or the AWS SDK
+webdriver = lazy_import("selenium.webdriver")
+By = lazy_import("selenium.webdriver.common.by", "By")
+Options = lazy_import("selenium.webdriver.chrome.options", "Options")
+WebDriverWait = lazy_import("selenium.webdriver.support.ui", "WebDriverWait")
+EC = lazy_import("selenium.webdriver.support.expected_conditions")
+usaddress = lazy_import("usaddress")
+boto3 = lazy_import("boto3")
+ge = lazy_import("great_expectations")
+watchtower = lazy_import("watchtower")  # CloudWatch logging handler
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
-logger.add("scraper_errors.log", level="ERROR", rotation="10 MB")
-logger.add(
-    "scraper_debug.log",
-    level="DEBUG",
-    rotation="50 MB"
-)
-
 # Financial validation thresholds
 JOB_VALUE_MIN = 100  # $100 minimum
 JOB_VALUE_MAX = 500_000_000  # $500M maximum
@@ -49,19 +64,108 @@ JOB_VALUE_WARNING_THRESHOLD = 50_000_000  # $50M warning threshold
 CLOUDWATCH_LOG_GROUP = os.getenv("CLOUDWATCH_LOG_GROUP", f"/aws/cc-nevada-permit-scraper/{os.getenv('ENVIRONMENT', 'prod')}")
 AWS_REGION = os.getenv("AWS_REGION", "us-west-2")
 
-try:
+_logging_initialized = False
+
+# Cookies are re-injected on this page when a browser is recycled
+CLARK_COUNTY_BASE_URL = "https://aca-prod.accela.com/CLARKCO/"
+
+# Layout extraction plans survive restarts when this points at a JSON file
+LAYOUT_PLAN_PATH = os.getenv("LAYOUT_PLAN_PATH")
+
+FINANCIAL_FIELDS = ("job_value", "total_fees", "fees_paid", "fees_due")
+INT_FIELDS = ("square_footage", "dwelling_units", "stories")
+
+
+def init_logging(cloudwatch: bool = True) -> None:
+    """
+    Register the file sinks and, optionally, the CloudWatch handler
+
+    Called explicitly by entry points rather than at import time, since
+    constructing the CloudWatch handler makes AWS calls. Safe to call twice.
+    """
+    global _logging_initialized
+    if _logging_initialized:
+        return
+    _logging_initialized = True
+
+    logger.add("scraper_errors.log", level="ERROR", rotation="10 MB")
     logger.add(
-        watchtower.CloudWatchLogHandler(
-            log_group=CLOUDWATCH_LOG_GROUP,
-            region_name=AWS_REGION,
-        ),
-        level="INFO",
-        enqueue=True,
-        serialize=True,
+        "scraper_debug.log",
+        level="DEBUG",
+        rotation="50 MB"
     )
-    logger.info(f"CloudWatch logging enabled: {CLOUDWATCH_LOG_GROUP}")
-except Exception as e:
-    logger.warning(f"CloudWatch logging not enabled: {e}")
+    if not cloudwatch:
+        return
+    try:
+        logger.add(
+            watchtower.CloudWatchLogHandler(
+                log_group=CLOUDWATCH_LOG_GROUP,
+                region_name=AWS_REGION,
+            ),
+            level="INFO",
+            enqueue=True,
+            serialize=True,
+        )
+        logger.info(f"CloudWatch logging enabled: {CLOUDWATCH_LOG_GROUP}")
+    except Exception as e:
+        logger.warning(f"CloudWatch logging not enabled: {e}")
+
+# Inspection grid header keywords -> inspection field, first match wins
+INSPECTION_HEADER_FIELDS = [
+    ('inspector', 'inspector_name'),
+    ('comment', 'comments'),
+    ('result date', 'completed_date'),
+    ('complet', 'completed_date'),
+    ('result', 'status'),
+    ('status', 'status'),
+    ('schedul', 'scheduled_date'),
+    ('request', 'scheduled_date'),
+    ('date', 'completed_date'),
+    ('type', 'inspection_type'),
+    ('inspection', 'inspection_type'),
+]
+
+
+def inspection_outcome(text: str) -> str:
+    """Classify an inspection result/status text as passed, failed, pending, cancelled or unknown"""
+    text = (text or '').lower()
+    if 'fail' in text or 'disapprov' in text or 'not approved' in text or 'correction' in text:
+        return 'failed'
+    if 'pass' in text or 'approved' in text:
+        return 'passed'
+    if 'pending' in text or 'scheduled' in text:
+        return 'pending'
+    if 'cancel' in text:
+        return 'cancelled'
+    return 'unknown'
+
+
+def parse_inspection_rows(header: List[str], rows: List[List[str]]) -> List[Dict[str, Any]]:
+    """Turn inspection grid cell texts into one dict per inspection row"""
+    columns: Dict[int, str] = {}
+    for index, title in enumerate(header):
+        title = title.strip().lower()
+        for keyword, field_name in INSPECTION_HEADER_FIELDS:
+            if keyword in title and field_name not in columns.values():
+                columns[index] = field_name
+                break
+
+    inspections = []
+    for cells in rows:
+        if not any(cell.strip() for cell in cells):
+            continue
+        inspection: Dict[str, Any] = {}
+        for index, cell in enumerate(cells):
+            field_name = columns.get(index)
+            if field_name and cell.strip():
+                inspection[field_name] = cell.strip()
+        if not columns and cells:
+            inspection['inspection_type'] = cells[0].strip()
+        # Classify once per row, from the status column if known, else the whole row
+        inspection['outcome'] = inspection_outcome(inspection.get('status') or ' '.join(cells))
+        inspections.append(inspection)
+    return inspections
+
 
 @dataclass
 class PermitDetails:
@@ -99,6 +203,7 @@ class PermitDetails:
     fees_paid: Optional[float] = None
     fees_due: Optional[float] = None
     itemized_fees: List[Dict[str, Any]] = field(default_factory=list)
+    inspections: List[Dict[str, Any]] = field(default_factory=list)
     
     # Additional details
     square_footage: Optional[int] = None
@@ -141,10 +246,25 @@ class PermitDetails:
     page_structure_hash: Optional[str] = None
 
 class EnhancedDetailScraper:
-    def __init__(self, headless: bool = False):
+    def __init__(self, headless: bool = False, timer: Optional[StageTimer] = None,
+                 db_manager=None, geocoder=None, plan_cache: Optional[PlanCache] = None,
+                 result_cache=None, writer=None):
         self.headless = headless
         self.driver = None
         self.wait = None
+        # Set by setup_driver; replaces the browser when it grows too large
+        self.browser: Optional[RecyclingBrowser] = None
+        self.timer = timer or stage_timer
+        # When set, results go to the unified schema through the CDC upsert path
+        self.db_manager = db_manager
+        # Optional scraper.database.writer.BackgroundWriter; rows are queued instead of committed inline
+        self.writer = writer
+        # Optional scraper.geocoding.AddressIndex used to fill latitude/longitude offline
+        self.geocoder = geocoder
+        # Per-layout label -> field plans keyed by the page structure hash
+        self.plan_cache = plan_cache if plan_cache is not None else PlanCache(LAYOUT_PLAN_PATH)
+        # Optional scraper.scrape_cache.ScrapeCache consulted before any browser fetch
+        self.result_cache = result_cache
         
         # Get credentials from environment
         self.username = os.getenv('CLARK_COUNTY_USERNAME')
@@ -159,7 +279,16 @@ class EnhancedDetailScraper:
         self.JOB_VALUE_WARNING_THRESHOLD = JOB_VALUE_WARNING_THRESHOLD
         
     def setup_driver(self):
-        """Setup Chrome driver with options"""
+        """Start a memory-bounded Chrome session; it is recycled transparently between permits"""
+        self.browser = RecyclingBrowser(self.create_driver, CLARK_COUNTY_BASE_URL, on_replace=self._use_driver)
+        self.browser.start()
+    
+    def _use_driver(self, driver) -> None:
+        self.driver = driver
+        self.wait = WebDriverWait(driver, 10)
+    
+    def create_driver(self):
+        """Build a Chrome driver with options"""
         options = Options()
         if self.headless:
             options.add_argument('--headless')
@@ -168,11 +297,11 @@ class EnhancedDetailScraper:
         options.add_argument('--disable-gpu')
         options.add_argument('--window-size=1920,1080')
         
-        self.driver = webdriver.Chrome(options=options)
-        self.wait = WebDriverWait(self.driver, 10)
+        driver = webdriver.Chrome(options=options)
         logger.info(
             "Chrome driver initialized"
         )
+        return driver
         
     def login_to_clark_county(self) -> bool:
         """Login to Clark County permit system"""
@@ -324,6 +453,16 @@ class EnhancedDetailScraper:
             )
             return None
     
+    def extract_int_value(self, text: str, field_name: str, details: PermitDetails) -> Optional[int]:
+        """Parse an integer field, flagging values that are present but unparseable"""
+        if not text or not text.strip():
+            return None
+        value = parse_int(text)
+        if value is None:
+            logger.warning(f"Could not parse {field_name}: {text}")
+            details.data_quality_flags.append(f'unparsed_{field_name}')
+        return value
+    
     def validate_financial_data(self, data: Dict[str, Any]) -> None:
         """Validate financial data and set flags"""
         if 'job_value' in data and data['job_value'] is not None:
@@ -404,22 +543,74 @@ class EnhancedDetailScraper:
         score = (earned_weight / total_weight) * 100
         return round(score, 2)
     
-    def get_page_structure_hash(self) -> str:
-        """Generate hash of page structure for change detection"""
+    def capture_page(self) -> PagePayload:
+        """Read labels, fee and inspection tables and related links in one execute_script round trip"""
         try:
-            # Get all data labels
-            labels = self.driver.find_elements(By.CSS_SELECTOR, "span.NotBreakWord")
-            label_texts = [label.text.strip() for label in labels if label.text.strip()]
-            
-            # Create hash of structure
-            structure_string = '|'.join(sorted(label_texts))
-            return hashlib.md5(structure_string.encode()).hexdigest()
-        except:
+            return PagePayload.from_script(self.driver.execute_script(PAGE_EXTRACTOR_JS, *PAGE_EXTRACTOR_ARGS))
+        except Exception as e:
+            logger.debug(f"Page extractor script failed, reading elements one by one: {e}")
+        header, rows = self.read_inspection_cells()
+        return PagePayload(
+            labels=self.snapshot_labels(),
+            fee_rows=self.read_fee_rows(),
+            inspection_header=header,
+            inspection_rows=rows,
+            related=self.read_related_links(),
+        )
+    
+    def snapshot_labels(self) -> List[List[Optional[str]]]:
+        """Capture every [label, value] pair element by element; value is None when no value cell exists"""
+        pairs = []
+        for label in self.driver.find_elements(By.CSS_SELECTOR, LABEL_SELECTOR):
+            try:
+                value_elem = label.find_element(By.XPATH, "..").find_element(By.XPATH, "following-sibling::td[1]")
+            except Exception:
+                try:
+                    value_elem = label.find_element(By.XPATH, "../../td[2]")
+                except Exception:
+                    value_elem = None
+            pairs.append([label.text.strip(), value_elem.text.strip() if value_elem is not None else None])
+        return pairs
+    
+    def get_page_structure_hash(self, pairs: Optional[List[List[Optional[str]]]] = None) -> str:
+        """Generate hash of page structure for change detection from a label snapshot"""
+        try:
+            if pairs is None:
+                pairs = self.snapshot_labels()
+            return structure_hash(label for label, _ in pairs)
+        except Exception:
             return "unknown"
     
-    def safe_extract(self, selector: str, by: By = By.XPATH, 
+    def assign_field(self, details: PermitDetails, field_name: str, value: str) -> None:
+        """Store a labelled value on ``details``, converting numeric and address fields"""
+        if field_name in FINANCIAL_FIELDS:
+            setattr(details, field_name, self.extract_financial_value(value))
+        elif field_name in INT_FIELDS:
+            setattr(details, field_name, self.extract_int_value(value, field_name, details))
+        elif field_name == "address":
+            details.address = value
+            with self.timer.span("address_parsing"):
+                details.parsed_address = self.parse_address_advanced(value)
+        else:
+            setattr(details, field_name, value)
+    
+    def parse_labels(self, details: PermitDetails, pairs: List[List[Optional[str]]]) -> None:
+        """Fill ``details`` from a label snapshot through the plan cached for its layout"""
+        with self.timer.span("structure_hash"):
+            details.page_structure_hash = self.get_page_structure_hash(pairs)
+        with self.timer.span("label_parsing"):
+            plan, new_layout = self.plan_cache.plan_for(
+                details.page_structure_hash, [label for label, _ in pairs if label]
+            )
+            for field_name, value in apply_plan(plan, pairs):
+                self.assign_field(details, field_name, value)
+        if new_layout and len(self.plan_cache) > 1:
+            self.emit_metric("PageLayoutChanged", 1, dimensions={"StructureHash": details.page_structure_hash})
+    
+    def safe_extract(self, selector: str, by: str = "xpath",
                      attribute: Optional[str] = None) -> Optional[str]:
-        """Safely extract text or attribute from element"""
+        """Safely extract text or attribute from element (``by`` is a selenium By value)"""
+        from selenium.common.exceptions import NoSuchElementException
         try:
             element = self.driver.find_element(by, selector)
             if attribute:
@@ -433,205 +624,145 @@ class EnhancedDetailScraper:
             )
             return None
     
+    def read_fee_rows(self) -> List[List[str]]:
+        """Cell texts of the fee table rows below the header, element by element"""
+        try:
+            fee_rows = self.driver.find_elements(By.CSS_SELECTOR, FEE_ROW_SELECTOR)
+            return [
+                [cell.text for cell in row.find_elements(By.TAG_NAME, "td")]
+                for row in fee_rows[1:]  # Skip header row
+            ]
+        except Exception as e:
+            logger.debug(f"Could not extract fee table: {e}")
+            return []
+    
     def extract_fees_table(self) -> List[Dict[str, Any]]:
         """Extract itemized fees from fee table"""
+        return self.parse_fee_rows(self.read_fee_rows())
+    
+    def parse_fee_rows(self, rows: List[List[str]]) -> List[Dict[str, Any]]:
+        """Turn fee table cell texts into one dict per fee line item"""
         fees = []
+        for cells in rows:
+            if len(cells) >= 3:
+                fee_item = {
+                    'description': cells[0].strip(),
+                    'amount': self.extract_financial_value(cells[1]),
+                    'status': cells[2].strip() or 'Unknown',
+                    'paid_date': cells[3].strip() if len(cells) > 3 and cells[3].strip() else None,
+                }
+                if fee_item['amount'] is not None:
+                    fees.append(fee_item)
+        return fees
+    
+    def read_inspection_cells(self):
+        """(header, row cell texts) of the inspection grid, element by element"""
         try:
-            # Look for fee table
-            fee_rows = self.driver.find_elements(By.CSS_SELECTOR, "table#tblFees tr, table.fee-table tr")
-            
-            for row in fee_rows[1:]:  # Skip header row
-                cells = row.find_elements(By.TAG_NAME, "td")
-                if len(cells) >= 3:
-                    fee_item = {
-                        'description': cells[0].text.strip(),
-                        'amount': self.extract_financial_value(cells[1].text),
-                        'status': cells[2].text.strip() if len(cells) > 2 else 'Unknown'
-                    }
-                    if fee_item['amount'] is not None:
-                        fees.append(fee_item)
+            rows = self.driver.find_elements(By.CSS_SELECTOR, INSPECTION_ROW_SELECTOR)
+            if not rows:
+                return [], []
+            header = [cell.text for cell in rows[0].find_elements(By.TAG_NAME, "th")]
+            if not header:
+                header = [cell.text for cell in rows[0].find_elements(By.TAG_NAME, "td")]
+            return header, [[cell.text for cell in row.find_elements(By.TAG_NAME, "td")] for row in rows[1:]]
         except Exception as e:
-            logger.debug(f"Could not extract fee table: {e}")
-        
-        return fees
+            logger.debug(f"Could not extract inspection grid: {e}")
+            return [], []
     
-    def extract_related_permits(self) -> List[str]:
-        """Extract related permit numbers"""
-        related = []
+    def extract_inspections_table(self) -> List[Dict[str, Any]]:
+        """Extract one record per inspection row from the inspection grid"""
+        header, cells = self.read_inspection_cells()
+        if not cells:
+            return []
+        return parse_inspection_rows(header, cells)
+    
+    def read_related_links(self) -> List[str]:
+        """Texts of related-permit links, element by element"""
         try:
-            # Look for related permits section
             related_links = self.driver.find_elements(
                 By.XPATH, "//a[contains(@href, 'PermitDetail') and contains(text(), '-')]"
             )
-            for link in related_links:
-                permit_text = link.text.strip()
-                if re.match(r'[A-Z]{2,3}-\d{4}-\d+', permit_text):
-                    related.append(permit_text)
+            return [link.text.strip() for link in related_links]
         except Exception as e:
             logger.debug(f"Could not extract related permits: {e}")
-        
+            return []
+    
+    def parse_related_permits(self, texts: List[str]) -> List[str]:
+        """Related permit numbers from link texts, without duplicates"""
+        related = [text.strip() for text in texts if re.match(r'[A-Z]{2,3}-\d{4}-\d+', text.strip())]
         return list(set(related))  # Remove duplicates
     
+    def extract_related_permits(self) -> List[str]:
+        """Extract related permit numbers"""
+        return self.parse_related_permits(self.read_related_links())
+    
     def extract_permit_details(self, permit_url: str) -> PermitDetails:
         """Extract comprehensive permit details from page"""
         details = PermitDetails(permit_number="Unknown")
         
         try:
             # Navigate to permit page
-            self.driver.get(permit_url)
-            time.sleep(2)
+            with self.timer.span("navigation"):
+                self.driver.get(permit_url)
+                time.sleep(2)
             
             # Check if we need to login
             if "Login.aspx" in self.driver.current_url:
                 logger.info("Session expired, logging in again...")
-                if not self.login_to_clark_county():
+                with self.timer.span("login"):
+                    logged_in = self.login_to_clark_county()
+                if not logged_in:
                     details.extraction_errors.append("Login failed")
                     return details
                 # Navigate back to permit page
-                self.driver.get(permit_url)
-                time.sleep(2)
-            
-            # Get page structure hash
-            details.page_structure_hash = self.get_page_structure_hash()
+                with self.timer.span("navigation"):
+                    self.driver.get(permit_url)
+                    time.sleep(2)
             
             # Extract permit number from URL or page
             permit_match = re.search(r'PermitNumber=([^&]+)', permit_url)
             if permit_match:
                 details.permit_number = permit_match.group(1)
             
-            # Extract all labeled data using the common pattern
-            labels = self.driver.find_elements(By.CSS_SELECTOR, "span.NotBreakWord")
-            
-            for label in labels:
-                label_text = label.text.strip().lower()
-                
-                # Find the corresponding value element
-                value_elem = None
-                try:
-                    # Try next sibling
-                    parent = label.find_element(By.XPATH, "..")
-                    value_elem = parent.find_element(By.XPATH, "following-sibling::td[1]")
-                except:
-                    # Try other patterns
-                    try:
-                        value_elem = label.find_element(By.XPATH, "../../td[2]")
-                    except:
-                        continue
-                
-                if value_elem:
-                    value = value_elem.text.strip()
-                    
-                    # Map label to field
-                    if 'permit type' in label_text:
-                        details.permit_type = value
-                    elif 'sub type' in label_text:
-                        details.permit_subtype = value
-                    elif 'status' in label_text and 'inspection' not in label_text:
-                        details.status = value
-                    elif 'description' in label_text and 'work' not in label_text:
-                        details.description = value
-                    elif 'work description' in label_text:
-                        details.work_description = value
-                    elif 'applied' in label_text:
-                        details.applied_date = value
-                    elif 'issued' in label_text:
-                        details.issued_date = value
-                    elif 'final' in label_text and 'date' in label_text:
-                        details.final_date = value
-                    elif 'expire' in label_text:
-                        details.expiration_date = value
-                    elif 'address' in label_text and 'mail' not in label_text:
-                        details.address = value
-                        details.parsed_address = self.parse_address_advanced(value)
-                    elif 'parcel' in label_text:
-                        details.parcel_number = value
-                    elif 'subdivision' in label_text:
-                        details.subdivision = value
-                    elif 'lot' in label_text and 'size' not in label_text:
-                        details.lot = value
-                    elif 'lot size' in label_text:
-                        details.lot_size = value
-                    elif 'block' in label_text:
-                        details.block = value
-                    elif 'owner' in label_text:
-                        details.owner_name = value
-                    elif 'contractor' in label_text and 'license' not in label_text:
-                        details.contractor_name = value
-                    elif 'license' in label_text:
-                        details.contractor_license = value
-                    elif 'applicant' in label_text:
-                        details.applicant_name = value
-                    elif 'job value' in label_text or 'valuation' in label_text:
-                        details.job_value = self.extract_financial_value(value)
-                    elif 'total fee' in label_text:
-                        details.total_fees = self.extract_financial_value(value)
-                    elif 'paid' in label_text and 'fee' in label_text:
-                        details.fees_paid = self.extract_financial_value(value)
-                    elif 'due' in label_text and 'fee' in label_text:
-                        details.fees_due = self.extract_financial_value(value)
-                    elif 'square' in label_text:
-                        try:
-                            details.square_footage = int(re.sub(r'[^\d]', '', value))
-                        except:
-                            pass
-                    elif 'dwelling' in label_text or 'unit' in label_text:
-                        try:
-                            details.dwelling_units = int(re.sub(r'[^\d]', '', value))
-                        except:
-                            pass
-                    elif 'stories' in label_text or 'story' in label_text:
-                        try:
-                            details.stories = int(re.sub(r'[^\d]', '', value))
-                        except:
-                            pass
-                    elif 'construction type' in label_text:
-                        details.construction_type = value
-                    elif 'zoning' in label_text:
-                        details.zoning = value
-                    elif 'use code' in label_text:
-                        details.use_code = value
-                    elif 'occupancy' in label_text:
-                        details.occupancy_type = value
-                    elif 'project' in label_text and 'name' in label_text:
-                        details.project_name = value
+            # Read the whole page once; everything below parses the captured payload
+            with self.timer.span("page_capture"):
+                page = self.capture_page()
+            self.parse_labels(details, page.labels)
             
             # Extract itemized fees
-            details.itemized_fees = self.extract_fees_table()
+            with self.timer.span("fees_table"):
+                details.itemized_fees = self.parse_fee_rows(page.fee_rows)
             
             # Extract related permits
-            details.related_permits = self.extract_related_permits()
+            with self.timer.span("related_permits"):
+                details.related_permits = self.parse_related_permits(page.related)
             
-            # Extract inspection counts
-            try:
-                inspection_rows = self.driver.find_elements(By.CSS_SELECTOR, "table#gvInspection tr, table.inspection-table tr")
-                if len(inspection_rows) > 1:
-                    details.inspections_count = len(inspection_rows) - 1
-                    
-                    # Count inspection statuses
-                    passed = failed = pending = 0
-                    for row in inspection_rows[1:]:
-                        cells = row.find_elements(By.TAG_NAME, "td")
-                        for cell in cells:
-                            cell_text = cell.text.lower()
-                            if 'pass' in cell_text:
-                                passed += 1
-                            elif 'fail' in cell_text:
-                                failed += 1
-                            elif 'pending' in cell_text or 'scheduled' in cell_text:
-                                pending += 1
-                    
-                    details.passed_inspections = passed
-                    details.failed_inspections = failed
-                    details.pending_inspections = pending
-            except Exception as e:
-                logger.debug(f"Could not extract inspection data: {e}")
-                details.extraction_errors.append(f"Inspection extraction: {str(e)}")
+            # Extract inspection rows and per-row outcome counts
+            with self.timer.span("inspections_table"):
+                try:
+                    if page.inspection_rows:
+                        details.inspections = parse_inspection_rows(page.inspection_header, page.inspection_rows)
+                    self.summarize_inspections(details)
+                except Exception as e:
+                    logger.debug(f"Could not extract inspection data: {e}")
+                    details.extraction_errors.append(f"Inspection extraction: {str(e)}")
             
+            if self.geocoder is not None and details.parsed_address:
+                with self.timer.span("geocoding"):
+                    location = self.geocoder.geocode(details.parsed_address)
+                    if location is not None:
+                        details.latitude = location.latitude
+                        details.longitude = location.longitude
+                    else:
+                        details.data_quality_flags.append('address_not_geocoded')
+
             # Validate financial data
-            self.validate_financial_data(details.__dict__)
+            with self.timer.span("validation"):
+                self.validate_financial_data(details.__dict__)
             
             # Calculate completeness score
-            details.completeness_score = self.calculate_completeness_score(details)
+            with self.timer.span("completeness"):
+                details.completeness_score = self.calculate_completeness_score(details)
             
             logger.info(f"Successfully extracted permit {details.permit_number} with {details.completeness_score}% completeness")
             
@@ -641,8 +772,28 @@ class EnhancedDetailScraper:
         
         return details
     
+    def summarize_inspections(self, details: PermitDetails) -> None:
+        """Set the inspection counters from the per-row outcomes"""
+        if not details.inspections:
+            return
+        outcomes = [inspection['outcome'] for inspection in details.inspections]
+        details.inspections_count = len(outcomes)
+        details.passed_inspections = outcomes.count('passed')
+        details.failed_inspections = outcomes.count('failed')
+        details.pending_inspections = outcomes.count('pending')
+    
     def save_to_database(self, details: PermitDetails, db_path: str = "permits.db"):
         """Save permit details to database with enhanced schema"""
+        if self.db_manager is not None:
+            from scraper.database.mapping import permit_row_from_details
+            if self.writer is not None:
+                self.writer.submit(permit_row_from_details(details))
+                logger.debug(f"Queued permit {details.permit_number} for the database writer")
+                return
+            stats = self.db_manager.upsert_permits([permit_row_from_details(details)])
+            logger.info(f"Saved permit {details.permit_number} to unified schema: {stats}")
+            return
+        
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
@@ -802,89 +953,131 @@ class EnhancedDetailScraper:
     
     def emit_metric(self, name: str, value: float, unit: str = "Count", dimensions: dict = None):
         """Emit a custom CloudWatch metric via boto3"""
-        try:
-            cw = boto3.client("cloudwatch", region_name=AWS_REGION)
-            metric_data = {
-                "MetricName": name,
-                "Value": value,
-                "Unit": unit,
-            }
-            if dimensions:
-                metric_data["Dimensions"] = [
-                    {"Name": k, "Value": str(v)} for k, v in dimensions.items()
-                ]
-            cw.put_metric_data(
-                Namespace="ClarkCounty/Scraper",
-                MetricData=[metric_data],
-            )
-            logger.debug(f"Emitted CloudWatch metric: {name}={value}")
-        except Exception as e:
-            logger.warning(f"Failed to emit CloudWatch metric {name}: {e}")
+        with self.timer.span("metric_emission"):
+            try:
+                cw = boto3.client("cloudwatch", region_name=AWS_REGION)
+                metric_data = {
+                    "MetricName": name,
+                    "Value": value,
+                    "Unit": unit,
+                }
+                if dimensions:
+                    metric_data["Dimensions"] = [
+                        {"Name": k, "Value": str(v)} for k, v in dimensions.items()
+                    ]
+                cw.put_metric_data(
+                    Namespace="ClarkCounty/Scraper",
+                    MetricData=[metric_data],
+                )
+                logger.debug(f"Emitted CloudWatch metric: {name}={value}")
+            except Exception as e:
+                logger.warning(f"Failed to emit CloudWatch metric {name}: {e}")
+    
+    def scrape_permit(self, permit_number: str, save: bool = True) -> Optional[PermitDetails]:
+        """
+        Scrape a permit and emit CloudWatch metrics for success/failure/errors
+
+        With a ``result_cache``, a fresh cached result is returned without
+        touching the browser (and is not saved again), and concurrent calls
+        for the same permit share one fetch.
+
+        Args:
+            save: Write successful results with ``save_to_database``; batch
+                workers pass False and hand results to a single writer
+        """
+        if self.result_cache is not None:
+            # Key on the permit number whether called with a number or a detail-page URL
+            match = re.search(r'PermitNumber=([^&]+)', permit_number)
+            key = match.group(1) if match else permit_number
+            return self.result_cache.get_or_fetch(key, lambda: self._scrape_permit(permit_number, save))
+        return self._scrape_permit(permit_number, save)
     
-    def scrape_permit(self, permit_number: str) -> Optional[PermitDetails]:
-        """Scrape a permit and emit CloudWatch metrics for success/failure/errors"""
+    def _scrape_permit(self, permit_number: str, save: bool) -> Optional[PermitDetails]:
         start_time = time.time()
         error_count = 0
         details = None
         try:
             logger.info(f"Scraping permit: {permit_number}")
-            details = self.extract_permit_details(permit_number)
+            # Between permits the browser may be swapped for a fresh one (same session cookies)
+            with self.browser.lease() if self.browser is not None else nullcontext():
+                details = self.extract_permit_details(permit_number)
             if details and not details.extraction_errors:
-                self.save_to_database(details)
+                if save:
+                    # With a background writer only the hand-off is timed here; it records db_write itself
+                    with self.timer.span("db_enqueue" if self.writer is not None else "db_write"):
+                        self.save_to_database(details)
+                PERMITS_SCRAPED.inc(result="success")
                 self.emit_metric("PermitScrapeSuccess", 1, dimensions={"Permit": permit_number})
             else:
                 # If login failed, ensure 'Login failed' is in extraction_errors
                 if details and not any('Login failed' in err for err in details.extraction_errors):
                     if details.permit_number == "Unknown":
                         details.extraction_errors.append("Login failed")
+                PERMITS_SCRAPED.inc(result="failure")
+                SCRAPE_FAILURES.inc(reason=classify_failure(details.extraction_errors if details else []))
                 self.emit_metric("PermitScrapeFailure", 1, dimensions={"Permit": permit_number})
                 error_count = len(details.extraction_errors) if details else 1
             return details if details else PermitDetails(permit_number=permit_number, extraction_errors=["Unknown error"])
+        except BrowserUnavailable:
+            # Not this permit's fault, and no later permit can succeed either
+            raise
         except Exception as e:
             logger.error(f"Scrape failed: {e}")
             if details is None:
                 details = PermitDetails(permit_number=permit_number, extraction_errors=[f"General extraction error: {str(e)}"])
             else:
                 details.extraction_errors.append(f"General extraction error: {str(e)}")
+            PERMITS_SCRAPED.inc(result="failure")
+            SCRAPE_FAILURES.inc(reason="exception")
             self.emit_metric("PermitScrapeFailure", 1, dimensions={"Permit": permit_number})
             error_count = 1
             return details
         finally:
             duration = time.time() - start_time
+            self.timer.observe("scrape_total", duration)
+            health.heartbeat()
             self.emit_metric("PermitScrapeDuration", duration, unit="Seconds", dimensions={"Permit": permit_number})
             if error_count:
                 self.emit_metric("PermitScrapeErrorCount", error_count, dimensions={"Permit": permit_number})
     
     def close(self):
         """Close the browser"""
-        if self.driver:
+        if self.browser is not None:
+            self.browser.close()
+            self.driver = None
+            logger.info("Browser closed")
+        elif self.driver:
             self.driver.quit()
             logger.info("Browser closed")
 
-def export_to_s3(details, bucket, prefix=""):
-    s3 = boto3.client("s3")
-    key = (
-        f"{prefix}permit_{details.permit_number}_"
-        f"{details.scraped_timestamp}.json"
-    )
-    s3.put_object(
-        Bucket=bucket,
-        Key=key,
-        Body=json.dumps(details.__dict__, default=str),
-        ContentType="application/json"
-    )
+def export_to_s3(details, bucket, prefix="", timer: Optional[StageTimer] = None):
+    timer = timer or stage_timer
+    with timer.span("s3_export"):
+        s3 = boto3.client("s3")
+        key = (
+            f"{prefix}permit_{details.permit_number}_"
+            f"{details.scraped_timestamp}.json"
+        )
+        s3.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=json.dumps(details.__dict__, default=str),
+            ContentType="application/json"
+        )
     logger.info(
         f"Exported permit {details.permit_number} to s3://{bucket}/{key}"
     )
 
 
-def validate_details_with_ge(details):
+def validate_details_with_ge(details, timer: Optional[StageTimer] = None):
+    timer = timer or stage_timer
     # Minimal example: validate job_value is not None and > 0
-    df = ge.dataset.PandasDataset([details.__dict__])
-    results = df.expect_column_values_to_not_be_null("job_value")
-    results2 = df.expect_column_values_to_be_between(
-        "job_value", 1, 1e10
-    )
+    with timer.span("ge_validation"):
+        df = ge.dataset.PandasDataset([details.__dict__])
+        results = df.expect_column_values_to_not_be_null("job_value")
+        results2 = df.expect_column_values_to_be_between(
+            "job_value", 1, 1e10
+        )
     if not (results["success"] and results2["success"]):
         logger.error(
             f"Great Expectations validation failed: {results}, {results2}"
@@ -896,9 +1089,44 @@ def validate_details_with_ge(details):
 
 def main():
     """Test the scraper with a sample permit"""
-    scraper = EnhancedDetailScraper(headless=False)
+    init_logging()
+    db_manager = None
+    writer = None
+    replayer = None
+    if os.getenv("DATABASE_URL"):
+        from scraper.api import DEFAULT_DB_CONCURRENCY, PermitQueryService, register_api_routes
+        from scraper.database.manager import DatabaseManager
+        from scraper.database.writer import BackgroundWriter, close_on_signal
+        # One pool serves the API request threads, the background writer and the spool replayer
+        threads = DEFAULT_DB_CONCURRENCY + 1 + (1 if os.getenv("DB_SPOOL_DIR") else 0)
+        db_manager = DatabaseManager(concurrency=int(os.getenv("DB_CONCURRENCY", threads)))
+        # Every upsert reads tables and columns newer than a deployed database may have
+        db_manager.create_tables()
+        # Served from this process so the writer can invalidate the read cache
+        register_api_routes(PermitQueryService(db_manager))
+        spool = None
+        if os.getenv("DB_SPOOL_DIR"):
+            # Results outlive a database outage on local disk and are replayed once it is back
+            from scraper.database.spool import Spool, SpoolReplayer
+            spool = Spool(os.environ["DB_SPOOL_DIR"])
+            replayer = SpoolReplayer(spool, db_manager).start()
+        writer = BackgroundWriter(db_manager, spool=spool).start()
+        close_on_signal(writer, replayer=replayer)
+    geocoder = None
+    if os.getenv("GEOCODER_ADDRESS_POINTS"):
+        from scraper.geocoding import AddressIndex
+        geocoder = AddressIndex.from_csv(os.environ["GEOCODER_ADDRESS_POINTS"])
+    start_metrics_server()
+    from scraper.scrape_cache import ScrapeCache
+    scraper = EnhancedDetailScraper(
+        headless=False, db_manager=db_manager, geocoder=geocoder,
+        result_cache=ScrapeCache.from_env(PermitDetails), writer=writer,
+    )
+    health.set_ready(True)
     s3_bucket = os.getenv("S3_EXPORT_BUCKET")
     s3_prefix = os.getenv("S3_EXPORT_PREFIX", "")
+    run_start = datetime.utcnow()
+    details = None
     try:
         # Test with a sample permit
         test_permit = "BP21-0423"
@@ -925,14 +1153,30 @@ def main():
                         print(f"  {key}: {value}")
 
             # Data validation with Great Expectations
-            if not validate_details_with_ge(details):
+            if not validate_details_with_ge(details, timer=scraper.timer):
                 print("Validation failed. Not exporting to S3.")
             elif s3_bucket:
-                export_to_s3(details, s3_bucket, s3_prefix)
+                export_to_s3(details, s3_bucket, s3_prefix, timer=scraper.timer)
         else:
             print("Failed to extract permit details")
     finally:
         scraper.close()
+        if writer is not None:
+            writer.close()
+        if replayer is not None:
+            replayer.drain()
+        print(f"\nStage timings:\n{scraper.timer.summary_table()}")
+        if db_manager is not None:
+            errors = len(details.extraction_errors) if details else 1
+            db_manager.record_scrape_run(
+                run_id=f"detail-{run_start:%Y%m%dT%H%M%S}",
+                scraper_type="EnhancedDetailScraper",
+                start_time=run_start,
+                timer=scraper.timer,
+                status="failed" if errors else "completed",
+                permits_processed=1,
+                errors_count=errors,
+            )
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,251 @@
+"""
+Offline geocoding of permit addresses against a local address-point dataset
+
+The dataset is a CSV of address points or parcel centroids (for example the
+county's address-point export). It is loaded once into an in-memory index
+keyed by normalized street name and house number; lookups never leave the
+process. When the exact number is missing the nearest number on the same
+street is used, which is accurate to a block or so.
+
+Usage:
+    python -m scraper.geocoding address_points.csv    # fill permits missing coordinates
+"""
+
+import argparse
+import bisect
+import csv
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# USPS abbreviations; both the dataset and scraped addresses are reduced to these
+STREET_TYPES = {
+    "STREET": "ST", "AVENUE": "AVE", "AV": "AVE", "BOULEVARD": "BLVD", "DRIVE": "DR",
+    "ROAD": "RD", "LANE": "LN", "COURT": "CT", "CIRCLE": "CIR", "PARKWAY": "PKWY",
+    "PLACE": "PL", "TERRACE": "TER", "TRAIL": "TRL", "HIGHWAY": "HWY", "WAY": "WAY",
+    "LOOP": "LOOP", "STREETS": "ST", "COVE": "CV", "POINT": "PT", "SQUARE": "SQ",
+}
+DIRECTIONS = {
+    "NORTH": "N", "SOUTH": "S", "EAST": "E", "WEST": "W",
+    "NORTHEAST": "NE", "NORTHWEST": "NW", "SOUTHEAST": "SE", "SOUTHWEST": "SW",
+}
+
+# Accepted CSV header names for each field, first match wins
+CSV_FIELDS = {
+    "number": ("address_number", "house_number", "addr_num", "number", "add_number"),
+    "street": ("street", "street_name", "full_street", "st_name", "streetname"),
+    "zip": ("zip", "zipcode", "zip_code", "postal_code"),
+    "latitude": ("latitude", "lat", "y"),
+    "longitude": ("longitude", "lon", "lng", "long", "x"),
+}
+
+# Furthest house-number gap accepted for a same-street nearest match
+MAX_NUMBER_GAP = 200
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_LEADING_NUMBER = re.compile(r"^\s*(\d+)[A-Z]?\s+(.+?)\s*(?:,|$)", re.IGNORECASE)
+
+
+def normalize_street(street: str) -> str:
+    """Uppercase, drop punctuation and abbreviate directions and street types"""
+    tokens = _NON_WORD.sub(" ", street.upper()).split()
+    return " ".join(DIRECTIONS.get(t, STREET_TYPES.get(t, t)) for t in tokens)
+
+
+def street_key_from_parsed(parsed: Dict[str, Any]) -> Tuple[Optional[int], str]:
+    """House number and normalized street from a ``parsed_address`` dict"""
+    number = str(parsed.get("street_number") or "")
+    digits = re.match(r"\d+", number)
+    street = " ".join(
+        str(parsed.get(part) or "")
+        for part in ("street_direction", "street_name", "street_type", "street_suffix")
+    )
+    return (int(digits.group(0)) if digits else None), normalize_street(street)
+
+
+def street_key_from_text(address: str) -> Tuple[Optional[int], str]:
+    """House number and normalized street from a one-line address like "123 N Main St, Las Vegas" """
+    match = _LEADING_NUMBER.match(address or "")
+    if not match:
+        return None, ""
+    return int(match.group(1)), normalize_street(match.group(2))
+
+
+@dataclass(frozen=True)
+class GeocodeResult:
+    latitude: float
+    longitude: float
+    # "exact" for a matching house number, "nearest" for the closest number on the street
+    precision: str
+
+
+class AddressIndex:
+    """
+    In-memory address-point index: normalized street -> points sorted by house number
+
+    Points are also filed under ``"<street>|<zip>"`` so that streets that
+    run through several ZIP codes (or cities) resolve to the right one.
+    """
+
+    def __init__(self):
+        self._streets: Dict[str, List[Tuple[int, float, float, str]]] = {}
+        self._numbers: Dict[str, List[int]] = {}
+
+    def add(self, number: int, street: str, latitude: float, longitude: float, zip_code: str = "") -> None:
+        street = normalize_street(street)
+        point = (number, latitude, longitude, zip_code)
+        self._streets.setdefault(street, []).append(point)
+        if zip_code:
+            self._streets.setdefault(f"{street}|{zip_code}", []).append(point)
+        self._numbers.clear()
+
+    def __len__(self) -> int:
+        return sum(len(points) for key, points in self._streets.items() if "|" not in key)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "AddressIndex":
+        """Load an address-point CSV; see CSV_FIELDS for recognized headers"""
+        index = cls()
+        skipped = 0
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            headers = {name.lower().strip(): name for name in reader.fieldnames or ()}
+            columns = {
+                field: next((headers[c] for c in candidates if c in headers), None)
+                for field, candidates in CSV_FIELDS.items()
+            }
+            missing = [f for f in ("number", "street", "latitude", "longitude") if columns[f] is None]
+            if missing:
+                raise ValueError(f"{path}: no column for {', '.join(missing)} (headers: {reader.fieldnames})")
+            for record in reader:
+                try:
+                    number = int(re.match(r"\d+", record[columns["number"]]).group(0))
+                    latitude = float(record[columns["latitude"]])
+                    longitude = float(record[columns["longitude"]])
+                except (AttributeError, TypeError, ValueError):
+                    skipped += 1
+                    continue
+                zip_code = (record.get(columns["zip"]) or "")[:5] if columns["zip"] else ""
+                index.add(number, record[columns["street"]], latitude, longitude, zip_code)
+        logger.info(f"Loaded {len(index)} address points from {path} ({skipped} unusable rows skipped)")
+        return index
+
+    def _sorted(self, street: str) -> Tuple[List[Tuple[int, float, float, str]], List[int]]:
+        points = self._streets[street]
+        numbers = self._numbers.get(street)
+        if numbers is None:
+            points.sort()
+            numbers = self._numbers[street] = [p[0] for p in points]
+        return points, numbers
+
+    def lookup(self, number: Optional[int], street: str, zip_code: str = "") -> Optional[GeocodeResult]:
+        """Match a house number on a normalized street, preferring points in ``zip_code``"""
+        if number is None:
+            return None
+        for key in ((f"{street}|{zip_code}",) if zip_code else ()) + (street,):
+            if key in self._streets:
+                result = self._match(key, number)
+                if result is not None:
+                    return result
+        return None
+
+    def _match(self, key: str, number: int) -> Optional[GeocodeResult]:
+        points, numbers = self._sorted(key)
+        lo = bisect.bisect_left(numbers, number)
+        if lo < len(numbers) and numbers[lo] == number:
+            point = points[lo]
+            return GeocodeResult(point[1], point[2], "exact")
+        neighbours = [points[i] for i in (lo - 1, lo) if 0 <= i < len(points)]
+        # Prefer the same side of the street (same parity), then the closest number
+        point = min(neighbours, key=lambda p: ((p[0] - number) % 2, abs(p[0] - number)))
+        if abs(point[0] - number) > MAX_NUMBER_GAP:
+            return None
+        return GeocodeResult(point[1], point[2], "nearest")
+
+    def geocode(self, parsed_address: Dict[str, Any]) -> Optional[GeocodeResult]:
+        """Geocode a ``PermitDetails.parsed_address`` dict"""
+        number, street = street_key_from_parsed(parsed_address)
+        return self.lookup(number, street, str(parsed_address.get("zip") or "")[:5])
+
+    def geocode_text(self, address: str) -> Optional[GeocodeResult]:
+        """Geocode a one-line address as stored in ``permits.address``"""
+        number, street = street_key_from_text(address)
+        zip_match = re.search(r"\b(\d{5})(?:-\d{4})?\s*$", address or "")
+        return self.lookup(number, street, zip_match.group(1) if zip_match else "")
+
+
+def geocode_rows(index: AddressIndex, rows: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Geocode ``{"permit_number", "address"}`` rows
+
+    Returns:
+        Upsert rows carrying latitude/longitude for the matched permits, and
+        the number of rows that did not match
+    """
+    matched, misses = [], 0
+    for row in rows:
+        result = index.geocode_text(row["address"])
+        if result is None:
+            misses += 1
+            continue
+        matched.append({
+            "permit_number": row["permit_number"],
+            "latitude": result.latitude,
+            "longitude": result.longitude,
+        })
+    return matched, misses
+
+
+def fill_missing_coordinates(db_manager, index: AddressIndex, batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Batch-geocode every permit with an address and no coordinates
+
+    Permits are read in id-keyset batches and written back through
+    ``upsert_permits``, which maintains the spatial index.
+    """
+    from sqlalchemy import select
+
+    from scraper.database.unified_schema import Permit
+
+    totals = {"geocoded": 0, "unmatched": 0}
+    last_id = 0
+    while True:
+        with db_manager.engine.connect() as conn:
+            batch = [dict(r._mapping) for r in conn.execute(
+                select(Permit.id, Permit.permit_number, Permit.address)
+                .where(Permit.id > last_id, Permit.latitude.is_(None), Permit.address.is_not(None))
+                .order_by(Permit.id).limit(batch_size)
+            )]
+        if not batch:
+            return totals
+        last_id = batch[-1]["id"]
+        rows, misses = geocode_rows(index, batch)
+        if rows:
+            db_manager.upsert_permits(rows, changed_by="geocoder")
+        totals["geocoded"] += len(rows)
+        totals["unmatched"] += misses
+        logger.info(f"Geocoded {totals['geocoded']} permits ({totals['unmatched']} unmatched)")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from scraper.database.manager import DatabaseManager
+
+    parser = argparse.ArgumentParser(description="Fill permit coordinates from a local address-point CSV")
+    parser.add_argument("address_points", help="CSV of address points or parcel centroids")
+    parser.add_argument("--database-url", help="Target database URL (default: config loader)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    db_manager = DatabaseManager(args.database_url)
+    db_manager.create_tables()
+    totals = fill_missing_coordinates(db_manager, AddressIndex.from_csv(args.address_points), args.batch_size)
+    logger.info(f"Done: {totals}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,307 @@
+"""Lightweight in-process stage timers and Prometheus-format metrics for the scrape pipeline"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type, TypeVar
+
+# Upper bounds (seconds) of the histogram buckets; the last bucket is +Inf
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed durations"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+        else:
+            self.bucket_counts[-1] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile from the bucket upper bounds"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.bucket_counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], self.bucket_counts)),
+        }
+
+
+class StageTimer:
+    """Aggregates per-stage span durations into histograms"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Histogram] = {}
+
+    @contextmanager
+    def span(self, stage: str) -> Iterator[None]:
+        """Time the enclosed block and record it under ``stage``"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._stages.get(stage)
+            if histogram is None:
+                histogram = self._stages[stage] = Histogram(self._buckets)
+            histogram.observe(seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {stage: h.snapshot() for stage, h in self._stages.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+
+    def to_json(self) -> str:
+        """Serialize the per-stage summary (without buckets) for ScrapeRun.stage_timings"""
+        summary = {}
+        for stage, snap in self.snapshot().items():
+            summary[stage] = {k: v for k, v in snap.items() if k != "buckets"}
+        return json.dumps(summary, sort_keys=True)
+
+    def summary_table(self) -> str:
+        """Render the per-stage summary as a fixed-width text table, slowest stage first"""
+        snapshot = self.snapshot()
+        header = f"{'stage':<24}{'count':>8}{'total s':>11}{'mean ms':>11}{'p95 ms':>11}{'max ms':>11}"
+        lines = [header, "-" * len(header)]
+        for stage, snap in sorted(snapshot.items(), key=lambda item: -item[1]["total"]):
+            p95 = snap["p95"] if snap["p95"] is not None else 0.0
+            max_value = snap["max"] if snap["max"] is not None else 0.0
+            lines.append(
+                f"{stage:<24}{snap['count']:>8}{snap['total']:>11.3f}"
+                f"{snap['mean'] * 1000:>11.1f}{p95 * 1000:>11.1f}{max_value * 1000:>11.1f}"
+            )
+        return "\n".join(lines)
+
+
+# Process-wide default timer shared by the scraper and the module-level helpers
+stage_timer = StageTimer()
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{key}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            values = list(self._values.items())
+        return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in values]
+
+
+class Gauge(Counter):
+    """Point-in-time value with optional labels"""
+
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+_M = TypeVar("_M", bound=Counter)
+
+
+class MetricsRegistry:
+    """Collection of counters, gauges and histogram families rendered in Prometheus text format"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Counter] = {}
+        self._timers: Dict[str, Tuple[str, str, StageTimer]] = {}
+
+    def _get_or_create(self, cls: Type[_M], name: str, documentation: str, labelnames: Tuple[str, ...]) -> _M:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames)
+            if not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.metric_type}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def register_timer(self, name: str, documentation: str, timer: StageTimer, label: str = "stage") -> StageTimer:
+        """Expose every histogram of ``timer`` as one labelled Prometheus histogram family"""
+        with self._lock:
+            self._timers[name] = (documentation, label, timer)
+        return timer
+
+    def histogram(self, name: str, documentation: str, buckets: Tuple[float, ...], label: str = "kind") -> StageTimer:
+        return self.register_timer(name, documentation, StageTimer(buckets), label)
+
+    def render(self) -> str:
+        """Render all metrics; only short per-metric locks are taken, never a global one"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            timers = list(self._timers.items())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        for name, (documentation, label, timer) in timers:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, snap in sorted(timer.snapshot().items()):
+                cumulative = 0
+                for bound, bucket_count in snap["buckets"].items():
+                    cumulative += bucket_count
+                    labels = {label: key, "le": bound}
+                    lines.append(f"{name}_bucket{_format_labels(labels)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels({label: key})} {_format_value(snap['total'])}")
+                lines.append(f"{name}_count{_format_labels({label: key})} {snap['count']}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry served on /metrics by scraper.metrics_server
+registry = MetricsRegistry()
+registry.register_timer(
+    "scraper_stage_duration_seconds", "Duration of each scrape pipeline stage", stage_timer
+)
+PERMITS_SCRAPED = registry.counter(
+    "scraper_permits_scraped_total", "Permits scraped, by outcome", ("result",)
+)
+SCRAPE_FAILURES = registry.counter(
+    "scraper_permit_failures_total", "Permit scrape failures, by failure class", ("reason",)
+)
+QUEUE_DEPTH = registry.gauge(
+    "scraper_queue_depth", "Items waiting in a pipeline queue", ("queue",)
+)
+BROWSERS = registry.gauge(
+    "scraper_browsers", "Browser instances in the driver pool, by state", ("state",)
+)
+BROWSER_RECYCLES = registry.counter(
+    "scraper_browser_recycles_total", "Browsers replaced after crossing a threshold, by reason", ("reason",)
+)
+DB_BATCH_SIZES = registry.histogram(
+    "scraper_db_batch_size", "Rows per database batch write",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000), label="table",
+)
+CACHE_REQUESTS = registry.counter(
+    "scraper_cache_requests_total", "Cache lookups, by cache and result", ("cache", "result")
+)
+LAYOUT_PLANS = registry.counter(
+    "scraper_layout_plan_lookups_total", "Page extraction plan lookups, by result (hit/new)", ("result",)
+)
+DB_CONNECTIONS = registry.gauge(
+    "scraper_db_connections", "Database connections held by this process, by state (open/in_use)", ("state",)
+)
+DB_CHECKOUT_WAIT = registry.histogram(
+    "scraper_db_checkout_seconds", "Time to obtain a connection from the pool (waiting plus connecting), by pool profile",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30), label="pool",
+)
+DB_WRITER_ROWS = registry.counter(
+    "scraper_db_writer_rows_total", "Rows handled by the background database writer, by result", ("result",)
+)
+DB_WRITER_BLOCKED = registry.counter(
+    "scraper_db_writer_blocked_seconds_total", "Time producers spent blocked on a full database writer queue"
+)
+SPOOL_RECORDS = registry.counter(
+    "scraper_spool_records_total", "Rows through the local write-ahead spool, by event (appended/replayed/skipped)",
+    ("event",),
+)
+API_LATENCY = registry.histogram(
+    "scraper_api_request_seconds", "Read API request latency, by route",
+    buckets=DEFAULT_BUCKETS, label="route",
+)
+
+
+def classify_failure(errors: List[str]) -> str:
+    """Map extraction error messages to a coarse failure class for metric labels"""
+    if not errors:
+        return "unknown"
+    first = errors[0].lower()
+    if "login" in first:
+        return "login"
+    if "inspection" in first:
+        return "inspection_extraction"
+    if "general extraction error" in first:
+        return "extraction"
+    return "other"
@@ -0,0 +1,211 @@
+"""
+Per-layout extraction plans for permit detail pages
+
+A detail page is captured once as a snapshot of (label, value) pairs. The
+structure hash of the snapshot's labels keys a cache of extraction plans
+(label -> PermitDetails field). A known layout maps each label with one dict
+lookup; an unseen hash runs the generic keyword matcher once, raises a
+layout-drift alert and stores the new plan for reuse. Plans can be persisted
+to a JSON file so they survive restarts and are shared between workers. The
+file records a hash of FIELD_RULES; plans saved under other rules are
+discarded on load, so a rules fix takes effect on the next start.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from scraper.instrumentation import LAYOUT_PLANS
+
+# Generic matcher: (substrings that must all appear, substrings that must not, field),
+# tried in order against the lowercased label; the first matching rule wins
+FIELD_RULES: Tuple[Tuple[Tuple[str, ...], Tuple[str, ...], str], ...] = (
+    (("permit type",), (), "permit_type"),
+    (("sub type",), (), "permit_subtype"),
+    (("status",), ("inspection",), "status"),
+    (("description",), ("work",), "description"),
+    (("work description",), (), "work_description"),
+    (("applied",), (), "applied_date"),
+    (("issued",), (), "issued_date"),
+    (("final", "date"), (), "final_date"),
+    (("expire",), (), "expiration_date"),
+    (("address",), ("mail",), "address"),
+    (("parcel",), (), "parcel_number"),
+    (("subdivision",), (), "subdivision"),
+    (("lot",), ("size",), "lot"),
+    (("lot size",), (), "lot_size"),
+    (("block",), (), "block"),
+    (("owner",), (), "owner_name"),
+    (("contractor",), ("license",), "contractor_name"),
+    (("license",), (), "contractor_license"),
+    (("applicant",), (), "applicant_name"),
+    (("job value",), (), "job_value"),
+    (("valuation",), (), "job_value"),
+    (("total fee",), (), "total_fees"),
+    (("paid", "fee"), (), "fees_paid"),
+    (("due", "fee"), (), "fees_due"),
+    (("square",), (), "square_footage"),
+    (("dwelling",), (), "dwelling_units"),
+    (("unit",), (), "dwelling_units"),
+    (("stories",), (), "stories"),
+    (("story",), (), "stories"),
+    (("construction type",), (), "construction_type"),
+    (("zoning",), (), "zoning"),
+    (("use code",), (), "use_code"),
+    (("occupancy",), (), "occupancy_type"),
+    (("project", "name"), (), "project_name"),
+)
+
+
+# Identifies the rules a persisted plan was compiled with
+RULES_HASH = hashlib.sha256(json.dumps(FIELD_RULES).encode()).hexdigest()[:16]
+
+
+def match_label(label: str) -> Optional[str]:
+    """Generic (slow path) mapping of a label to a PermitDetails field"""
+    text = label.strip().lower()
+    for required, excluded, field_name in FIELD_RULES:
+        if all(r in text for r in required) and not any(e in text for e in excluded):
+            return field_name
+    return None
+
+
+def structure_hash(labels: Iterable[str]) -> str:
+    """MD5 of the sorted non-empty label texts; identical layouts hash identically"""
+    texts = sorted(label.strip() for label in labels if label and label.strip())
+    return hashlib.md5("|".join(texts).encode()).hexdigest()
+
+
+@dataclass
+class ExtractionPlan:
+    """Label -> field mapping for one page layout; None marks a known unmapped label"""
+    structure_hash: str
+    fields: Dict[str, Optional[str]]
+    created: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+
+    @classmethod
+    def compile(cls, structure_hash: str, labels: Sequence[str]) -> "ExtractionPlan":
+        return cls(structure_hash, {label.strip().lower(): match_label(label) for label in labels})
+
+    @property
+    def mapped_fields(self) -> set:
+        return {f for f in self.fields.values() if f}
+
+    def field_for(self, label: str) -> Optional[str]:
+        key = label.strip().lower()
+        if key in self.fields:
+            return self.fields[key]
+        # A label outside the plan cannot happen for a matching hash, but stay correct if it does
+        return match_label(label)
+
+
+class PlanCache:
+    """
+    Extraction plans keyed by structure hash, optionally persisted to JSON
+
+    Args:
+        path: JSON file to load plans from and save new plans to; None keeps
+            plans in memory only
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._plans: Dict[str, ExtractionPlan] = {}
+        self._lock = threading.Lock()
+        if path:
+            self._plans.update(self._load())
+            logger.info(f"Loaded {len(self._plans)} page layout plans from {path}")
+
+    def _load(self) -> Dict[str, ExtractionPlan]:
+        """Plans in the file compiled under the current FIELD_RULES; others are dropped"""
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable layout plan file {self.path}: {e}")
+            return {}
+        if not isinstance(saved, dict) or saved.get("rules") != RULES_HASH:
+            logger.info(f"Discarding layout plans in {self.path}: compiled under different field rules")
+            return {}
+        return {
+            key: ExtractionPlan(key, data["fields"], data.get("created", ""))
+            for key, data in saved.get("plans", {}).items()
+        }
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._plans
+
+    def plan_for(self, key: str, labels: Sequence[str]) -> Tuple[ExtractionPlan, bool]:
+        """
+        Return the plan for a layout, compiling and storing it if unseen
+
+        Returns:
+            The plan and whether it was newly compiled (a layout never seen before)
+        """
+        plan = self._plans.get(key)
+        if plan is not None:
+            LAYOUT_PLANS.inc(result="hit")
+            return plan, False
+        with self._lock:
+            plan = self._plans.get(key)
+            if plan is not None:
+                LAYOUT_PLANS.inc(result="hit")
+                return plan, False
+            known_fields = set().union(*(p.mapped_fields for p in self._plans.values()))
+            first = not self._plans
+            plan = ExtractionPlan.compile(key, labels)
+            self._plans[key] = plan
+            self._save()
+        LAYOUT_PLANS.inc(result="new")
+        if not first:
+            missing = sorted(known_fields - plan.mapped_fields)
+            logger.warning(
+                f"New page layout {key}: {len(plan.mapped_fields)} fields mapped"
+                + (f", missing fields seen in known layouts: {missing}" if missing else "")
+            )
+        else:
+            logger.info(f"Compiled extraction plan for page layout {key}")
+        return plan, True
+
+    def _save(self) -> None:
+        """Merge with plans other workers saved meanwhile, then atomically replace the file"""
+        if not self.path:
+            return
+        for key, plan in self._load().items():
+            self._plans.setdefault(key, plan)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(prefix=".layout-plans-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({
+                    "rules": RULES_HASH,
+                    "plans": {k: {"fields": p.fields, "created": p.created} for k, p in self._plans.items()},
+                }, f, indent=2)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def apply_plan(plan: ExtractionPlan, pairs: Iterable[Tuple[str, Optional[str]]]) -> List[Tuple[str, str]]:
+    """(field, value) assignments for a snapshot, in page order; unmapped labels and missing values skipped"""
+    assignments = []
+    for label, value in pairs:
+        if value is None:
+            continue
+        field_name = plan.field_for(label)
+        if field_name:
+            assignments.append((field_name, value.strip()))
+    return assignments
@@ -0,0 +1,48 @@
+"""Deferred imports for heavy optional dependencies (selenium, boto3, great_expectations, ...)"""
+
+import importlib
+from typing import Any, Optional
+
+
+class LazyImport:
+    """
+    Stand-in for a module (or a module attribute) that is imported on first use
+
+    Attribute access and calls are forwarded to the real object, so
+    ``boto3 = LazyImport("boto3")`` followed by ``boto3.client("s3")`` behaves
+    like the eager import but only pays the import cost when a client is built.
+    Attributes set on the proxy (e.g. by ``unittest.mock.patch``) shadow the
+    real object's attributes until they are deleted again.
+    """
+
+    def __init__(self, module_name: str, attribute: Optional[str] = None):
+        self.__dict__["_module_name"] = module_name
+        self.__dict__["_attribute"] = attribute
+        self.__dict__["_target"] = None
+
+    def _resolve(self) -> Any:
+        target = self.__dict__["_target"]
+        if target is None:
+            target = importlib.import_module(self.__dict__["_module_name"])
+            if self.__dict__["_attribute"]:
+                target = getattr(target, self.__dict__["_attribute"])
+            self.__dict__["_target"] = target
+        return target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        name = self.__dict__["_module_name"]
+        if self.__dict__["_attribute"]:
+            name = f"{name}.{self.__dict__['_attribute']}"
+        state = "loaded" if self.__dict__["_target"] is not None else "not loaded"
+        return f"<LazyImport {name} ({state})>"
+
+
+def lazy_import(module_name: str, attribute: Optional[str] = None) -> LazyImport:
+    """Return a proxy that imports ``module_name`` (and optionally ``attribute``) on first use"""
+    return LazyImport(module_name, attribute)
@@ -0,0 +1,126 @@
+"""Embedded HTTP endpoint serving Prometheus metrics, liveness and readiness"""
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+from urllib.parse import parse_qs, urlparse
+
+from loguru import logger
+
+from scraper.instrumentation import registry
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", "8000"))
+# Liveness fails if a worker registered heartbeats and then went quiet for this long
+LIVENESS_TIMEOUT = float(os.getenv("LIVENESS_TIMEOUT_SECONDS", "600"))
+
+Body = Union[bytes, Iterable[bytes]]
+Response = Tuple[int, str, Body]
+RouteHandler = Callable[[Dict[str, list]], Response]
+
+
+class HealthState:
+    """Liveness/readiness flags shared between workers and the HTTP thread"""
+
+    def __init__(self):
+        self._ready = False
+        self._last_heartbeat: Optional[float] = None
+        self._reason = "starting"
+
+    def set_ready(self, ready: bool, reason: str = "") -> None:
+        self._ready = ready
+        self._reason = reason or ("ready" if ready else "not ready")
+
+    def heartbeat(self) -> None:
+        self._last_heartbeat = time.monotonic()
+
+    def is_live(self) -> bool:
+        if self._last_heartbeat is None:
+            return True
+        return time.monotonic() - self._last_heartbeat < LIVENESS_TIMEOUT
+
+    def is_ready(self) -> bool:
+        return self._ready and self.is_live()
+
+    @property
+    def reason(self) -> str:
+        return self._reason
+
+
+health = HealthState()
+
+_routes: Dict[str, RouteHandler] = {}
+
+
+def register_route(path: str, handler: RouteHandler) -> None:
+    """Serve ``handler(query_params)`` on ``path``; the body may be bytes or an iterable of chunks"""
+    _routes[path] = handler
+
+
+def _metrics_route(query: Dict[str, list]) -> Response:
+    return 200, "text/plain; version=0.0.4; charset=utf-8", registry.render().encode()
+
+
+def _liveness_route(query: Dict[str, list]) -> Response:
+    if health.is_live():
+        return 200, "text/plain", b"ok\n"
+    return 503, "text/plain", b"stalled\n"
+
+
+def _readiness_route(query: Dict[str, list]) -> Response:
+    if health.is_ready():
+        return 200, "text/plain", b"ready\n"
+    return 503, "text/plain", f"{health.reason}\n".encode()
+
+
+register_route("/metrics", _metrics_route)
+register_route("/healthz", _liveness_route)
+register_route("/readyz", _readiness_route)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        handler = _routes.get(parsed.path)
+        if handler is None:
+            status, content_type, body = 404, "text/plain", b"not found\n"
+        else:
+            try:
+                status, content_type, body = handler(parse_qs(parsed.query))
+            except Exception as e:
+                logger.error(f"Error serving {parsed.path}: {e}")
+                status, content_type, body = 500, "text/plain", b"internal error\n"
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if isinstance(body, bytes):
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        # Streamed body: no Content-Length, the connection closes when the iterator is exhausted
+        self.end_headers()
+        for chunk in body:
+            self.wfile.write(chunk)
+
+    def log_message(self, format, *args):
+        logger.debug(f"metrics_server: {format % args}")
+
+
+def start_metrics_server(port: Optional[int] = None, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """
+    Start the endpoint on a daemon thread so scrapes of /metrics never block workers
+
+    Args:
+        port: Port to bind; defaults to METRICS_PORT. 0 disables the server.
+        host: Interface to bind
+    """
+    port = METRICS_PORT if port is None else port
+    if port == 0:
+        return None
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    logger.info(f"Metrics endpoint listening on {host}:{server.server_address[1]}")
+    return server
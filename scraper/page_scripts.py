@@ -0,0 +1,154 @@
+"""
+Scripts injected into permit detail pages, and the Python side of their results
+
+Every WebDriver call is a round trip to chromedriver. ``PAGE_EXTRACTOR_JS``
+reads everything the detail scrapers use in one ``execute_script`` call and
+returns a single JSON object, which ``PagePayload.from_script`` turns into
+plain Python lists. The element-by-element readers in the scrapers remain
+only as fallbacks for when the script fails.
+
+``EXPAND_SECTIONS_JS`` opens every collapsible section in one
+``execute_async_script`` call and returns once the page has stopped changing.
+"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Selectors shared with the element-by-element fallbacks
+LABEL_SELECTOR = "span.NotBreakWord"
+FEE_ROW_SELECTOR = "table#tblFees tr, table.fee-table tr"
+INSPECTION_ROW_SELECTOR = "table#gvInspection tr, table.inspection-table tr"
+RELATED_LINK_SELECTOR = "a[href*='PermitDetail']"
+
+# Returns {labels, fee_rows, inspection_header, inspection_rows, related, table_pairs}.
+# A label's value cell is the first <td> after the label's cell, else the second <td> of its row.
+PAGE_EXTRACTOR_JS = """
+var text = function (el) { return (el.innerText || el.textContent || '').trim(); };
+var cellsOf = function (row, tag) {
+    return Array.from(row.children).filter(function (c) { return c.tagName === tag; }).map(text);
+};
+var labels = Array.from(document.querySelectorAll(arguments[0])).map(function (label) {
+    var value = null;
+    var cell = label.parentElement;
+    for (var sib = cell && cell.nextElementSibling; sib; sib = sib.nextElementSibling) {
+        if (sib.tagName === 'TD') { value = sib; break; }
+    }
+    if (!value && cell && cell.parentElement) {
+        var tds = Array.from(cell.parentElement.children).filter(function (c) { return c.tagName === 'TD'; });
+        value = tds.length > 1 ? tds[1] : null;
+    }
+    return [text(label), value ? text(value) : null];
+});
+var feeRows = Array.from(document.querySelectorAll(arguments[1])).slice(1).map(function (row) {
+    return cellsOf(row, 'TD');
+});
+var inspectionRows = Array.from(document.querySelectorAll(arguments[2]));
+var inspectionHeader = [];
+if (inspectionRows.length) {
+    inspectionHeader = cellsOf(inspectionRows[0], 'TH');
+    if (!inspectionHeader.length) { inspectionHeader = cellsOf(inspectionRows[0], 'TD'); }
+}
+var related = Array.from(document.querySelectorAll(arguments[3])).map(text).filter(function (t) {
+    return t.indexOf('-') !== -1;
+});
+var tablePairs = [];
+Array.from(document.querySelectorAll('table tr')).forEach(function (row) {
+    var cells = cellsOf(row, 'TD');
+    if (cells.length === 2) { tablePairs.push(cells); }
+});
+return {
+    labels: labels,
+    fee_rows: feeRows,
+    inspection_header: inspectionHeader,
+    inspection_rows: inspectionRows.slice(1).map(function (row) { return cellsOf(row, 'TD'); }),
+    related: related,
+    table_pairs: tablePairs
+};
+"""
+
+PAGE_EXTRACTOR_ARGS = (LABEL_SELECTOR, FEE_ROW_SELECTOR, INSPECTION_ROW_SELECTOR, RELATED_LINK_SELECTOR)
+
+
+@dataclass
+class PagePayload:
+    """Everything read from one detail page"""
+    labels: List[List[Optional[str]]] = field(default_factory=list)
+    fee_rows: List[List[str]] = field(default_factory=list)
+    inspection_header: List[str] = field(default_factory=list)
+    inspection_rows: List[List[str]] = field(default_factory=list)
+    related: List[str] = field(default_factory=list)
+    # Every two-cell table row as [label, value], for the generic table scan
+    table_pairs: List[List[str]] = field(default_factory=list)
+
+    @classmethod
+    def from_script(cls, result: Any) -> "PagePayload":
+        """Validate the extractor's return value; raises ValueError when it is not a payload"""
+        if not isinstance(result, dict) or not isinstance(result.get("labels"), list):
+            raise ValueError(f"Unexpected page extractor result: {type(result).__name__}")
+        return cls(**{name: list(result.get(name) or []) for name in cls.__dataclass_fields__})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__dataclass_fields__}
+
+
+# Link/button texts that open collapsible sections on detail pages
+EXPAND_PATTERNS = (
+    "More Details",
+    "Show More",
+    "View Details",
+    "Additional Information",
+    "Show All",
+    "Fee Details",
+    "View More",
+)
+# The DOM counts as settled after this long without mutations
+EXPAND_QUIET_MS = 300
+# Give up waiting for the DOM to settle after this long (below WebDriver's 30s script timeout)
+EXPAND_TIMEOUT_MS = 5000
+
+# Arguments: patterns, quiet ms, timeout ms, WebDriver callback.
+# Clicks every visible, enabled <a>/<button>/<span onclick> whose own text contains a
+# pattern and calls back {opened: {pattern: clicks}, settled, elapsed_ms} once a
+# MutationObserver has seen no changes for the quiet period.
+EXPAND_SECTIONS_JS = """
+var patterns = arguments[0], quietMs = arguments[1], timeoutMs = arguments[2];
+var done = arguments[arguments.length - 1];
+var started = Date.now();
+var opened = {};
+var quietTimer = null, hardTimer = null, finished = false;
+var finish = function (settled) {
+    if (finished) { return; }
+    finished = true;
+    observer.disconnect();
+    clearTimeout(quietTimer);
+    clearTimeout(hardTimer);
+    done({opened: opened, settled: settled, elapsed_ms: Date.now() - started});
+};
+var armQuiet = function () {
+    clearTimeout(quietTimer);
+    quietTimer = setTimeout(function () { finish(true); }, quietMs);
+};
+// Observe before clicking so synchronous changes made by click handlers count too
+var observer = new MutationObserver(armQuiet);
+observer.observe(document.body, {childList: true, subtree: true, attributes: true, characterData: true});
+
+var ownText = function (el) {
+    return Array.from(el.childNodes).filter(function (n) { return n.nodeType === 3; })
+        .map(function (n) { return n.nodeValue; }).join('');
+};
+var visible = function (el) { return !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length); };
+var candidates = Array.from(document.querySelectorAll('a, button, span[onclick]'));
+var clicked = [];
+patterns.forEach(function (pattern) {
+    opened[pattern] = 0;
+    candidates.forEach(function (el) {
+        if (clicked.indexOf(el) !== -1 || ownText(el).indexOf(pattern) === -1) { return; }
+        if (!visible(el) || el.disabled) { return; }
+        clicked.push(el);
+        try { el.click(); opened[pattern] += 1; } catch (e) { /* detached or blocked; skip it */ }
+    });
+});
+if (!clicked.length) { finish(true); return; }
+hardTimer = setTimeout(function () { finish(false); }, timeoutMs);
+armQuiet();
+"""
@@ -0,0 +1,292 @@
+"""
+Read-through cache of scrape results, keyed by permit number
+
+Sits in front of ``EnhancedDetailScraper.scrape_permit``. A lookup checks an
+in-process LRU first, then an optional shared backend (SQLite file or a
+Redis-compatible server), and only then fetches through the browser.
+Concurrent requests for the same permit share one in-flight fetch. How long
+a result lives depends on the permit's status: finaled permits hardly change,
+while permits under review do. Failed scrapes are never cached.
+
+Configuration:
+    SCRAPE_CACHE_URL    unset: in-process only; "off": disabled;
+                        "sqlite:///path/cache.db" or "redis://host:6379/0": shared
+    SCRAPE_CACHE_TTLS   per-status TTLs in seconds, e.g. "issued=3600,finaled=86400,default=900"
+"""
+
+import dataclasses
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from loguru import logger
+
+from scraper.instrumentation import CACHE_REQUESTS
+from scraper.lazy import lazy_import
+
+redis = lazy_import("redis")
+
+DEFAULT_TTLS = {
+    "finaled": 86400.0,
+    "final": 86400.0,
+    "closed": 86400.0,
+    "expired": 86400.0,
+    "withdrawn": 86400.0,
+    "issued": 3600.0,
+    "default": 900.0,
+}
+MAX_ENTRIES = int(os.getenv("SCRAPE_CACHE_MAX_ENTRIES", "10000"))
+
+
+def parse_ttls(spec: str) -> Dict[str, float]:
+    """``"issued=3600,default=900"`` -> {"issued": 3600.0, "default": 900.0} (statuses lowercased)"""
+    ttls = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        status, _, seconds = item.partition("=")
+        try:
+            ttls[status.strip().lower()] = float(seconds)
+        except ValueError:
+            raise ValueError(f"Bad SCRAPE_CACHE_TTLS entry {item!r}, expected status=seconds") from None
+    return ttls
+
+
+class SQLiteBackend:
+    """Shared cache in a SQLite file; safe across processes on one host"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS scrape_cache (key TEXT PRIMARY KEY, expires REAL NOT NULL, value TEXT NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        row = self._conn().execute("SELECT expires, value FROM scrape_cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return row[0], row[1]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO scrape_cache (key, expires, value) VALUES (?, ?, ?)",
+                (key, time.time() + ttl, value),
+            )
+            # Keep the file from growing without bound
+            conn.execute("DELETE FROM scrape_cache WHERE expires < ?", (time.time(),))
+
+    def delete(self, key: str) -> None:
+        with self._conn() as conn:
+            conn.execute("DELETE FROM scrape_cache WHERE key = ?", (key,))
+
+
+class RedisBackend:
+    """Shared cache on a Redis-compatible server; entries expire server-side"""
+
+    def __init__(self, url: str, prefix: str = "scrape:"):
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        return entry["expires"], entry["value"]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        entry = json.dumps({"expires": time.time() + ttl, "value": value})
+        self.client.set(self.prefix + key, entry, ex=max(1, int(ttl)))
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+
+def backend_from_url(url: str):
+    if url.startswith("sqlite:///"):
+        return SQLiteBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unsupported SCRAPE_CACHE_URL {url!r}")
+
+
+def schema_tag(factory: Callable[..., Any]) -> str:
+    """
+    Short tag for the shape of ``factory``'s results, part of every shared cache key
+
+    Derived from the dataclass field names, so adding or renaming a field makes
+    entries written by older code unreachable instead of unreadable.
+    """
+    names = [f.name for f in dataclasses.fields(factory)] if dataclasses.is_dataclass(factory) else []
+    return hashlib.sha1(",".join(names).encode()).hexdigest()[:8]
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ScrapeCache:
+    """
+    TTL cache of scrape results with request coalescing
+
+    Args:
+        factory: Rebuilds a result from its ``dataclasses.asdict`` form (e.g. PermitDetails)
+        ttls: Seconds to keep a result, by lowercased status; "default" for any other status
+        backend: Optional shared tier with ``get``/``set``/``delete``
+        is_cacheable: Results failing this check (e.g. with extraction errors) are not stored
+    """
+
+    def __init__(self, factory: Callable[..., Any], ttls: Optional[Dict[str, float]] = None, backend=None,
+                 max_entries: int = MAX_ENTRIES,
+                 is_cacheable: Callable[[Any], bool] = lambda result: not getattr(result, "extraction_errors", None)):
+        self.factory = factory
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.backend = backend
+        self.max_entries = max_entries
+        self.is_cacheable = is_cacheable
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._schema = schema_tag(factory)
+
+    @classmethod
+    def from_env(cls, factory: Callable[..., Any]) -> Optional["ScrapeCache"]:
+        """Cache configured by SCRAPE_CACHE_URL / SCRAPE_CACHE_TTLS, or None when disabled"""
+        url = os.getenv("SCRAPE_CACHE_URL", "")
+        if url.lower() == "off":
+            return None
+        backend = backend_from_url(url) if url else None
+        return cls(factory, parse_ttls(os.getenv("SCRAPE_CACHE_TTLS", "")), backend)
+
+    def ttl_for(self, result: Any) -> float:
+        status = (getattr(result, "status", None) or "").strip().lower()
+        return self.ttls.get(status, self.ttls["default"])
+
+    def _copy(self, result: Any) -> Any:
+        # Callers may mutate what they get back; never hand out the cached object
+        return self.factory(**json.loads(json.dumps(dataclasses.asdict(result))))
+
+    def _get_local(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, result = entry
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def _set_local(self, key: str, result: Any, expires: float) -> None:
+        with self._lock:
+            self._entries[key] = (expires, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _shared_key(self, key: str) -> str:
+        return f"{self._schema}:{key}"
+
+    def _get_shared(self, key: str) -> Optional[Any]:
+        if self.backend is None:
+            return None
+        shared_key = self._shared_key(key)
+        try:
+            entry = self.backend.get(shared_key)
+        except Exception as e:
+            logger.warning(f"Shared scrape cache read failed: {e}")
+            return None
+        if entry is None:
+            return None
+        expires, value = entry
+        try:
+            result = self.factory(**json.loads(value))
+        except Exception as e:
+            # A corrupt entry is a miss; drop it so the next fetch replaces it
+            logger.warning(f"Discarding unreadable shared scrape cache entry {key}: {e}")
+            self._delete_shared(shared_key)
+            return None
+        self._set_local(key, result, expires)
+        return result
+
+    def _delete_shared(self, shared_key: str) -> None:
+        if self.backend is None:
+            return
+        try:
+            self.backend.delete(shared_key)
+        except Exception as e:
+            logger.warning(f"Shared scrape cache delete failed: {e}")
+
+    def _store(self, key: str, result: Any) -> None:
+        ttl = self.ttl_for(result)
+        if ttl <= 0:
+            return
+        self._set_local(key, self._copy(result), time.time() + ttl)
+        if self.backend is not None:
+            try:
+                self.backend.set(self._shared_key(key), json.dumps(dataclasses.asdict(result)), ttl)
+            except Exception as e:
+                logger.warning(f"Shared scrape cache write failed: {e}")
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any]) -> Any:
+        """Cached result for ``key``, or the result of ``fetch()`` shared with concurrent callers"""
+        result = self._get_local(key)
+        if result is not None:
+            CACHE_REQUESTS.inc(cache="scrape", result="hit")
+            return self._copy(result)
+        result = self._get_shared(key)
+        if result is not None:
+            CACHE_REQUESTS.inc(cache="scrape", result="shared_hit")
+            return self._copy(result)
+
+        with self._lock:
+            leading = self._flights.get(key)
+            if leading is None:
+                flight = self._flights[key] = _Flight()
+        if leading is not None:
+            CACHE_REQUESTS.inc(cache="scrape", result="coalesced")
+            leading.done.wait()
+            if leading.error is not None:
+                raise leading.error
+            return self._copy(leading.result) if leading.result is not None else None
+
+        CACHE_REQUESTS.inc(cache="scrape", result="miss")
+        try:
+            result = fetch()
+            flight.result = result
+            if result is not None and self.is_cacheable(result):
+                self._store(key, result)
+            return result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+        self._delete_shared(self._shared_key(key))
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,196 @@
+"""
+Cached access to AWS Secrets Manager
+
+Every process used to call Secrets Manager on startup, so a batch run with
+N workers made N round trips before any work started. ``SecretProvider``
+keeps each secret in memory and in a file shared by the processes on one
+host, both valid for ``SECRETS_CACHE_TTL`` seconds. A cached value can go
+stale when a secret is rotated. Callers that see credentials rejected ask
+for ``refresh=True``, which bypasses both tiers and rewrites them.
+
+Configuration:
+    SECRETS_CACHE_TTL   seconds a fetched secret is reused (default 3600; 0 disables caching)
+    SECRETS_CACHE_DIR   directory for the on-disk tier (default: a per-user runtime or temp dir; "off" disables it)
+
+The on-disk tier is only used while its directory is a real directory (not a
+symlink) owned by this user with no group or other permissions; anything else
+is logged and the secret stays in memory.
+"""
+
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from scraper.instrumentation import CACHE_REQUESTS
+from scraper.lazy import lazy_import
+
+boto3 = lazy_import("boto3")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGION = "us-west-2"
+CACHE_TTL = float(os.getenv("SECRETS_CACHE_TTL", "3600"))
+
+
+def _default_cache_dir() -> Optional[str]:
+    configured = os.getenv("SECRETS_CACHE_DIR")
+    if configured is not None:
+        return None if configured.lower() == "off" else configured
+    uid = os.getuid() if hasattr(os, "getuid") else "user"
+    # XDG_RUNTIME_DIR is already private to this user; the temp dir is shared
+    base = os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base, f"clark-county-secrets-{uid}")
+
+
+def _is_private_dir(path: str) -> bool:
+    """True if ``path`` is a directory, not a symlink, owned by this user and closed to everyone else"""
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        return False
+    if hasattr(os, "getuid") and info.st_uid != os.getuid():
+        return False
+    return info.st_mode & 0o077 == 0
+
+
+def fetch_secret(secret_name: str, region_name: Optional[str] = None) -> Dict[str, str]:
+    """Read a JSON secret straight from Secrets Manager"""
+    session = boto3.session.Session()
+    client = session.client(
+        service_name="secretsmanager",
+        region_name=region_name or session.region_name or DEFAULT_REGION,
+    )
+    return json.loads(client.get_secret_value(SecretId=secret_name)["SecretString"])
+
+
+class SecretProvider:
+    """
+    Secrets Manager reads behind an in-memory and an on-disk TTL cache
+
+    Args:
+        ttl: Seconds a fetched secret is reused
+        cache_dir: Directory for the shared on-disk tier (created 0700, files 0600); None keeps secrets in memory only
+        fetcher: ``fetcher(secret_name, region_name) -> dict``; defaults to fetch_secret
+    """
+
+    def __init__(self, ttl: float = CACHE_TTL, cache_dir: Optional[str] = None,
+                 fetcher: Callable[[str, Optional[str]], Dict[str, str]] = fetch_secret):
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.fetcher = fetcher
+        self._entries: Dict[str, Tuple[float, Dict[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def _private_cache_dir(self, create: bool) -> Optional[str]:
+        """The cache directory if it is safe to use (optionally creating it), else None"""
+        if not self.cache_dir:
+            return None
+        try:
+            if create:
+                os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            if _is_private_dir(self.cache_dir):
+                return self.cache_dir
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"Secret cache dir {self.cache_dir} is unusable: {e}")
+            return None
+        logger.warning(f"Not using secret cache dir {self.cache_dir}: it must be a 0700 directory owned by this user")
+        return None
+
+    @staticmethod
+    def _path(cache_dir: str, secret_name: str) -> str:
+        safe = "".join(c if c.isalnum() or c in "-_." else "_" for c in secret_name)
+        return os.path.join(cache_dir, f"{safe}.json")
+
+    def _read_disk(self, secret_name: str) -> Optional[Tuple[float, Dict[str, str]]]:
+        cache_dir = self._private_cache_dir(create=False)
+        if cache_dir is None:
+            return None
+        try:
+            with open(self._path(cache_dir, secret_name)) as f:
+                entry = json.load(f)
+            return float(entry["fetched_at"]), dict(entry["value"])
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable secret cache for {secret_name}: {e}")
+            return None
+
+    def _write_disk(self, secret_name: str, fetched_at: float, value: Dict[str, str]) -> None:
+        cache_dir = self._private_cache_dir(create=True)
+        if cache_dir is None:
+            return
+        try:
+            fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix=".secret-")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump({"fetched_at": fetched_at, "value": value}, f)
+                # Atomic, so concurrent workers never read a half-written file
+                os.replace(tmp, self._path(cache_dir, secret_name))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError as e:
+            logger.warning(f"Could not cache secret {secret_name} on disk: {e}")
+
+    def _fresh(self, entry: Optional[Tuple[float, Dict[str, str]]]) -> Optional[Dict[str, str]]:
+        """A copy of the entry's value while it is within the TTL, else None"""
+        if entry is None or time.time() - entry[0] >= self.ttl:
+            return None
+        return dict(entry[1])
+
+    def get(self, secret_name: str, region_name: Optional[str] = None, refresh: bool = False) -> Dict[str, str]:
+        """
+        The secret's key/value pairs
+
+        Args:
+            refresh: Skip both cache tiers and fetch from Secrets Manager, e.g. after a rotation
+
+        Raises:
+            Whatever the fetcher raises when the secret has to be fetched and cannot be
+        """
+        with self._lock:
+            if not refresh:
+                cached = self._fresh(self._entries.get(secret_name))
+                if cached is not None:
+                    CACHE_REQUESTS.inc(cache="secrets", result="hit")
+                    return cached
+                entry = self._read_disk(secret_name)
+                cached = self._fresh(entry)
+                if entry is not None and cached is not None:
+                    CACHE_REQUESTS.inc(cache="secrets", result="disk_hit")
+                    self._entries[secret_name] = entry
+                    return cached
+            CACHE_REQUESTS.inc(cache="secrets", result="refresh" if refresh else "miss")
+            value = self.fetcher(secret_name, region_name)
+            fetched_at = time.time()
+            if self.ttl > 0:
+                self._entries[secret_name] = (fetched_at, value)
+                self._write_disk(secret_name, fetched_at, value)
+            return dict(value)
+
+    def invalidate(self, secret_name: str) -> None:
+        with self._lock:
+            self._entries.pop(secret_name, None)
+            cache_dir = self._private_cache_dir(create=False)
+            if cache_dir is not None:
+                try:
+                    os.unlink(self._path(cache_dir, secret_name))
+                except FileNotFoundError:
+                    pass
+
+
+_provider: Optional[SecretProvider] = None
+
+
+def get_provider() -> SecretProvider:
+    """The process-wide provider, configured from the environment on first use"""
+    global _provider
+    if _provider is None:
+        _provider = SecretProvider(cache_dir=_default_cache_dir())
+    return _provider
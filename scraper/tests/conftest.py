@@ -0,0 +1,13 @@
+import pytest
+
+from scraper.database.manager import DatabaseManager
+from scraper.database.unified_schema import Base
+
+
+@pytest.fixture
+def db_manager():
+    """In-memory database with every unified-schema table, full-text and spatial index"""
+    manager = DatabaseManager('sqlite:///:memory:')
+    manager.create_tables()
+    yield manager
+    Base.metadata.drop_all(manager.engine)
@@ -0,0 +1,125 @@
+import json
+import socket
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta
+
+import pytest
+
+from scraper.api import PermitQueryService, TTLCache, register_api_routes
+from scraper.database.manager import DatabaseManager
+from scraper.database.unified_schema import Base
+from scraper.instrumentation import API_LATENCY
+from scraper.metrics_server import start_metrics_server
+
+
+@pytest.fixture
+def service(tmp_path):
+    # A file database: the HTTP test queries it from the server's threads
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'permits.db'}")
+    Base.metadata.create_all(manager.engine)
+    start = datetime(2025, 1, 1)
+    manager.upsert_permits([
+        {'permit_number': f'BD25-{i:03d}', 'status': 'Open' if i % 2 else 'Issued',
+         'parcel_number': f'P{i % 3}', 'contractor_name': 'Acme' if i < 5 else 'Other',
+         'date_opened': start + timedelta(days=i // 2)}
+        for i in range(25)
+    ])
+    yield PermitQueryService(manager, cache=TTLCache(ttl=60))
+    Base.metadata.drop_all(manager.engine)
+
+
+def _page(service, **params):
+    return json.loads(service.list_permits({k: [str(v)] for k, v in params.items()}))
+
+
+def test_keyset_pages_cover_every_row_once(service):
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 4, 'opened_from': '2025-01-01', 'opened_to': '2025-02-01'}
+        if cursor:
+            params['after'] = cursor
+        page = _page(service, **params)
+        seen.extend(item['permit_number'] for item in page['items'])
+        cursor = page['next']
+        if cursor is None:
+            break
+    assert sorted(seen) == [f'BD25-{i:03d}' for i in range(25)]
+    assert len(seen) == len(set(seen))
+    # Ordered by date_opened, ties broken by id
+    assert seen == [f'BD25-{i:03d}' for i in range(25)]
+
+
+def test_filters(service):
+    assert {p['status'] for p in _page(service, status='Issued')['items']} == {'Issued'}
+    assert len(_page(service, contractor='Acme')['items']) == 5
+    assert len(_page(service, parcel_number='P0', limit=1000)['items']) == 9
+    window = _page(service, opened_from='2025-01-03', opened_to='2025-01-05')['items']
+    assert [p['permit_number'] for p in window] == ['BD25-004', 'BD25-005', 'BD25-006', 'BD25-007']
+
+
+def test_ndjson_streams_all_matches(service, monkeypatch):
+    monkeypatch.setattr('scraper.api.STREAM_PAGE_SIZE', 7)
+    lines = b''.join(service.stream_permits({'status': ['Open']})).splitlines()
+    assert len(lines) == 12
+    assert all(json.loads(line)['status'] == 'Open' for line in lines)
+
+
+def test_ndjson_latency_covers_the_whole_stream(service):
+    def count():
+        return API_LATENCY.snapshot().get('permits_ndjson', {}).get('count', 0)
+
+    before = count()
+    stream = service.permits_route({'format': ['ndjson']})[2]
+    # Nothing has been read yet, so nothing is timed
+    assert count() == before
+    b''.join(stream)
+    assert count() == before + 1
+
+
+def test_writes_invalidate_cached_pages(service):
+    assert json.loads(service.get_permit('BD25-001'))['status'] == 'Open'
+    other = service.get_permit('BD25-002')
+    _page(service, status='Open')
+    assert len(service.cache) == 3
+    service.db_manager.upsert_permits([{'permit_number': 'BD25-001', 'status': 'Issued'}])
+    # The written permit and every list page are dropped; other permits stay cached
+    assert len(service.cache) == 1
+    assert service.get_permit('BD25-002') == other
+    assert json.loads(service.get_permit('BD25-001'))['status'] == 'Issued'
+    assert 'BD25-001' not in {p['permit_number'] for p in _page(service, status='Open')['items']}
+
+
+def test_write_during_build_is_not_cached_stale(service):
+    def build():
+        body = b'stale'
+        # A write commits and invalidates after the read but before the result is cached
+        service.cache.invalidate({'BD25-001'})
+        return body
+
+    assert service._cached(('permit', 'BD25-001'), build) == b'stale'
+    assert service.cache.get(('permit', 'BD25-001')) is None
+
+
+def test_routes_over_http(service):
+    register_api_routes(service)
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    server = start_metrics_server(port=port, host='127.0.0.1')
+    try:
+        base = f'http://127.0.0.1:{port}'
+        with urllib.request.urlopen(f'{base}/permit?number=BD25-003') as resp:
+            assert json.loads(resp.read())['permit_number'] == 'BD25-003'
+        with urllib.request.urlopen(f'{base}/permits?format=ndjson&contractor=Acme') as resp:
+            assert resp.headers['Content-Type'] == 'application/x-ndjson'
+            assert len(resp.read().splitlines()) == 5
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(f'{base}/permits?opened_from=someday')
+        assert excinfo.value.code == 400
+        with pytest.raises(urllib.error.HTTPError) as excinfo:
+            urllib.request.urlopen(f'{base}/permit?number=nope')
+        assert excinfo.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
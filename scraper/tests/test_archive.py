@@ -0,0 +1,81 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from scraper.database.archive import archive_permits, archive_status, detach_year
+from scraper.database.manager import DatabaseManager
+from scraper.database.unified_schema import ArchivedPermit, Fee, Permit, StatusHistory
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'permits.db'}")
+    manager.create_tables()
+    manager.upsert_permits([
+        {"permit_number": "BD19-1", "status": "Finaled", "applied_date": datetime(2019, 3, 5),
+         "fees": [{"fee_type": "Plan check", "amount": 12.5, "paid_date": datetime(2019, 3, 6)}]},
+        {"permit_number": "BD19-2", "status": "Issued", "applied_date": datetime(2019, 6, 1)},
+        {"permit_number": "BD20-1", "status": "Expired", "applied_date": datetime(2020, 2, 2)},
+        {"permit_number": "BD25-1", "status": "Finaled", "applied_date": datetime(2025, 1, 9)},
+    ])
+    return manager
+
+
+def hot_numbers(db):
+    with db.engine.connect() as conn:
+        return set(conn.execute(select(Permit.permit_number)).scalars())
+
+
+def test_settled_past_permits_move_to_year_files(db, tmp_path):
+    assert archive_permits(db, before_year=2024) == {2019: 1, 2020: 1}
+    # Still-open and recent permits stay hot
+    assert hot_numbers(db) == {"BD19-2", "BD25-1"}
+    assert (tmp_path / "archive" / "permits_2019.db").exists()
+    assert (tmp_path / "archive" / "permits_2020.db").exists()
+    with db.engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(Fee)).scalar() == 0
+        assert conn.execute(select(func.count()).select_from(StatusHistory)).scalar() == 2
+    archived = db.archived_permit("BD19-1")
+    assert archived["status"] == "Finaled"
+    assert "Plan check" in archived["fees"]
+    assert db.archived_permit("BD19-2") is None
+    assert archive_status(db.engine) == [
+        {"applied_year": 2019, "tier": "archive", "permits": 1},
+        {"applied_year": 2020, "tier": "archive", "permits": 1},
+    ]
+
+
+def test_upsert_restores_an_archived_permit_before_diffing(db):
+    archive_permits(db, before_year=2024)
+    stats = db.upsert_permits([{"permit_number": "BD19-1", "status": "Reopened"}])
+    assert stats["restored"] == 1
+    assert stats["updated"] == 1 and stats["inserted"] == 0
+    assert "BD19-1" in hot_numbers(db)
+    with db.engine.connect() as conn:
+        permit_id = conn.execute(select(Permit.id).where(Permit.permit_number == "BD19-1")).scalar()
+        fees = conn.execute(select(Fee.fee_type, Fee.paid_date).where(Fee.permit_id == permit_id)).all()
+        history = conn.execute(
+            select(StatusHistory.old_status, StatusHistory.new_status)
+            .where(StatusHistory.permit_id == permit_id).order_by(StatusHistory.id)
+        ).all()
+        assert conn.execute(select(func.count()).select_from(ArchivedPermit)).scalar() == 1
+    assert fees == [("Plan check", datetime(2019, 3, 6))]
+    assert history == [(None, "Finaled"), ("Finaled", "Reopened")]
+    assert db.archived_permit("BD19-1") is None
+
+
+def test_detached_year_is_read_and_restored_from_parquet(db, tmp_path):
+    pytest.importorskip("pyarrow")
+    archive_permits(db, before_year=2024)
+    result = detach_year(db, 2019, str(tmp_path / "cold"))
+    assert result["rows"] == 1
+    assert not (tmp_path / "archive" / "permits_2019.db").exists()
+    assert db.archived_permit("BD19-1")["applied_date"] == datetime(2019, 3, 5)
+    assert archive_status(db.engine)[0] == {"applied_year": 2019, "tier": "parquet", "permits": 1}
+
+    stats = db.upsert_permits([{"permit_number": "BD19-1", "status": "Finaled"}])
+    assert stats["restored"] == 1 and stats["unchanged"] == 1
+    with db.engine.connect() as conn:
+        fees = conn.execute(select(Fee.amount).join(Permit).where(Permit.permit_number == "BD19-1")).scalars().all()
+    assert fees == [12.5]
@@ -0,0 +1,98 @@
+from datetime import datetime
+from functools import partial
+
+from sqlalchemy import select
+
+from scraper.batch import (
+    EXIT_FAILURE_THRESHOLD,
+    EXIT_OK,
+    DatabaseSink,
+    Progress,
+    available_cpus,
+    cgroup_cpu_limit,
+    exit_code,
+    numbers_from_db,
+    read_numbers,
+    run_batch,
+    shard,
+)
+from scraper.database.unified_schema import Permit
+
+
+class FakeWorker:
+    """Succeeds for every permit except those ending in 'X'"""
+
+    def scrape(self, number):
+        if number.endswith("X"):
+            return None, ["Login failed"]
+        return {"permit_number": number, "status": "Issued", "record_type": "Building"}, []
+
+    def close(self):
+        pass
+
+
+def test_read_numbers_skips_blanks_comments_and_duplicates():
+    lines = ["BD25-1\n", "\n", "# header\n", "BD25-2  # note\n", "BD25-1\n"]
+    assert read_numbers(lines) == ["BD25-1", "BD25-2"]
+
+
+def test_shard_is_round_robin_and_complete():
+    numbers = [str(i) for i in range(7)]
+    shards = shard(numbers, 3)
+    assert shards == [["0", "3", "6"], ["1", "4"], ["2", "5"]]
+
+
+def test_progress_line_and_exit_code():
+    now = [100.0]
+    progress = Progress(100, clock=lambda: now[0])
+    progress.succeeded, progress.failed = 18, 2
+    now[0] = 110.0
+    line = progress.line()
+    assert "20/100 permits (20.0%)" in line
+    assert "2.00/s" in line and "ETA 00:00:40" in line
+    totals = progress.totals()
+    assert exit_code(totals, max_failure_rate=0.05) == EXIT_OK
+    assert exit_code(totals, max_failure_rate=0.01) == EXIT_FAILURE_THRESHOLD
+    assert exit_code(totals, max_failure_rate=1.0, max_failures=1) == EXIT_FAILURE_THRESHOLD
+
+
+def test_run_batch_writes_through_single_writer(tmp_path):
+    url = f"sqlite:///{tmp_path / 'batch.db'}"
+    numbers = [f"BD25-{i}" for i in range(20)] + ["BD25-99X"]
+    totals = run_batch(numbers, workers=3, worker_factory=FakeWorker,
+                       sink_factory=partial(DatabaseSink, url), write_batch=4)
+    assert totals["total"] == 21
+    assert totals["succeeded"] == 20 and totals["failed"] == 1
+
+    sink = DatabaseSink(url)
+    with sink.db_manager.engine.connect() as conn:
+        stored = set(conn.execute(select(Permit.permit_number)).scalars())
+    assert stored == set(numbers[:20])
+
+
+def test_cgroup_quota_caps_the_default_worker_count(tmp_path):
+    (tmp_path / "cpu.max").write_text("150000 100000\n")
+    assert cgroup_cpu_limit(str(tmp_path)) == 1.5
+    assert available_cpus(str(tmp_path)) <= 2
+    (tmp_path / "cpu.max").write_text("max 100000\n")
+    assert cgroup_cpu_limit(str(tmp_path)) is None
+
+    v1 = tmp_path / "v1"
+    (v1 / "cpu").mkdir(parents=True)
+    (v1 / "cpu" / "cpu.cfs_quota_us").write_text("50000\n")
+    (v1 / "cpu" / "cpu.cfs_period_us").write_text("100000\n")
+    assert cgroup_cpu_limit(str(v1)) == 0.5
+    assert available_cpus(str(v1)) == 1
+    (v1 / "cpu" / "cpu.cfs_quota_us").write_text("-1\n")
+    assert cgroup_cpu_limit(str(v1)) is None
+
+
+def test_numbers_from_db_puts_least_recently_scraped_first(db_manager):
+    db_manager.upsert_permits([
+        {"permit_number": "BD-1", "status": "Issued", "last_scraped": datetime(2024, 6, 1)},
+        {"permit_number": "BD-2", "status": "Issued", "last_scraped": datetime(2024, 5, 1)},
+        {"permit_number": "BD-3", "status": "Issued", "last_scraped": datetime(2024, 7, 1)},
+    ])
+    # An unchanged rescrape still counts as the most recent scrape
+    db_manager.upsert_permits([{"permit_number": "BD-2", "status": "Issued", "last_scraped": datetime(2024, 8, 1)}])
+    assert numbers_from_db(db_manager) == ["BD-1", "BD-3", "BD-2"]
@@ -0,0 +1,150 @@
+import threading
+
+import pytest
+
+from scraper.browser import _PAGE_SIZE, BrowserUnavailable, RecyclingBrowser, process_tree_rss
+
+
+class FakeDriver:
+    instances = []
+
+    def __init__(self):
+        self.cookies = []
+        self.visited = []
+        self.closed = False
+        FakeDriver.instances.append(self)
+
+    def get_cookies(self):
+        return [dict(c) for c in self.cookies]
+
+    def add_cookie(self, cookie):
+        self.cookies.append(cookie)
+
+    def get(self, url):
+        self.visited.append(url)
+
+    def quit(self):
+        self.closed = True
+
+
+def make_browser(**kwargs):
+    FakeDriver.instances = []
+    replaced = []
+    browser = RecyclingBrowser(FakeDriver, "https://example.test/", on_replace=replaced.append, **kwargs)
+    browser.start()
+    return browser, replaced
+
+
+def test_recycles_after_page_limit_and_restores_cookies():
+    browser, replaced = make_browser(max_pages=3, rss_reader=lambda d: 0)
+    first = browser.driver
+    first.cookies = [{"name": "ASP.NET_SessionId", "value": "abc", "domain": "example.test", "extra": 1}]
+    for _ in range(3):
+        with browser.lease():
+            pass
+    assert first.closed
+    assert browser.driver is not first and replaced == [first, browser.driver]
+    assert browser.driver.visited == ["https://example.test/"]
+    assert browser.driver.cookies == [{"name": "ASP.NET_SessionId", "value": "abc", "domain": "example.test"}]
+    assert browser.pages == 0 and browser.recycles == 1
+
+
+def test_recycles_when_rss_exceeds_limit():
+    rss = {"value": 10}
+    browser, _ = make_browser(max_pages=1000, max_rss_bytes=100, rss_check_every=2,
+                              rss_reader=lambda d: rss["value"])
+    with browser.lease():
+        pass
+    rss["value"] = 500
+    with browser.lease():
+        pass
+    assert browser.recycles == 1
+    browser.close()
+    assert all(d.closed for d in FakeDriver.instances)
+
+
+def test_recycle_waits_for_in_flight_work():
+    browser, _ = make_browser(max_pages=1, rss_reader=lambda d: 0)
+    first = browser.driver
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        with browser.lease():
+            started.set()
+            release.wait(2)
+
+    worker = threading.Thread(target=slow)
+    worker.start()
+    started.wait(2)
+    with browser.lease():
+        pass
+    # The finished lease crossed the threshold, but another lease is still running
+    assert not first.closed
+    release.set()
+    worker.join(2)
+    assert first.closed and browser.recycles == 1
+
+
+def test_process_tree_rss_sums_descendants(tmp_path):
+    def proc(pid, ppid, pages):
+        (tmp_path / str(pid)).mkdir()
+        (tmp_path / str(pid) / "stat").write_text(f"{pid} (chrome (renderer)) S {ppid} 0 0\n")
+        (tmp_path / str(pid) / "statm").write_text(f"1000 {pages} 0 0 0 0 0\n")
+
+    proc(10, 1, 100)
+    proc(11, 10, 200)
+    proc(12, 11, 300)
+    proc(20, 1, 999)
+    assert process_tree_rss(10, str(tmp_path)) == 600 * _PAGE_SIZE
+    assert process_tree_rss(12, str(tmp_path)) == 300 * _PAGE_SIZE
+    assert process_tree_rss(99, "/nonexistent") == 0
+
+
+def test_failed_restart_is_retried_then_stops_the_worker():
+    FakeDriver.instances = []
+    replaced = []
+    attempts = {"n": 0, "fail": 0}
+
+    def factory():
+        attempts["n"] += 1
+        if attempts["n"] > 1 and attempts["fail"]:
+            attempts["fail"] -= 1
+            raise RuntimeError("chrome did not start")
+        return FakeDriver()
+
+    browser = RecyclingBrowser(factory, "https://example.test/", on_replace=replaced.append,
+                               max_pages=1, rss_reader=lambda d: 0, start_attempts=2, start_retry_delay=0)
+    browser.start()
+    # One failed start is retried
+    attempts["fail"] = 1
+    with browser.lease():
+        pass
+    assert browser.recycles == 1 and replaced[-1] is browser.driver
+
+    # Every start failing leaves no driver, clears the owner's reference and fails later leases
+    attempts["fail"] = 2
+    with browser.lease():
+        pass
+    assert browser.driver is None and replaced[-1] is None
+    with pytest.raises(BrowserUnavailable):
+        with browser.lease():
+            pass
+
+
+def test_failed_page_load_after_restart_does_not_fail_the_lease():
+    class NoPageDriver(FakeDriver):
+        def get(self, url):
+            if len(FakeDriver.instances) > 1:
+                raise TimeoutError("page load timed out")
+
+    FakeDriver.instances = []
+    browser = RecyclingBrowser(NoPageDriver, "https://example.test/", max_pages=1, rss_reader=lambda d: 0)
+    browser.start()
+    browser.driver.cookies = [{"name": "ASP.NET_SessionId", "value": "abc"}]
+    with browser.lease():
+        pass
+    assert browser.recycles == 1
+    assert browser.driver.cookies == []
+    with browser.lease():
+        pass
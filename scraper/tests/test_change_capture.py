@@ -0,0 +1,85 @@
+from scraper.database.mapping import permit_row_from_details
+from scraper.database.unified_schema import Inspection, Permit, PermitChange, StatusHistory
+from scraper.enhanced_detail_scraper_final import PermitDetails
+
+
+def test_first_upsert_inserts_and_records_initial_status(db_manager):
+    stats = db_manager.upsert_permits([
+        {'permit_number': 'BD25-1', 'status': 'Open', 'job_value': 1000.0},
+        {'permit_number': 'BD25-2'},
+    ])
+    assert stats['inserted'] == 2
+    session = db_manager.SessionLocal()
+    history = session.query(StatusHistory).all()
+    assert [(h.old_status, h.new_status) for h in history] == [(None, 'Open')]
+    session.close()
+
+
+def test_unchanged_rows_are_not_written(db_manager):
+    db_manager.upsert_permits([{'permit_number': 'BD25-1', 'status': 'Open'}])
+    session = db_manager.SessionLocal()
+    before = session.query(Permit.updated_at).filter_by(permit_number='BD25-1').scalar()
+    session.close()
+    stats = db_manager.upsert_permits([{'permit_number': 'BD25-1', 'status': 'Open', 'zoning': ''}])
+    assert stats['unchanged'] == 1
+    assert stats['updated'] == stats['status_changes'] == stats['field_changes'] == 0
+    session = db_manager.SessionLocal()
+    assert session.query(Permit.updated_at).filter_by(permit_number='BD25-1').scalar() == before
+    session.close()
+
+
+def test_changed_rows_emit_history_and_field_changes(db_manager):
+    db_manager.upsert_permits([
+        {'permit_number': 'BD25-1', 'status': 'Open', 'job_value': 1000.0, 'owner_name': 'A'},
+        {'permit_number': 'BD25-2', 'status': 'Open'},
+    ])
+    stats = db_manager.upsert_permits([
+        {'permit_number': 'BD25-1', 'status': 'Issued', 'job_value': 2500.0},
+        {'permit_number': 'BD25-2', 'status': 'Open'},
+    ], changed_by='test')
+    assert stats['updated'] == 1
+    assert stats['unchanged'] == 1
+    session = db_manager.SessionLocal()
+    permit = session.query(Permit).filter_by(permit_number='BD25-1').one()
+    assert permit.status == 'Issued'
+    # Keys absent from the incoming row are left untouched
+    assert permit.owner_name == 'A'
+    transitions = [(h.old_status, h.new_status) for h in permit.status_history]
+    assert transitions == [(None, 'Open'), ('Open', 'Issued')]
+    changes = {c.field_name: (c.old_value, c.new_value) for c in session.query(PermitChange).all()}
+    assert changes == {'status': ('Open', 'Issued'), 'job_value': ('1000.0', '2500.0')}
+    session.close()
+
+
+def test_permit_row_from_details_parses_dates_and_drops_missing():
+    row = permit_row_from_details(PermitDetails(
+        permit_number='BD25-9', status='Open', applied_date='03/14/2025', job_value=5000.0,
+    ))
+    assert row['applied_date'].year == 2025
+    assert row['date_opened'] == row['applied_date']
+    assert 'owner_name' not in row
+
+
+def test_children_replaced_only_when_changed(db_manager):
+    fees = [{'fee_type': 'Plan Check', 'amount': 100.0, 'status': 'Paid'}]
+    inspections = [
+        {'inspection_type': 'Framing', 'status': 'Failed', 'outcome': 'failed'},
+        {'inspection_type': 'Footing', 'status': 'Passed', 'outcome': 'passed'},
+    ]
+    stats = db_manager.upsert_permits([
+        {'permit_number': 'BD25-1', 'fees': fees, 'inspections': inspections},
+    ])
+    assert stats['children_replaced'] == 2
+    stats = db_manager.upsert_permits([
+        {'permit_number': 'BD25-1', 'fees': fees, 'inspections': list(reversed(inspections))},
+    ])
+    assert stats['children_replaced'] == 0
+    fees.append({'fee_type': 'Permit Fee', 'amount': 50.0, 'status': 'Due'})
+    stats = db_manager.upsert_permits([{'permit_number': 'BD25-1', 'fees': fees}])
+    assert stats['children_replaced'] == 1
+    session = db_manager.SessionLocal()
+    permit = session.query(Permit).filter_by(permit_number='BD25-1').one()
+    assert sorted(f.fee_type for f in permit.fees) == ['Permit Fee', 'Plan Check']
+    assert len(permit.inspections) == 2
+    assert session.query(Inspection).filter_by(outcome='failed').count() == 1
+    session.close()
@@ -0,0 +1,89 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from scraper.coercion import coerce_batch, parse_date, parse_int, parse_money
+from scraper.database.mapping import PERMIT_SCHEMA, permit_rows_from_complete_data
+from scraper.models.complete_permit_data import CompletePermitData
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('03/14/2025', datetime(2025, 3, 14)),
+    ('3/4/25', datetime(2025, 3, 4)),
+    ('03-14-2025', datetime(2025, 3, 14)),
+    ('03/14/2025 2:05 PM', datetime(2025, 3, 14, 14, 5)),
+    ('03/14/2025 12:00 AM', datetime(2025, 3, 14, 0, 0)),
+    ('2025-03-14', datetime(2025, 3, 14)),
+    ('2025-03-14T08:30:00.123456', datetime(2025, 3, 14, 8, 30, 0, 123456)),
+    ('Mar 14, 2025', datetime(2025, 3, 14)),
+    ('13/45/2025', None),
+    ('pending', None),
+])
+def test_parse_date(text, expected):
+    assert parse_date(text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('$1,250.00', 1250.0),
+    ('1250', 1250.0),
+    ('(45.00)', -45.0),
+    ('-$10', -10.0),
+    ('$ .50', 0.5),
+    ('TBD', None),
+    ('(45.00', None),
+])
+def test_parse_money(text, expected):
+    assert parse_money(text) == expected
+
+
+def test_parse_int():
+    assert parse_int('1,200 sq ft') == 1200
+    assert parse_int('2 stories') == 2
+    assert parse_int('2.5') is None
+    assert parse_int('1e3') == 1000
+    assert parse_int('n/a') is None
+
+
+def test_coerce_batch_reports_failures_per_field():
+    rows, report = coerce_batch([
+        {'applied_date': '01/02/2025', 'job_value': '$5,000', 'number_of_units': '3'},
+        {'applied_date': 'unknown', 'job_value': '', 'status': 'Open'},
+        {'applied_date': None, 'job_value': 'call office'},
+    ], PERMIT_SCHEMA)
+    assert rows[0] == {'applied_date': datetime(2025, 1, 2), 'job_value': 5000.0, 'number_of_units': 3}
+    assert rows[1]['applied_date'] is None and rows[1]['job_value'] is None
+    assert rows[1]['status'] == 'Open'
+    assert report.failures == {'applied_date': 1, 'job_value': 1}
+    assert report.examples['job_value'] == ['call office']
+    assert not report.ok
+
+
+def test_complete_permit_data_money_text_is_coerced():
+    rows, report = permit_rows_from_complete_data([
+        CompletePermitData(permit_number='BD25-1', permit_type='Building', job_value='$12,500.00',
+                           total_fees='1,000', applied_date='05/06/2024', square_footage='2,400'),
+    ])
+    row = rows[0]
+    assert row['record_type'] == 'Building'
+    assert row['job_value'] == 12500.0
+    assert row['total_fees'] == 1000.0
+    assert row['square_footage'] == 2400.0
+    assert row['applied_date'] == datetime(2024, 5, 6)
+    assert 'owner_name' not in row
+    assert report.ok
+
+
+def test_coerce_batch_backfill_throughput():
+    rows = [
+        {'applied_date': f'{(i % 12) + 1:02d}/{(i % 28) + 1:02d}/2024',
+         'issued_date': '01/15/2025', 'job_value': f'${i:,}.00', 'square_footage': f'{i % 5000} sq ft'}
+        for i in range(100_000)
+    ]
+    start = time.perf_counter()
+    coerced, report = coerce_batch(rows, PERMIT_SCHEMA)
+    elapsed = time.perf_counter() - start
+    assert report.ok
+    assert coerced[-1]['job_value'] == 99_999.0
+    # Generous bound for slow CI runners; typically well under a second
+    assert elapsed < 10
@@ -1,6 +1,6 @@
 import os
 import pytest
-from scraper.config import get_database_url
+from scraper.config import database_url_from_secret, get_database_url
 
 def test_get_database_url_env(monkeypatch):
     monkeypatch.setenv('DATABASE_URL', 'sqlite:///test.db')
@@ -12,4 +12,12 @@ def test_get_database_url_missing(monkeypatch):
     monkeypatch.delenv('AWS_REGION', raising=False)
     # Should raise since no env or AWS secret
     with pytest.raises(RuntimeError):
-        get_database_url() 
\ No newline at end of file
+        get_database_url()
+
+
+def test_database_url_from_secret_prefers_rotated_password():
+    url = database_url_from_secret({'DATABASE_URL': 'postgresql://app:old@db:5432/permits', 'password': 'new'})
+    assert url == 'postgresql://app:new@db:5432/permits'
+    rds = database_url_from_secret({'host': 'db', 'port': 5432, 'username': 'app', 'password': 'p@ss', 'dbname': 'permits'})
+    assert rds == 'postgresql://app:p%40ss@db:5432/permits'
+    assert database_url_from_secret({'api_key': 'x'}) is None
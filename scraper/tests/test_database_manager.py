@@ -18,4 +18,50 @@ def test_database_manager_sqlite():
     result = session.query(Permit).filter_by(permit_number='TEST-123').first()
     assert result is not None
     assert result.permit_number == 'TEST-123'
-    session.close() 
\ No newline at end of file
+    session.close() 
+
+class AuthError(Exception):
+    pass
+
+
+def test_auth_failure_refetches_credentials_once_and_reconnects(tmp_path):
+    old_url = f"sqlite:///{tmp_path / 'old.db'}"
+    new_url = f"sqlite:///{tmp_path / 'new.db'}"
+    refreshes = []
+
+    def refresher():
+        refreshes.append(1)
+        return new_url
+
+    db_manager = DatabaseManager(old_url, credentials_refresher=refresher)
+    dialect = db_manager.engine.dialect
+    real_connect = dialect.connect
+
+    def connect(*cargs, **cparams):
+        # Stand-in for a server that no longer accepts the rotated-out password
+        if cargs[0].endswith('old.db'):
+            raise AuthError('FATAL: password authentication failed for user "app"')
+        return real_connect(*cargs, **cparams)
+
+    dialect.connect = connect
+    with db_manager.engine.connect() as conn:
+        assert conn.execute(text('PRAGMA database_list')).fetchone()[2].endswith('new.db')
+    assert refreshes == [1]
+    # The pool was rebuilt in place; later connections use the new credentials without refetching
+    db_manager.engine.dispose()
+    with db_manager.engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+    assert refreshes == [1]
+
+
+def test_auth_failure_with_no_new_credentials_is_raised(tmp_path):
+    import pytest
+
+    db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'db.db'}", credentials_refresher=lambda: None)
+
+    def connect(*cargs, **cparams):
+        raise AuthError('password authentication failed')
+
+    db_manager.engine.dialect.connect = connect
+    with pytest.raises(Exception, match='password authentication failed'):
+        db_manager.engine.connect()
@@ -0,0 +1,99 @@
+import os
+import signal
+import threading
+import time
+
+import pytest
+from sqlalchemy import func, select
+
+from scraper.database.manager import DatabaseManager
+from scraper.database.unified_schema import Permit
+from scraper.database.writer import BackgroundWriter, close_on_signal
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    # A file, not :memory:, so the writer thread sees the same database
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'writer.db'}")
+    manager.create_tables()
+    return manager
+
+
+def permit_count(db_manager):
+    with db_manager.engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(Permit.__table__)).scalar()
+
+
+class SlowManager:
+    """Stands in for a database that only commits when told to"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.batches = []
+
+    def upsert_permits(self, rows, changed_by):
+        self.release.wait(5)
+        self.batches.append([row["permit_number"] for row in rows])
+        return {}
+
+
+def test_rows_are_batched_and_flushed_on_close(db_manager):
+    writer = BackgroundWriter(db_manager, batch_size=50).start()
+    for i in range(120):
+        writer.submit({"permit_number": f"BD-{i}", "status": "Issued"})
+    assert writer.close()
+    assert permit_count(db_manager) == 120
+    assert writer.written == 120
+    with pytest.raises(RuntimeError):
+        writer.submit({"permit_number": "late"})
+
+
+def test_full_queue_blocks_submit_until_the_database_catches_up():
+    manager = SlowManager()
+    writer = BackgroundWriter(manager, max_queue=2, batch_size=10).start()
+    writer.submit({"permit_number": "A"})
+    while writer.pending():  # taken by the writer, which then stalls on the database
+        time.sleep(0.01)
+    writer.submit({"permit_number": "B"})
+    writer.submit({"permit_number": "C"})
+    blocked = threading.Thread(target=writer.submit, args=({"permit_number": "D"},))
+    blocked.start()
+    blocked.join(0.2)
+    assert blocked.is_alive()
+    manager.release.set()
+    blocked.join(5)
+    assert writer.close()
+    assert manager.batches[0] == ["A"]
+    assert sorted(sum(manager.batches[1:], [])) == ["B", "C", "D"]
+
+
+def test_failed_batches_go_to_the_failure_handler():
+    class Down:
+        calls = 0
+
+        def upsert_permits(self, rows, changed_by):
+            Down.calls += 1
+            raise ConnectionError("database unavailable")
+
+    failed = []
+    writer = BackgroundWriter(Down(), retries=2, retry_delay=0.01, on_failure=failed.extend).start()
+    writer.submit({"permit_number": "BD-1"})
+    writer.flush()
+    assert Down.calls == 3
+    assert failed == [{"permit_number": "BD-1"}]
+    assert writer.failed == 1
+    writer.close()
+
+
+def test_sigterm_flushes_before_the_previous_handler(db_manager):
+    seen = []
+    original = signal.signal(signal.SIGTERM, lambda signum, frame: seen.append(permit_count(db_manager)))
+    try:
+        writer = BackgroundWriter(db_manager).start()
+        close_on_signal(writer)
+        for i in range(10):
+            writer.submit({"permit_number": f"BD-{i}"})
+        os.kill(os.getpid(), signal.SIGTERM)
+        assert seen == [10]
+    finally:
+        signal.signal(signal.SIGTERM, original)
@@ -0,0 +1,103 @@
+import pytest
+
+from sqlalchemy import func, select
+
+from scraper.database import entities
+from scraper.database.entities import backfill_entities, normalize_name, similarity, soundex
+from scraper.database.unified_schema import Entity, EntityAlias, Permit, PermitChange
+
+
+def _entity_ids(db_manager, column):
+    session = db_manager.SessionLocal()
+    ids = {p.permit_number: getattr(p, column) for p in session.query(Permit)}
+    session.close()
+    return ids
+
+
+@pytest.mark.parametrize('raw, expected', [
+    ('ABC CONSTRUCTION LLC', 'ABC CONSTRUCTION'),
+    ('A.B.C. Construction, L.L.C.', 'ABC CONSTRUCTION'),
+    ('The Smith & Sons Co.', 'SMITH AND SONS'),
+    ("O'Brien Electric, Inc", 'O BRIEN ELECTRIC'),
+])
+def test_normalize_name(raw, expected):
+    assert normalize_name(raw) == expected
+
+
+def test_soundex_and_similarity():
+    assert soundex('Robert') == soundex('Rupert') == 'R163'
+    assert soundex('Ashcraft') == 'A261'
+    assert similarity('SMITH JOHN', 'JOHN SMITH') == 1.0
+    assert similarity('ABC CONSTRUCTION', 'ABC CONSTRUCTON') > 0.9
+
+
+def test_variants_resolve_to_one_stable_entity(db_manager):
+    stats = db_manager.upsert_permits([
+        {'permit_number': 'BD-1', 'contractor_name': 'ABC CONSTRUCTION LLC'},
+        {'permit_number': 'BD-2', 'contractor_name': 'A.B.C. Construction, L.L.C.'},
+        {'permit_number': 'BD-3', 'contractor_name': 'XYZ Plumbing'},
+    ])
+    assert stats['entities_created'] == 2
+    first = _entity_ids(db_manager, 'contractor_entity_id')
+    assert first['BD-1'] == first['BD-2'] != first['BD-3']
+    # A later batch with a typo lands on the existing entity through the phonetic block
+    db_manager.upsert_permits([{'permit_number': 'BD-4', 'contractor_name': 'ABC Constructon'}])
+    assert _entity_ids(db_manager, 'contractor_entity_id')['BD-4'] == first['BD-1']
+    session = db_manager.SessionLocal()
+    assert session.query(Entity).filter_by(entity_type='contractor').count() == 2
+    session.close()
+
+
+def test_licenses_decide_contractor_identity(db_manager):
+    db_manager.upsert_permits([
+        {'permit_number': 'BD-1', 'contractor_name': 'Desert Roofing', 'contractor_license': '0012345'},
+        {'permit_number': 'BD-2', 'contractor_name': 'Desert Roofing', 'contractor_license': '0099999'},
+        {'permit_number': 'BD-3', 'contractor_name': 'Desert Roofing & Solar', 'contractor_license': '0012345'},
+    ])
+    ids = _entity_ids(db_manager, 'contractor_entity_id')
+    assert ids['BD-1'] == ids['BD-3'] != ids['BD-2']
+
+
+def test_owners_and_contractors_are_separate_namespaces(db_manager):
+    db_manager.upsert_permits([
+        {'permit_number': 'BD-1', 'owner_name': 'Smith, John', 'contractor_name': 'Smith John'},
+        {'permit_number': 'BD-2', 'owner_name': 'JOHN SMITH'},
+    ])
+    owners = _entity_ids(db_manager, 'owner_entity_id')
+    assert owners['BD-1'] == owners['BD-2']
+    assert _entity_ids(db_manager, 'contractor_entity_id')['BD-1'] != owners['BD-1']
+
+
+def test_backfill_resolves_existing_permits(db_manager):
+    with db_manager.engine.begin() as conn:
+        conn.execute(Permit.__table__.insert(), [
+            {'permit_number': f'BD-{i}', 'owner_name': 'Lee Family Trust' if i % 2 else 'LEE FAMILY TRUST'}
+            for i in range(6)
+        ])
+    assert backfill_entities(db_manager, batch_size=4) == 6
+    assert len(set(_entity_ids(db_manager, 'owner_entity_id').values())) == 1
+    # Filling in entity ids is not a change to the permit
+    with db_manager.engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(PermitChange)).scalar() == 0
+
+
+def test_alias_recorded_concurrently_by_another_writer_wins(db_manager, monkeypatch):
+    insert_aliases = entities._insert_aliases
+
+    def racing_insert(conn, rows):
+        # Another writer commits the same new alias between our lookup and our insert
+        winner = conn.execute(Entity.__table__.insert().values(
+            entity_type='owner', canonical_name='Acme Holdings', normalized_name='ACME HOLDINGS',
+        )).inserted_primary_key[0]
+        conn.execute(EntityAlias.__table__.insert().values(
+            entity_type='owner', normalized_name='ACME HOLDINGS', license='', entity_id=winner,
+        ))
+        insert_aliases(conn, rows)
+
+    monkeypatch.setattr(entities, '_insert_aliases', racing_insert)
+    stats = db_manager.upsert_permits([{'permit_number': 'BD-1', 'owner_name': 'Acme Holdings'}])
+    assert stats['entities_created'] == 0
+    with db_manager.engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(Entity)).scalar() == 1
+        winner = conn.execute(select(Entity.id)).scalar()
+    assert _entity_ids(db_manager, 'owner_entity_id') == {'BD-1': winner}
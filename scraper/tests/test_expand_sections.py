@@ -0,0 +1,58 @@
+import importlib
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+from scraper.page_scripts import EXPAND_PATTERNS
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+@pytest.fixture
+def working(monkeypatch):
+    monkeypatch.setenv('CLARK_COUNTY_USERNAME', 'testuser')
+    monkeypatch.setenv('CLARK_COUNTY_PASSWORD', 'testpass')
+    # The top-level script imports the base scraper as a sibling module
+    monkeypatch.syspath_prepend(str(REPO_ROOT / 'scraper'))
+    monkeypatch.syspath_prepend(str(REPO_ROOT))
+    return importlib.import_module('enhanced_100_percent_working')
+
+
+def expander(working, opened_per_call):
+    scraper = working.Enhanced100PercentScraper()
+    scraper.driver = MagicMock()
+    scraper.driver.execute_async_script.side_effect = [
+        {'opened': opened, 'elapsed_ms': 5, 'settled': True} for opened in opened_per_call
+    ]
+    return scraper
+
+
+def patterns_sent(scraper, call):
+    return scraper.driver.execute_async_script.call_args_list[call].args[1]
+
+
+def test_pattern_is_skipped_after_missing_on_consecutive_pages(working):
+    limit = working.EXPAND_SKIP_AFTER
+    scraper = expander(working, [{'Show More': 1}] * (limit + 1))
+    for _ in range(limit):
+        scraper.expand_all_sections('layout-a')
+    assert scraper.dead_patterns['layout-a'] == set(EXPAND_PATTERNS) - {'Show More'}
+
+    assert scraper.expand_all_sections('layout-a') == 1
+    assert patterns_sent(scraper, limit) == ['Show More']
+    # Other layouts still try every pattern
+    scraper.driver.execute_async_script.side_effect = [{'opened': {}}]
+    scraper.expand_all_sections('layout-b')
+    assert patterns_sent(scraper, limit + 1) == list(EXPAND_PATTERNS)
+
+
+def test_hit_resets_a_patterns_miss_count(working):
+    limit = working.EXPAND_SKIP_AFTER
+    hits = [{}] * (limit - 1) + [{'Fee Details': 2}] + [{}] * (limit - 1)
+    scraper = expander(working, hits)
+    for _ in hits:
+        scraper.expand_all_sections('layout-a')
+    assert scraper.pattern_misses['layout-a']['Fee Details'] == limit - 1
+    assert 'Fee Details' not in scraper.dead_patterns['layout-a']
+    assert 'Fee Details' in scraper.expanded_sections
@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from scraper.database.manager import DatabaseManager
+from scraper.database.unified_schema import Permit
+
+pa = pytest.importorskip("pyarrow")
+ds = pytest.importorskip("pyarrow.dataset")
+
+from scraper.database.export import export_permits  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'export.db'}")
+    manager.create_tables()
+    manager.upsert_permits([
+        {"permit_number": "BD24-1", "record_type": "Building", "status": "Issued",
+         "applied_date": datetime(2024, 3, 5),
+         "inspections": [{"inspection_type": "Footing", "status": "Passed", "outcome": "passed"}]},
+        {"permit_number": "BD24-2", "record_type": "Building", "status": "Issued",
+         "applied_date": datetime(2024, 4, 1)},
+        {"permit_number": "EL25-1", "record_type": "Electrical", "status": "Applied",
+         "applied_date": datetime(2025, 1, 9)},
+        {"permit_number": "XX-1", "record_type": None, "status": "Applied"},
+    ])
+    return manager
+
+
+def read(path):
+    return ds.dataset(str(path), format="parquet", partitioning="hive").to_table()
+
+
+def test_full_export_is_partitioned_with_children(db, tmp_path):
+    dest = tmp_path / "out"
+    totals = export_permits(db, str(dest), include=["inspections"], batch_size=2)
+    assert totals["rows"] == 4
+    assert (dest / "applied_year=2024" / "applied_month=3" / "record_type=Building").is_dir()
+    table = read(dest)
+    rows = {r["permit_number"]: r for r in table.to_pylist()}
+    assert set(rows) == {"BD24-1", "BD24-2", "EL25-1", "XX-1"}
+    assert rows["BD24-1"]["inspections"][0]["inspection_type"] == "Footing"
+    assert rows["BD24-2"]["inspections"] == []
+    # Row-group statistics are present for predicate pushdown
+    fragment = next(iter(ds.dataset(str(dest), format="parquet", partitioning="hive").get_fragments()))
+    assert fragment.metadata.row_group(0).column(0).statistics is not None
+
+
+def test_repeated_full_exports_replace_earlier_files(db, tmp_path):
+    dest = tmp_path / "out"
+    export_permits(db, str(dest))
+    export_permits(db, str(dest))
+    numbers = [r["permit_number"] for r in read(dest).to_pylist()]
+    assert sorted(numbers) == ["BD24-1", "BD24-2", "EL25-1", "XX-1"]
+
+
+def test_incremental_export_only_writes_rows_past_watermark(db, tmp_path, monkeypatch):
+    monkeypatch.setattr("scraper.database.export.SAFETY_LAG", timedelta(0))
+    dest = tmp_path / "out"
+    assert export_permits(db, str(dest), incremental=True)["rows"] == 4
+    assert export_permits(db, str(dest), incremental=True)["rows"] == 0
+    with db.engine.begin() as conn:
+        conn.execute(update(Permit).where(Permit.permit_number == "EL25-1")
+                     .values(status="Issued", updated_at=datetime.utcnow()))
+    assert export_permits(db, str(dest), incremental=True)["rows"] == 1
+    statuses = [r["status"] for r in read(dest).to_pylist() if r["permit_number"] == "EL25-1"]
+    assert sorted(statuses) == ["Applied", "Issued"]
+
+
+def test_incremental_export_waits_out_the_safety_lag(db, tmp_path, monkeypatch):
+    dest = tmp_path / "out"
+    # Everything was just written: a slower batch stamped earlier could still be committing
+    assert export_permits(db, str(dest), incremental=True)["rows"] == 0
+    monkeypatch.setattr("scraper.database.export.SAFETY_LAG", timedelta(0))
+    assert export_permits(db, str(dest), incremental=True)["rows"] == 4
+
+
+def test_incremental_export_picks_up_child_only_changes(db, tmp_path, monkeypatch):
+    monkeypatch.setattr("scraper.database.export.SAFETY_LAG", timedelta(0))
+    dest = tmp_path / "out"
+    export_permits(db, str(dest), include=["inspections"], incremental=True)
+    stats = db.upsert_permits([{
+        "permit_number": "BD24-1", "status": "Issued",
+        "inspections": [{"inspection_type": "Framing", "status": "Passed", "outcome": "passed"}],
+    }])
+    assert stats["children_replaced"] == 1 and stats["field_changes"] == 0
+    assert export_permits(db, str(dest), include=["inspections"], incremental=True)["rows"] == 1
+    versions = [[i["inspection_type"] for i in r["inspections"]]
+                for r in read(dest).to_pylist() if r["permit_number"] == "BD24-1"]
+    assert sorted(versions) == [["Footing"], ["Framing"]]
@@ -0,0 +1,72 @@
+import random
+import time
+
+import pytest
+
+from scraper.database.spatial import haversine_miles
+from scraper.geocoding import AddressIndex, fill_missing_coordinates, normalize_street
+
+POINTS_CSV = """ADDRESS_NUMBER,STREET_NAME,ZIP,LAT,LON
+100,N Las Vegas Boulevard,89101,36.1700,-115.1400
+104,N Las Vegas Boulevard,89101,36.1702,-115.1400
+100,N Las Vegas Boulevard,89030,36.2000,-115.1200
+500,E Charleston Blvd,89104,36.1590,-115.1460
+bad,E Charleston Blvd,89104,36.1,-115.1
+"""
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / 'points.csv'
+    path.write_text(POINTS_CSV)
+    return AddressIndex.from_csv(str(path))
+
+
+def test_normalize_street():
+    assert normalize_street('North Las Vegas Boulevard') == 'N LAS VEGAS BLVD'
+    assert normalize_street('e. charleston blvd.') == 'E CHARLESTON BLVD'
+
+
+def test_lookup_exact_nearest_and_zip(index):
+    assert len(index) == 4
+    parsed = {'street_number': '100', 'street_direction': 'N', 'street_name': 'Las Vegas',
+              'street_type': 'Blvd', 'zip': '89030'}
+    result = index.geocode(parsed)
+    assert (result.latitude, result.precision) == (36.2, 'exact')
+    nearest = index.geocode_text('102 N. Las Vegas Blvd, Las Vegas, NV 89101')
+    assert nearest.precision == 'nearest' and nearest.latitude in (36.17, 36.1702)
+    assert index.geocode_text('9000 E Charleston Blvd') is None
+    assert index.geocode_text('PO Box 12') is None
+
+
+def test_fill_and_radius_query(db_manager, index):
+    db_manager.upsert_permits([
+        {'permit_number': 'BD25-1', 'address': '100 N Las Vegas Blvd, Las Vegas, NV 89101'},
+        {'permit_number': 'BD25-2', 'address': '500 East Charleston Boulevard, Las Vegas'},
+        {'permit_number': 'BD25-3', 'address': '1 Nowhere Rd'},
+    ])
+    assert fill_missing_coordinates(db_manager, index) == {'geocoded': 2, 'unmatched': 1}
+    near = db_manager.permits_within(36.1700, -115.1400, 0.5)
+    assert [p['permit_number'] for p in near] == ['BD25-1']
+    both = db_manager.permits_within(36.1700, -115.1400, 2)
+    assert [p['permit_number'] for p in both] == ['BD25-1', 'BD25-2']
+    # Moving a permit moves its R*Tree entry
+    db_manager.upsert_permits([{'permit_number': 'BD25-2', 'latitude': 36.5, 'longitude': -115.0}])
+    assert [p['permit_number'] for p in db_manager.permits_within(36.17, -115.14, 2)] == ['BD25-1']
+
+
+def test_radius_query_matches_brute_force(db_manager):
+    rng = random.Random(7)
+    rows = [
+        {'permit_number': f'BD{i:06d}', 'latitude': 36.0 + rng.random() * 0.4,
+         'longitude': -115.35 + rng.random() * 0.4}
+        for i in range(5000)
+    ]
+    db_manager.upsert_permits(rows)
+    start = time.perf_counter()
+    found = db_manager.permits_within(36.17, -115.14, 1.0)
+    elapsed = time.perf_counter() - start
+    expected = {r['permit_number'] for r in rows
+                if haversine_miles(36.17, -115.14, r['latitude'], r['longitude']) <= 1.0}
+    assert {p['permit_number'] for p in found} == expected
+    assert elapsed < 0.5
@@ -0,0 +1,73 @@
+import random
+
+from scraper.database.graph import UnionFind, cluster_id_for, rebuild_clusters
+from scraper.database.unified_schema import PermitCluster, PermitRelation
+
+
+def _cluster(db_manager, number):
+    return [p['permit_number'] for p in db_manager.project_cluster(number)]
+
+
+def test_related_links_and_parcels_form_clusters(db_manager):
+    db_manager.upsert_permits([
+        {'permit_number': 'BD-1', 'parcel_number': '123-45', 'related_permits': ['EL-1']},
+        {'permit_number': 'BD-2', 'parcel_number': '123-45'},
+        {'permit_number': 'PL-9', 'parcel_number': '999-99'},
+    ])
+    # EL-1 is linked but not scraped yet; it is still part of the cluster
+    assert _cluster(db_manager, 'BD-2') == ['BD-1', 'BD-2', 'EL-1']
+    assert _cluster(db_manager, 'PL-9') == ['PL-9']
+    stats = db_manager.upsert_permits([
+        {'permit_number': 'EL-1', 'parcel_number': '123-45', 'status': 'Issued'},
+        {'permit_number': 'PL-9', 'related_permits': ['EL-1']},
+    ])
+    assert stats['relations_added'] == 1 and stats['cluster_merges'] == 1
+    members = db_manager.project_cluster('BD-1')
+    assert [p['permit_number'] for p in members] == ['BD-1', 'BD-2', 'EL-1', 'PL-9']
+    assert {p['permit_number']: p['status'] for p in members}['EL-1'] == 'Issued'
+
+
+def test_unlinked_permit_is_its_own_cluster(db_manager):
+    db_manager.upsert_permits([{'permit_number': 'BD-1'}])
+    assert _cluster(db_manager, 'BD-1') == ['BD-1']
+    assert db_manager.project_cluster('missing') == []
+
+
+def test_relations_are_stored_once_and_indexed_both_ways(db_manager):
+    for _ in range(2):
+        db_manager.upsert_permits([{'permit_number': 'BD-1', 'related_permits': ['EL-1', 'BD-1']}])
+    session = db_manager.SessionLocal()
+    assert [(r.permit_number, r.related_number) for r in session.query(PermitRelation)] == [('BD-1', 'EL-1')]
+    assert session.query(PermitRelation).filter_by(related_number='EL-1').count() == 1
+    session.close()
+
+
+def test_incremental_clusters_match_rebuild(db_manager):
+    rng = random.Random(3)
+    for batch in range(10):
+        db_manager.upsert_permits([
+            {'permit_number': f'P{batch}-{i}', 'parcel_number': f'{rng.randrange(40)}',
+             'related_permits': [f'P{rng.randrange(10)}-{rng.randrange(30)}']}
+            for i in range(30)
+        ])
+
+    def partition():
+        session = db_manager.SessionLocal()
+        groups = {}
+        for row in session.query(PermitCluster):
+            groups.setdefault(row.cluster_id, set()).add(row.node)
+        session.close()
+        return sorted(sorted(g) for g in groups.values())
+
+    incremental = partition()
+    rebuild_clusters(db_manager.engine)
+    assert partition() == incremental
+    assert cluster_id_for(db_manager.engine, 'P0-0') is not None
+
+
+def test_union_find_keeps_larger_root():
+    uf = UnionFind()
+    uf.add('big', 10)
+    uf.add('small', 1)
+    assert uf.union('small', 'big') == 'big'
+    assert uf.find('small') == 'big'
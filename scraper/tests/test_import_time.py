@@ -0,0 +1,60 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+# Cumulative import time allowed per entry point, in microseconds, as reported by -X importtime.
+# Generous: SQLAlchemy alone takes a few hundred ms; the heavy modules below would add seconds.
+IMPORT_BUDGET_US = 2_000_000
+
+# Modules the parsing/storage entry points must leave for the code paths that need them
+HEAVY_MODULES = (
+    'selenium', 'boto3', 'botocore', 'great_expectations', 'usaddress', 'watchtower',
+    'pyarrow', 'sqlalchemy.dialects.postgresql',
+)
+
+_PROBE = 'import json, sys\nimport {module}\nprint(json.dumps(sorted(sys.modules)))\n'
+
+
+def _cumulative_us(importtime_report, module):
+    """Cumulative microseconds for ``module`` from ``-X importtime`` output ("import time: self | cumulative | name")"""
+    for line in importtime_report.splitlines():
+        fields = [field.strip() for field in line.split('|')]
+        if len(fields) == 3 and fields[2] == module:
+            return int(fields[1])
+    raise AssertionError(f'{module} missing from -X importtime output')
+
+
+def _import(module, cwd):
+    """Import ``module`` in a fresh interpreter; returns (loaded module names, cumulative import time in us)"""
+    env = dict(os.environ, PYTHONPATH=str(REPO_ROOT))
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROBE.format(module=module)],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1]), _cumulative_us(proc.stderr, module)
+
+
+def _is_heavy(name):
+    return any(name == heavy or name.startswith(heavy + '.') for heavy in HEAVY_MODULES)
+
+
+@pytest.mark.parametrize('module', [
+    'scraper.enhanced_detail_scraper_final',
+    'scraper.database.manager',
+])
+def test_entry_point_does_not_load_heavy_dependencies(module, tmp_path):
+    modules, elapsed = _import(module, tmp_path)
+    assert [name for name in modules if _is_heavy(name)] == []
+    assert elapsed < IMPORT_BUDGET_US, f'import {module} took {elapsed / 1000:.0f}ms'
+
+
+def test_import_registers_no_log_sinks(tmp_path):
+    _import('scraper.enhanced_detail_scraper_final', tmp_path)
+    assert not (tmp_path / 'scraper_debug.log').exists()
+    assert not (tmp_path / 'scraper_errors.log').exists()
@@ -0,0 +1,71 @@
+import json
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from scraper.database.manager import DatabaseManager
+from scraper.database.unified_schema import Base, ScrapeRun
+from scraper.enhanced_detail_scraper_final import EnhancedDetailScraper, PermitDetails
+from scraper.instrumentation import Histogram, StageTimer
+
+
+@pytest.fixture(autouse=True)
+def set_env_vars(monkeypatch):
+    monkeypatch.setenv('CLARK_COUNTY_USERNAME', 'testuser')
+    monkeypatch.setenv('CLARK_COUNTY_PASSWORD', 'testpass')
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 5.0):
+        histogram.observe(value)
+    snap = histogram.snapshot()
+    assert snap['count'] == 4
+    assert snap['buckets'] == {'0.1': 1, '1.0': 2, '+Inf': 1}
+    assert snap['p50'] == 1.0
+    assert snap['max'] == 5.0
+
+
+def test_stage_timer_span_and_summary():
+    timer = StageTimer()
+    with timer.span('navigation'):
+        pass
+    timer.observe('db_write', 0.2)
+    timer.observe('db_write', 0.4)
+    snapshot = timer.snapshot()
+    assert snapshot['navigation']['count'] == 1
+    assert snapshot['db_write']['count'] == 2
+    assert snapshot['db_write']['total'] == pytest.approx(0.6)
+    table = timer.summary_table()
+    # Slowest stage is listed first
+    assert table.splitlines()[2].startswith('db_write')
+    summary = json.loads(timer.to_json())
+    assert 'buckets' not in summary['db_write']
+
+
+def test_scrape_permit_records_stages():
+    timer = StageTimer()
+    scraper = EnhancedDetailScraper(headless=True, timer=timer)
+    scraper.extract_permit_details = MagicMock(
+        return_value=PermitDetails(permit_number='TEST123')
+    )
+    scraper.save_to_database = MagicMock()
+    scraper.emit_metric = MagicMock()
+    scraper.scrape_permit('TEST123')
+    snapshot = timer.snapshot()
+    assert snapshot['db_write']['count'] == 1
+    assert snapshot['scrape_total']['count'] == 1
+
+
+def test_record_scrape_run_persists_stage_timings():
+    manager = DatabaseManager('sqlite:///:memory:')
+    Base.metadata.create_all(manager.engine)
+    timer = StageTimer()
+    timer.observe('label_parsing', 0.3)
+    manager.record_scrape_run('run-1', 'EnhancedDetailScraper', datetime.utcnow(), timer,
+                              permits_processed=1)
+    session = manager.SessionLocal()
+    run = session.query(ScrapeRun).filter_by(run_id='run-1').one()
+    assert json.loads(run.stage_timings)['label_parsing']['count'] == 1
+    session.close()
@@ -0,0 +1,83 @@
+import json
+import os
+
+from scraper.layout import PlanCache, apply_plan, match_label, structure_hash
+
+PAGE = [
+    ["Permit Type:", "Building"],
+    ["Status:", "Issued"],
+    ["Work Description:", "New roof"],
+    ["Lot Size:", "0.25 ac"],
+    ["Lot:", "12"],
+    ["Contractor License:", "A-123"],
+    ["Contractor:", "ACME BUILDERS"],
+    ["Inspection Status:", "Passed"],
+    ["Mailing Address:", "PO Box 1"],
+    ["Notes:", None],
+]
+
+
+def test_match_label_preserves_rule_order():
+    assert match_label("Work Description") == "work_description"
+    assert match_label("Description") == "description"
+    assert match_label("Lot Size") == "lot_size"
+    assert match_label("Lot") == "lot"
+    assert match_label("Contractor License #") == "contractor_license"
+    assert match_label("Inspection Status") is None
+    assert match_label("Mailing Address") is None
+    assert match_label("Number of Stories") == "stories"
+
+
+def test_structure_hash_ignores_order_and_blanks():
+    assert structure_hash(["B", "A", ""]) == structure_hash([" A ", "B"])
+    assert structure_hash(["A"]) != structure_hash(["A", "B"])
+
+
+def test_plan_cache_compiles_once_and_applies():
+    cache = PlanCache()
+    labels = [label for label, _ in PAGE]
+    key = structure_hash(labels)
+    plan, new = cache.plan_for(key, labels)
+    assert new
+    again, new = cache.plan_for(key, labels)
+    assert again is plan and not new
+    assert dict(apply_plan(plan, PAGE)) == {
+        "permit_type": "Building",
+        "status": "Issued",
+        "work_description": "New roof",
+        "lot_size": "0.25 ac",
+        "lot": "12",
+        "contractor_license": "A-123",
+        "contractor_name": "ACME BUILDERS",
+    }
+
+
+def test_plan_cache_persists(tmp_path):
+    path = str(tmp_path / "plans.json")
+    labels = [label for label, _ in PAGE]
+    key = structure_hash(labels)
+    PlanCache(path).plan_for(key, labels)
+    assert json.load(open(path))["plans"][key]["fields"]["status:"] == "status"
+    reloaded = PlanCache(path)
+    assert key in reloaded
+    _, new = reloaded.plan_for(key, labels)
+    assert not new
+
+
+def test_plan_cache_discards_plans_from_other_rules(tmp_path, monkeypatch):
+    path = str(tmp_path / "plans.json")
+    labels = [label for label, _ in PAGE]
+    key = structure_hash(labels)
+    PlanCache(path).plan_for(key, labels)
+    monkeypatch.setattr("scraper.layout.RULES_HASH", "changed-rules")
+    assert key not in PlanCache(path)
+
+
+def test_plan_cache_merges_plans_saved_by_other_workers(tmp_path):
+    path = str(tmp_path / "plans.json")
+    first, second = PlanCache(path), PlanCache(path)
+    first.plan_for("layout-a", ["Status:"])
+    second.plan_for("layout-b", ["Permit Type:"])
+    merged = PlanCache(path)
+    assert "layout-a" in merged and "layout-b" in merged
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
@@ -0,0 +1,69 @@
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+
+from scraper.instrumentation import MetricsRegistry, StageTimer
+from scraper.metrics_server import health, register_route, start_metrics_server
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def server_url():
+    server = start_metrics_server(port=_free_port(), host='127.0.0.1')
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    counter = registry.counter('permits_total', 'Permits', ('result',))
+    counter.inc(result='success')
+    counter.inc(2, result='failure')
+    gauge = registry.gauge('queue_depth', 'Queue depth', ('queue',))
+    gauge.set(7, queue='writer')
+    timer = registry.register_timer('stage_seconds', 'Stages', StageTimer(buckets=(0.1, 1.0)))
+    timer.observe('db_write', 0.5)
+    text = registry.render()
+    assert '# TYPE permits_total counter' in text
+    assert 'permits_total{result="failure"} 2' in text
+    assert 'queue_depth{queue="writer"} 7' in text
+    assert 'stage_seconds_bucket{le="0.1",stage="db_write"} 0' in text
+    assert 'stage_seconds_bucket{le="1.0",stage="db_write"} 1' in text
+    assert 'stage_seconds_bucket{le="+Inf",stage="db_write"} 1' in text
+    assert 'stage_seconds_count{stage="db_write"} 1' in text
+
+
+def test_counter_rejects_wrong_labels():
+    registry = MetricsRegistry()
+    counter = registry.counter('c', 'c', ('result',))
+    with pytest.raises(ValueError):
+        counter.inc(reason='x')
+
+
+def test_metrics_and_health_endpoints(server_url):
+    with urllib.request.urlopen(f"{server_url}/metrics") as response:
+        assert response.status == 200
+        assert b'scraper_stage_duration_seconds' in response.read()
+    with urllib.request.urlopen(f"{server_url}/healthz") as response:
+        assert response.status == 200
+    health.set_ready(False, 'warming up')
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        urllib.request.urlopen(f"{server_url}/readyz")
+    assert excinfo.value.code == 503
+    health.set_ready(True)
+    with urllib.request.urlopen(f"{server_url}/readyz") as response:
+        assert response.status == 200
+
+
+def test_streamed_route(server_url):
+    register_route('/stream-test', lambda query: (200, 'application/x-ndjson', iter([b'1\n', b'2\n'])))
+    with urllib.request.urlopen(f"{server_url}/stream-test") as response:
+        assert response.read() == b'1\n2\n'
@@ -0,0 +1,74 @@
+import json
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from scraper.database.migrate import LegacyMigrator
+from scraper.database.unified_schema import Fee, MigrationCheckpoint, Permit
+
+
+@pytest.fixture
+def automated_db(tmp_path):
+    path = tmp_path / 'automated_permits.db'
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE permits (permit_number TEXT, status TEXT, type TEXT, valuation TEXT,
+                              project_address TEXT, applied_date TEXT, dwelling_units INTEGER)
+    """)
+    conn.executemany(
+        "INSERT INTO permits VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [(f'BD25-{i}', 'Open', 'Building', f'${i},000.00', f'{i} Main St', '01/02/2025', 1)
+         for i in range(1, 8)],
+    )
+    conn.commit()
+    conn.close()
+    return str(path)
+
+
+def test_automated_store_columns_are_renamed_and_coerced(db_manager, automated_db):
+    totals = LegacyMigrator(db_manager, 'automated', automated_db, chunk_size=3).run()
+    assert totals['inserted'] == 7
+    session = db_manager.SessionLocal()
+    permit = session.query(Permit).filter_by(permit_number='BD25-2').one()
+    assert permit.record_type == 'Building'
+    assert permit.job_value == 2000.0
+    assert permit.address == '2 Main St'
+    assert permit.applied_date == datetime(2025, 1, 2)
+    checkpoint = session.query(MigrationCheckpoint).one()
+    assert (checkpoint.last_rowid, checkpoint.rows_migrated) == (7, 7)
+    session.close()
+
+
+def test_migration_resumes_after_checkpoint(db_manager, automated_db):
+    migrator = LegacyMigrator(db_manager, 'automated', automated_db, chunk_size=3)
+    migrator._save_checkpoint(3, 3)
+    totals = migrator.run()
+    assert totals['inserted'] == 4
+    # A rerun with nothing new after the checkpoint is a no-op
+    assert LegacyMigrator(db_manager, 'automated', automated_db).run() == {}
+    migrator.reset()
+    totals = migrator.run()
+    assert totals['inserted'] == 3 and totals['unchanged'] == 4
+
+
+def test_enhanced_store_carries_itemized_fees(db_manager, tmp_path):
+    path = tmp_path / 'permits.db'
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        CREATE TABLE permit_details_enhanced (permit_number TEXT, permit_type TEXT, job_value REAL,
+                                              final_date TEXT, itemized_fees TEXT, extraction_errors TEXT)
+    """)
+    fees = [{'description': 'Plan Check', 'amount': 100.0, 'status': 'Paid'}]
+    conn.execute("INSERT INTO permit_details_enhanced VALUES (?, ?, ?, ?, ?, ?)",
+                 ('BD25-1', 'Electrical', 500.0, '2025-03-01', json.dumps(fees), '[]'))
+    conn.commit()
+    conn.close()
+
+    LegacyMigrator(db_manager, 'enhanced', str(path)).run()
+    session = db_manager.SessionLocal()
+    permit = session.query(Permit).filter_by(permit_number='BD25-1').one()
+    assert permit.record_type == 'Electrical'
+    assert permit.finaled_date == datetime(2025, 3, 1)
+    assert [(f.fee_type, f.amount) for f in session.query(Fee).all()] == [('Plan Check', 100.0)]
+    session.close()
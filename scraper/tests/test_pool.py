@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool, QueuePool
+
+from scraper.database.pool import instrument_pool, pool_profile
+from scraper.instrumentation import DB_CHECKOUT_WAIT, DB_CONNECTIONS
+
+
+def test_profile_follows_concurrency(monkeypatch):
+    monkeypatch.delenv('DB_POOL_PROFILE', raising=False)
+    monkeypatch.delenv('DB_CONCURRENCY', raising=False)
+    assert pool_profile().name == 'single'
+    assert pool_profile().max_connections == 2
+    threaded = pool_profile(8)
+    assert (threaded.name, threaded.pool_size, threaded.max_overflow) == ('threaded', 8, 4)
+    monkeypatch.setenv('DB_POOL_PROFILE', 'pgbouncer')
+    bouncer = pool_profile(8)
+    assert bouncer.max_connections is None
+    assert issubclass(bouncer.engine_kwargs('postgresql+psycopg://u:p@h/db')['poolclass'], NullPool)
+    assert bouncer.engine_kwargs('postgresql+psycopg://u:p@h/db')['connect_args'] == {'prepare_threshold': None}
+    with pytest.raises(ValueError):
+        pool_profile(name='huge')
+
+
+def test_checkouts_are_timed_and_counted(tmp_path):
+    profile = pool_profile(2, name='threaded')
+    kwargs = profile.engine_kwargs('sqlite:///unused')
+    assert issubclass(kwargs['poolclass'], QueuePool) and kwargs['pool_pre_ping']
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", **kwargs)
+    instrument_pool(engine)
+
+    def checkouts():
+        return DB_CHECKOUT_WAIT.snapshot().get('threaded', {}).get('count', 0)
+
+    before, in_use, opened = checkouts(), DB_CONNECTIONS.value(state='in_use'), DB_CONNECTIONS.value(state='open')
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+        assert DB_CONNECTIONS.value(state='in_use') == in_use + 1
+    assert DB_CONNECTIONS.value(state='in_use') == in_use
+    assert DB_CONNECTIONS.value(state='open') == opened + 1
+    # dispose() recreates the pool; it must stay instrumented
+    engine.dispose()
+    assert DB_CONNECTIONS.value(state='open') == opened
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+    assert checkouts() == before + 2
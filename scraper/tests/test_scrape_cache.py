@@ -0,0 +1,104 @@
+import dataclasses
+import json
+import threading
+import time
+
+import pytest
+
+from scraper.enhanced_detail_scraper_final import PermitDetails
+from scraper.instrumentation import CACHE_REQUESTS
+from scraper.scrape_cache import SQLiteBackend, ScrapeCache, parse_ttls, schema_tag
+
+
+def count(result):
+    return CACHE_REQUESTS.value(cache="scrape", result=result)
+
+
+def test_hit_returns_copy_and_skips_fetch():
+    cache = ScrapeCache(PermitDetails)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return PermitDetails(permit_number="BD-1", status="Issued", related_permits=["BD-2"])
+
+    hits = count("hit")
+    first = cache.get_or_fetch("BD-1", fetch)
+    first.related_permits.append("mutated")
+    second = cache.get_or_fetch("BD-1", fetch)
+    assert calls == [1]
+    assert second.related_permits == ["BD-2"]
+    assert count("hit") == hits + 1
+
+
+def test_failures_and_zero_ttl_statuses_are_not_cached():
+    cache = ScrapeCache(PermitDetails, ttls={"applied": 0})
+    failed = PermitDetails(permit_number="BD-1", extraction_errors=["Login failed"])
+    cache.get_or_fetch("BD-1", lambda: failed)
+    cache.get_or_fetch("BD-2", lambda: PermitDetails(permit_number="BD-2", status="Applied"))
+    assert len(cache) == 0
+
+
+def test_ttl_depends_on_status():
+    cache = ScrapeCache(PermitDetails, ttls=parse_ttls("issued=10, default=5"))
+    assert cache.ttl_for(PermitDetails(permit_number="x", status="Issued")) == 10
+    assert cache.ttl_for(PermitDetails(permit_number="x", status="Finaled")) == 86400
+    assert cache.ttl_for(PermitDetails(permit_number="x", status="Plan Review")) == 5
+    with pytest.raises(ValueError):
+        parse_ttls("issued")
+
+
+def test_concurrent_requests_share_one_fetch():
+    cache = ScrapeCache(PermitDetails)
+    started = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return PermitDetails(permit_number="BD-9", status="Issued")
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_fetch("BD-9", fetch)))
+               for _ in range(5)]
+    threads[0].start()
+    started.wait(1)
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join(2)
+    assert calls == [1]
+    assert [r.permit_number for r in results] == ["BD-9"] * 5
+
+
+def test_shared_sqlite_backend_serves_other_processes(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = ScrapeCache(PermitDetails, backend=SQLiteBackend(path))
+    writer.get_or_fetch("BD-3", lambda: PermitDetails(permit_number="BD-3", status="Finaled", job_value=12.5))
+    reader = ScrapeCache(PermitDetails, backend=SQLiteBackend(path))
+    result = reader.get_or_fetch("BD-3", lambda: pytest.fail("should come from the shared backend"))
+    assert result.job_value == 12.5 and result.status == "Finaled"
+
+
+def test_unreadable_shared_entry_is_a_miss_and_is_dropped(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.db"))
+    cache = ScrapeCache(PermitDetails, backend=backend)
+    key = f"{schema_tag(PermitDetails)}:BD-4"
+    backend.set(key, '{"permit_number": "BD-4", "field_from_elsewhere": 1}', 60)
+    result = cache.get_or_fetch("BD-4", lambda: PermitDetails(permit_number="BD-4", status="Issued"))
+    assert result.status == "Issued"
+    # The fresh result replaced the bad entry
+    assert json.loads(backend.get(key)[1])["status"] == "Issued"
+
+
+def test_shared_entries_are_keyed_by_result_schema(tmp_path):
+    @dataclasses.dataclass
+    class OldDetails:
+        permit_number: str = ""
+
+    path = str(tmp_path / "cache.db")
+    ScrapeCache(OldDetails, backend=SQLiteBackend(path)).get_or_fetch("BD-5", lambda: OldDetails("BD-5"))
+    reader = ScrapeCache(PermitDetails, backend=SQLiteBackend(path))
+    result = reader.get_or_fetch("BD-5", lambda: PermitDetails(permit_number="BD-5", status="Issued"))
+    assert result.status == "Issued"
@@ -1,7 +1,7 @@
 import pytest
 from unittest.mock import MagicMock, patch
 from scraper.enhanced_detail_scraper_final import (
-    EnhancedDetailScraper, PermitDetails
+    EnhancedDetailScraper, PermitDetails, parse_inspection_rows
 )
 
 
@@ -94,4 +94,99 @@ def test_scrape_permit_smoke(monkeypatch):
     )
     scraper.save_to_database = MagicMock()
     result = scraper.scrape_permit('TEST123')
-    assert result.permit_number == 'TEST123' 
\ No newline at end of file
+    assert result.permit_number == 'TEST123' 
+
+def test_parse_inspection_rows_counts_per_row():
+    scraper = EnhancedDetailScraper(headless=True)
+    header = ['Inspection Type', 'Scheduled Date', 'Result', 'Result Date', 'Inspector']
+    rows = [
+        ['Footing', '01/02/2025', 'Passed', '01/03/2025', 'J. Smith'],
+        ['Framing', '02/02/2025', 'Failed - Pass on recheck required', '02/03/2025', 'J. Smith'],
+        ['Final', '03/02/2025', 'Scheduled', '', ''],
+    ]
+    details = PermitDetails(permit_number='TEST123')
+    details.inspections = parse_inspection_rows(header, rows)
+    scraper.summarize_inspections(details)
+    assert details.inspections[0]['completed_date'] == '01/03/2025'
+    assert details.inspections[0]['inspector_name'] == 'J. Smith'
+    assert [i['outcome'] for i in details.inspections] == ['passed', 'failed', 'pending']
+    assert (details.inspections_count, details.passed_inspections,
+            details.failed_inspections, details.pending_inspections) == (3, 1, 1, 1)
+
+
+def test_parse_fee_rows():
+    scraper = EnhancedDetailScraper(headless=True)
+    fees = scraper.parse_fee_rows([
+        ['Plan Check', '$1,250.00', 'Paid', '01/05/2025'],
+        ['Bad Row', 'n/a', 'Due'],
+        ['Short'],
+    ])
+    assert fees == [{'description': 'Plan Check', 'amount': 1250.0, 'status': 'Paid',
+                     'paid_date': '01/05/2025'}]
+
+
+def test_parse_labels_uses_layout_plan():
+    scraper = EnhancedDetailScraper(headless=True)
+    scraper.emit_metric = MagicMock()
+    pairs = [["Job Value:", "$12,500.00"], ["Stories:", "2"], ["Parcel #:", "123-45-678-901"]]
+    details = PermitDetails(permit_number="BD-2024-1")
+    scraper.parse_labels(details, pairs)
+    assert details.job_value == 12500.0
+    assert details.stories == 2
+    assert details.parcel_number == "123-45-678-901"
+    assert details.page_structure_hash == scraper.get_page_structure_hash(pairs)
+    scraper.emit_metric.assert_not_called()
+
+    # A second, different layout is drift and raises the alert metric
+    scraper.parse_labels(PermitDetails(permit_number="BD-2024-2"), pairs[:2])
+    assert scraper.emit_metric.call_args[0][0] == "PageLayoutChanged"
+
+
+def test_extract_permit_details_uses_one_page_script_call():
+    scraper = EnhancedDetailScraper(headless=True)
+    scraper.emit_metric = MagicMock()
+    scraper.driver = MagicMock()
+    scraper.driver.current_url = "https://example.test/CapDetail.aspx?PermitNumber=BD-2024-7"
+    scraper.driver.execute_script.return_value = {
+        "labels": [["Permit Type:", "Building"], ["Job Value:", "$1,000.00"], ["Notes:", None]],
+        "fee_rows": [["Plan Check", "$250.00", "Paid", "01/02/2024"], ["Header only"]],
+        "inspection_header": ["Type", "Status", "Date"],
+        "inspection_rows": [["Footing", "Passed", "01/05/2024"]],
+        "related": ["BD-2024-8", "BD-2024-8", "Not a permit"],
+        "table_pairs": [],
+    }
+    with patch('scraper.enhanced_detail_scraper_final.time.sleep'):
+        details = scraper.extract_permit_details(
+            "https://example.test/CapDetail.aspx?PermitNumber=BD-2024-7"
+        )
+    assert scraper.driver.execute_script.call_count == 1
+    scraper.driver.find_elements.assert_not_called()
+    assert details.permit_type == "Building"
+    assert details.job_value == 1000.0
+    assert [fee['amount'] for fee in details.itemized_fees] == [250.0]
+    assert details.related_permits == ["BD-2024-8"]
+    assert details.inspections_count == 1
+
+
+def test_scrape_permit_uses_result_cache():
+    from scraper.scrape_cache import ScrapeCache
+
+    scraper = EnhancedDetailScraper(headless=True, result_cache=ScrapeCache(PermitDetails))
+    scraper.emit_metric = MagicMock()
+    scraper.save_to_database = MagicMock()
+    scraper.extract_permit_details = MagicMock(
+        return_value=PermitDetails(permit_number="BD-2024-5", status="Issued")
+    )
+    url = "https://example.test/CapDetail.aspx?PermitNumber=BD-2024-5"
+    assert scraper.scrape_permit(url).status == "Issued"
+    assert scraper.scrape_permit("BD-2024-5").status == "Issued"
+    assert scraper.extract_permit_details.call_count == 1
+    assert scraper.save_to_database.call_count == 1
+
+
+def test_save_with_background_writer_queues_instead_of_committing():
+    db_manager, writer = MagicMock(), MagicMock()
+    scraper = EnhancedDetailScraper(headless=True, db_manager=db_manager, writer=writer)
+    scraper.save_to_database(PermitDetails(permit_number="BD-2024-6", status="Issued"))
+    db_manager.upsert_permits.assert_not_called()
+    assert writer.submit.call_args[0][0]["permit_number"] == "BD-2024-6"
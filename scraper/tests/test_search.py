@@ -0,0 +1,35 @@
+from scraper.benchmarks.search_vs_like import run as run_benchmark
+
+
+def _numbers(results):
+    return [r['permit_number'] for r in results]
+
+
+def test_search_ranks_project_name_above_description(db_manager):
+    db_manager.upsert_permits([
+        {'permit_number': 'BD25-1', 'description': 'Reroof; remove solar panels temporarily'},
+        {'permit_number': 'BD25-2', 'project_name': 'Smith residence solar', 'description': 'PV install'},
+        {'permit_number': 'BD25-3', 'description': 'In-ground pool and spa'},
+    ])
+    assert _numbers(db_manager.search_permits('solar')) == ['BD25-2', 'BD25-1']
+    assert _numbers(db_manager.search_permits('pools')) == ['BD25-3']
+    # Punctuation and FTS operators in user input are treated as plain words
+    assert _numbers(db_manager.search_permits('"pool" AND (spa')) == ['BD25-3']
+    assert db_manager.search_permits('  ') == []
+
+
+def test_index_follows_upserts(db_manager):
+    db_manager.upsert_permits([{'permit_number': 'BD25-1', 'description': 'Block wall'}])
+    assert _numbers(db_manager.search_permits('wall')) == ['BD25-1']
+    db_manager.upsert_permits([{'permit_number': 'BD25-1', 'description': 'Patio cover'}])
+    assert db_manager.search_permits('wall') == []
+    assert _numbers(db_manager.search_permits('patio cover')) == ['BD25-1']
+    # Updates that do not touch indexed columns leave the index alone
+    db_manager.upsert_permits([{'permit_number': 'BD25-1', 'status': 'Issued'}])
+    assert _numbers(db_manager.search_permits('patio')) == ['BD25-1']
+
+
+def test_benchmark_smoke(capsys):
+    results = run_benchmark(rows=2000)
+    assert all(r['fts_matches'] > 0 for r in results)
+    assert 'speedup' in capsys.readouterr().out
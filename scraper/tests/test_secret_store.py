@@ -0,0 +1,65 @@
+import os
+
+from scraper.secret_store import SecretProvider
+
+
+class CountingFetcher:
+    def __init__(self):
+        self.calls = 0
+        self.password = "first"
+
+    def __call__(self, secret_name, region_name):
+        self.calls += 1
+        return {"username": "scraper", "password": self.password}
+
+
+def test_memory_tier_serves_repeat_reads():
+    fetcher = CountingFetcher()
+    provider = SecretProvider(ttl=60, fetcher=fetcher)
+    assert provider.get("db")["password"] == "first"
+    provider.get("db")["password"] = "mutated"
+    assert provider.get("db")["password"] == "first"
+    assert fetcher.calls == 1
+
+
+def test_disk_tier_is_shared_between_providers(tmp_path):
+    fetcher = CountingFetcher()
+    SecretProvider(ttl=60, cache_dir=str(tmp_path), fetcher=fetcher).get("db")
+    # A second worker process starts with an empty memory tier
+    assert SecretProvider(ttl=60, cache_dir=str(tmp_path), fetcher=fetcher).get("db")["password"] == "first"
+    assert fetcher.calls == 1
+    assert oct(os.stat(tmp_path / "db.json").st_mode & 0o777) == "0o600"
+
+
+def test_expired_and_refreshed_secrets_are_refetched(tmp_path):
+    fetcher = CountingFetcher()
+    provider = SecretProvider(ttl=60, cache_dir=str(tmp_path), fetcher=fetcher)
+    provider.get("db")
+    fetcher.password = "rotated"
+    assert provider.get("db", refresh=True)["password"] == "rotated"
+    # The refresh rewrote the disk tier too
+    assert SecretProvider(ttl=60, cache_dir=str(tmp_path), fetcher=fetcher).get("db")["password"] == "rotated"
+    assert fetcher.calls == 2
+
+    expiring = SecretProvider(ttl=0, fetcher=fetcher)
+    expiring.get("db")
+    expiring.get("db")
+    assert fetcher.calls == 4
+
+
+def test_disk_tier_refuses_shared_or_redirected_dirs(tmp_path):
+    fetcher = CountingFetcher()
+    open_dir = tmp_path / "open"
+    open_dir.mkdir(mode=0o777)
+    open_dir.chmod(0o777)
+    private = tmp_path / "private"
+    private.mkdir(mode=0o700)
+    link = tmp_path / "link"
+    link.symlink_to(private)
+    for cache_dir in (open_dir, link):
+        provider = SecretProvider(ttl=60, cache_dir=str(cache_dir), fetcher=fetcher)
+        assert provider.get("db")["password"] == "first"
+        assert provider.get("db")["password"] == "first"
+    # Both secrets stayed in memory only
+    assert list(open_dir.iterdir()) == [] and list(private.iterdir()) == []
+    assert fetcher.calls == 2
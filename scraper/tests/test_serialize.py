@@ -0,0 +1,58 @@
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from scraper.benchmarks.serialize_permits import legacy_to_dict
+from scraper.database import serialize
+from scraper.database.serialize import row_plan, rows_to_json, rows_to_ndjson
+from scraper.database.unified_schema import Base, Permit
+
+PERMITS = [
+    Permit(permit_number="BD-1", record_type="Building", status="Issued", job_value=1250.5,
+           applied_date=datetime(2024, 3, 1, 9, 30), completeness_score=87.5,
+           extraction_notes='["missing owner"]', number_of_units=0),
+    Permit(permit_number="BD-2", extraction_notes="not json"),
+    Permit(permit_number="BD-3"),
+]
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(PERMITS)
+        session.commit()
+    return engine
+
+
+def test_plan_matches_the_per_row_to_dict(engine):
+    plan = row_plan(Permit.__table__)
+    with Session(engine) as session:
+        permits = session.execute(select(Permit).order_by(Permit.id)).scalars().all()
+        expected = [legacy_to_dict(p) for p in permits]
+        assert [p.to_dict() for p in permits] == expected
+        # Key order is part of the serialized output
+        assert [list(p.to_dict()) for p in permits] == [list(d) for d in expected]
+    with engine.connect() as conn:
+        rows = conn.execute(select(*plan.columns).order_by(Permit.id)).all()
+    assert plan.dicts(rows) == expected
+    assert expected[0]["permit_type"] == "Building" and expected[0]["job_value"] == "1250.5"
+    assert expected[1]["extraction_notes"] == [] and expected[2]["completeness_score"] == 0.0
+
+
+@pytest.mark.parametrize("encoder", ["orjson", "json"])
+def test_bulk_encoders_produce_the_same_documents(engine, monkeypatch, encoder):
+    if encoder == "json":
+        monkeypatch.setattr(serialize, "orjson", None)
+    plan = row_plan(Permit.__table__)
+    with engine.connect() as conn:
+        rows = conn.execute(select(*plan.columns).order_by(Permit.id)).all()
+    expected = plan.dicts(rows)
+    assert json.loads(rows_to_json(rows, plan)) == expected
+    lines = rows_to_ndjson(rows, plan).split(b"\n")
+    assert lines[-1] == b""
+    assert [json.loads(line) for line in lines[:-1]] == expected
@@ -0,0 +1,115 @@
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from scraper.database.manager import DatabaseManager
+from scraper.database.spool import Spool, SpoolReplayer, read_records, replay
+from scraper.database.unified_schema import Permit
+from scraper.database.writer import BackgroundWriter
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'spool.db'}")
+    manager.create_tables()
+    return manager
+
+
+def row(number, status, scraped):
+    return {"permit_number": number, "status": status, "last_scraped": scraped,
+            "fees": [{"fee_type": "Plan check", "amount": 12.5, "paid_date": datetime(2024, 1, 3)}]}
+
+
+def stored_status(db_manager, number):
+    with db_manager.engine.connect() as conn:
+        return conn.execute(select(Permit.status).where(Permit.permit_number == number)).scalar()
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_records_round_trip_across_segments(tmp_path, compress):
+    spool = Spool(str(tmp_path / "spool"), segment_bytes=200, compress=compress)
+    rows = [row(f"BD-{i}", "Issued", datetime(2024, 5, 1, 12, i)) for i in range(10)]
+    for r in rows:
+        spool.append_many([r])
+    spool.close()
+    segments = spool.sealed_segments()
+    assert len(segments) > 1
+    assert [r for path in segments for r in read_records(path)] == rows
+
+
+def test_torn_tail_and_open_segments_survive_a_crash(tmp_path):
+    directory = tmp_path / "spool"
+    spool = Spool(str(directory))
+    spool.append_many([row("BD-1", "Issued", datetime(2024, 5, 1)), row("BD-2", "Issued", datetime(2024, 5, 1))])
+    # Simulate a crash mid-write: the open segment ends in half a record
+    path = spool._path
+    with open(path, "ab") as f:
+        f.write(b"\x00\x00\x01\x00garbage")
+    recovered = Spool(str(directory))
+    assert recovered.has_backlog()
+    assert [r["permit_number"] for r in read_records(recovered.sealed_segments()[0])] == ["BD-1", "BD-2"]
+
+
+def test_replay_is_idempotent_and_never_rolls_back(db_manager, tmp_path):
+    spool = Spool(str(tmp_path / "spool"))
+    spool.append_many([row("BD-1", "Issued", datetime(2024, 5, 1)), row("BD-2", "Issued", datetime(2024, 5, 1))])
+    # A newer scrape of BD-2 reached the database directly
+    db_manager.upsert_permits([row("BD-2", "Finaled", datetime(2024, 6, 1))])
+    assert replay(spool, db_manager) == {"replayed": 1, "skipped": 1, "segments": 1}
+    assert stored_status(db_manager, "BD-1") == "Issued"
+    assert stored_status(db_manager, "BD-2") == "Finaled"
+    assert not spool.has_backlog()
+
+    # Replaying the same rows again (e.g. a segment applied before a crash) changes nothing
+    spool.append_many([row("BD-1", "Issued", datetime(2024, 5, 1))])
+    assert replay(spool, db_manager)["skipped"] == 1
+
+
+def test_unchanged_rescrape_keeps_an_older_spooled_row_from_rolling_back(db_manager, tmp_path):
+    db_manager.upsert_permits([row("BD-3", "Issued", datetime(2024, 5, 1))])
+    # Left on the spool volume by an earlier process
+    spool = Spool(str(tmp_path / "spool"))
+    spool.append_many([row("BD-3", "Plan Review", datetime(2024, 5, 15))])
+    # A later scrape finds nothing new, but it is still the newest scrape
+    assert db_manager.upsert_permits([row("BD-3", "Issued", datetime(2024, 6, 1))])["unchanged"] == 1
+    assert replay(spool, db_manager)["skipped"] == 1
+    assert stored_status(db_manager, "BD-3") == "Issued"
+
+
+def test_drain_replays_the_backlog_at_shutdown(db_manager, tmp_path):
+    spool = Spool(str(tmp_path / "spool"))
+    replayer = SpoolReplayer(spool, db_manager, interval=3600).start()
+    spool.append_many([row("BD-4", "Issued", datetime(2024, 5, 1))])
+    replayer.drain()
+    assert stored_status(db_manager, "BD-4") == "Issued"
+    assert os.listdir(tmp_path / "spool") == []
+
+
+def test_writer_spools_while_database_is_down_and_keeps_order(db_manager, tmp_path):
+    class Flaky:
+        down = True
+
+        def __init__(self, real):
+            self.real = real
+            self.engine = real.engine
+
+        def upsert_permits(self, rows, changed_by="scraper"):
+            if Flaky.down:
+                raise ConnectionError("database unavailable")
+            return self.real.upsert_permits(rows, changed_by)
+
+    flaky = Flaky(db_manager)
+    spool = Spool(str(tmp_path / "spool"))
+    writer = BackgroundWriter(flaky, spool=spool).start()
+    writer.submit(row("BD-1", "Issued", datetime(2024, 5, 1)))
+    writer.flush()
+    Flaky.down = False
+    # The backlog is not replayed yet, so the newer row queues behind it instead of overtaking
+    writer.submit(row("BD-1", "Finaled", datetime(2024, 6, 1)))
+    assert writer.close()
+    assert (writer.written, writer.spooled, writer.failed) == (0, 2, 0)
+    replay(spool, flaky)
+    assert stored_status(db_manager, "BD-1") == "Finaled"
+    assert os.listdir(tmp_path / "spool") == []
@@ -0,0 +1,64 @@
+from datetime import datetime
+
+from sqlalchemy import MetaData, Table, inspect, select
+
+from scraper.database.manager import DatabaseManager
+from scraper.database.unified_schema import Base, Inspection, Permit, ScrapeRun
+from scraper.database.upgrade import ADDED_COLUMNS
+from scraper.instrumentation import StageTimer
+
+# Tables of the first released schema
+BASELINE_TABLES = ("permits", "inspections", "documents", "fees", "status_history", "scrape_runs")
+
+
+def create_baseline_tables(engine):
+    """The released tables as a deployed database has them: without any ADDED_COLUMNS"""
+    metadata = MetaData()
+    for name in BASELINE_TABLES:
+        table = Base.metadata.tables[name]
+        added = ADDED_COLUMNS.get(name, ())
+        Table(name, metadata, *[column._copy() for column in table.columns if column.name not in added])
+    metadata.create_all(engine)
+
+
+def columns(engine, table):
+    return {column["name"] for column in inspect(engine).get_columns(table)}
+
+
+def test_create_tables_adds_new_columns_to_a_baseline_database(tmp_path):
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'deployed.db'}")
+    create_baseline_tables(manager.engine)
+    assert "stage_timings" not in columns(manager.engine, "scrape_runs")
+
+    manager.create_tables()
+    # Idempotent, as every process start runs it
+    manager.create_tables()
+    for table, added in ADDED_COLUMNS.items():
+        assert set(added) <= columns(manager.engine, table)
+
+    timer = StageTimer()
+    with timer.span("navigation"):
+        pass
+    manager.record_scrape_run("run-1", "EnhancedDetailScraper", datetime(2024, 5, 1), timer)
+    with manager.engine.connect() as conn:
+        assert "navigation" in conn.execute(select(ScrapeRun.stage_timings)).scalar()
+
+
+def test_upserts_write_new_columns_after_upgrading(tmp_path):
+    manager = DatabaseManager(f"sqlite:///{tmp_path / 'deployed.db'}")
+    create_baseline_tables(manager.engine)
+    manager.create_tables()
+    manager.upsert_permits([{
+        "permit_number": "BD24-1", "status": "Issued", "latitude": 36.17, "longitude": -115.14,
+        "owner_name": "Desert Homes LLC",
+        "inspections": [{"inspection_type": "Footing", "result": "Approved", "outcome": "pass"}],
+    }])
+    with manager.engine.connect() as conn:
+        assert conn.execute(select(Inspection.outcome)).scalar() == "pass"
+    # The spatial index is built over the added coordinate columns
+    assert [p["permit_number"] for p in manager.permits_within(36.17, -115.14, 1)] == ["BD24-1"]
+    session = manager.SessionLocal()
+    permit = session.query(Permit).one()
+    assert permit.latitude == 36.17
+    assert permit.owner_entity_id is not None
+    session.close()
@@ -485,7 +485,8 @@ resource "aws_lambda_function" "db_rotation" {
   handler       = "db_rotation.lambda_handler"
   runtime       = "python3.11"
   filename      = "../lambda/db_rotation.zip"
-  timeout       = 30
+  # testSecret polls until RDS has applied the new password
+  timeout       = 300
   environment {
     variables = {
       DB_SECRET_ARN = aws_secretsmanager_secret.db.arn
@@ -503,15 +504,25 @@ resource "aws_iam_policy" "db_rotation" {
       {
         Effect = "Allow",
         Action = [
+          "secretsmanager:DescribeSecret",
           "secretsmanager:GetSecretValue",
-          "secretsmanager:PutSecretValue"
+          "secretsmanager:PutSecretValue",
+          "secretsmanager:UpdateSecretVersionStage"
         ],
         Resource = aws_secretsmanager_secret.db.arn
       },
       {
         Effect = "Allow",
         Action = [
-          "rds:ModifyDBInstance"
+          "secretsmanager:GetRandomPassword"
+        ],
+        Resource = "*"
+      },
+      {
+        Effect = "Allow",
+        Action = [
+          "rds:ModifyDBInstance",
+          "rds:DescribeDBInstances"
         ],
         Resource = aws_db_instance.main.arn
       },
@@ -528,6 +539,13 @@ resource "aws_iam_policy" "db_rotation" {
   })
 }
 
+resource "aws_lambda_permission" "allow_secretsmanager" {
+  statement_id  = "AllowExecutionFromSecretsManager"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.db_rotation.function_name
+  principal     = "secretsmanager.amazonaws.com"
+}
+
 resource "aws_iam_role_policy_attachment" "db_rotation" {
   role       = aws_iam_role.sns_to_slack_lambda.name
   policy_arn = aws_iam_policy.db_rotation.arn